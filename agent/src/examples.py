@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import math
+import time
+import heapq
+import zlib
+import threading
+from collections import OrderedDict
+import requests
+
+# --- FEW-SHOT CONFIGURATION ---
+
+# Number of examples injected into the system prompt per request
+FEW_SHOT_K = int(os.environ.get("FEW_SHOT_K", 3))
+# Ollama embedding model (e.g. nomic-embed-text); empty uses the local vectorizer only
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "")
+# Timeout (seconds) for embedding a prompt on the request path
+EMBED_QUERY_TIMEOUT = float(os.environ.get("EMBED_QUERY_TIMEOUT", 2))
+# Prompt embeddings kept in memory (repeated prompts skip the /api/embed call)
+EMBED_CACHE_SIZE = int(os.environ.get("EMBED_CACHE_SIZE", 1024))
+# After an /api/embed failure the local vectorizer is used for this long (seconds),
+# doubling on repeated failures up to EMBED_RETRY_MAX_SECONDS
+EMBED_RETRY_SECONDS = float(os.environ.get("EMBED_RETRY_SECONDS", 30))
+EMBED_RETRY_MAX_SECONDS = float(os.environ.get("EMBED_RETRY_MAX_SECONDS", 600))
+# Dimension of the local hashing vectorizer
+LOCAL_EMBED_DIM = 512
+
+# --- EXAMPLE LIBRARY ---
+
+def build_examples(user_service_url):
+    """
+    Returns the example library: natural language prompt -> action JSON.
+    """
+    users_url = f"{user_service_url}/users"
+
+    def api(method, url, body=None):
+        return {"action": "api", "api": {"method": method, "url": url, "headers": {}, "body": body or {}}}
+
+    def bash(command):
+        return {"action": "bash", "command": command}
+
+    return [
+        {"prompt": "list all files in the current directory", "action": bash("ls -la")},
+        {"prompt": "show the current directory", "action": bash("pwd")},
+        {"prompt": "create a folder called backup", "action": bash("mkdir backup")},
+        {"prompt": "create an empty file notes.txt", "action": bash("touch notes.txt")},
+        {"prompt": "show the contents of config.yaml", "action": bash("cat config.yaml")},
+        {"prompt": "copy report.txt to report.bak", "action": bash("cp report.txt report.bak")},
+        {"prompt": "rename draft.md to final.md", "action": bash("mv draft.md final.md")},
+        {"prompt": "what is the date today", "action": bash("date")},
+        {"prompt": "which user am I logged in as", "action": bash("whoami")},
+        {"prompt": "show system information", "action": bash("uname -a")},
+        {"prompt": "ping google.com 3 times", "action": bash("ping -c 3 google.com")},
+        {"prompt": "list all users", "action": api("GET", users_url)},
+        {"prompt": "add a user named Alice from Rome with email alice@example.com",
+         "action": api("POST", users_url, {"name": "Alice", "city": "Rome", "email": "alice@example.com"})},
+        {"prompt": "find users named Mario", "action": api("GET", f"{users_url}/search?q=Mario")},
+        {"prompt": "which users live in Milan", "action": api("GET", f"{users_url}/search?q=Milan")},
+        {"prompt": "show the user with id USER_ID", "action": api("GET", f"{users_url}/USER_ID")},
+        {"prompt": "delete the user with id USER_ID", "action": api("DELETE", f"{users_url}/USER_ID")},
+        {"prompt": "change the city of user USER_ID to Milan",
+         "action": api("PATCH", f"{users_url}/USER_ID", {"city": "Milan"})},
+        {"prompt": "get todo number 1 from jsonplaceholder",
+         "action": api("GET", "https://jsonplaceholder.typicode.com/todos/1")},
+    ]
+
+def format_examples(examples):
+    """Renders examples as prompt lines for the system prompt."""
+    return "\n".join(
+        f'- User: "{example["prompt"]}"\n  Reply: {json.dumps(example["action"])}'
+        for example in examples
+    )
+
+# --- EMBEDDINGS ---
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def local_embed(text, dim=LOCAL_EMBED_DIM):
+    """
+    Hashing vectorizer used when no embedding model is configured.
+    Words and character trigrams are hashed into a fixed-size, L2-normalized vector.
+    """
+    vector = [0.0] * dim
+    words = TOKEN_RE.findall(text.lower())
+    features = list(words)
+    for word in words:
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    for feature in features:
+        vector[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    return normalize(vector)
+
+def normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return vector
+    return [x / norm for x in vector]
+
+class OllamaEmbedder:
+    """Computes embeddings through Ollama's /api/embed endpoint."""
+
+    def __init__(self, host, model, timeout=10):
+        self.host = host
+        self.model = model
+        self.timeout = timeout
+
+    def embed(self, texts, timeout=None):
+        resp = requests.post(f"{self.host}/api/embed",
+                             json={"model": self.model, "input": texts},
+                             timeout=timeout or self.timeout)
+        resp.raise_for_status()
+        embeddings = resp.json().get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            raise ValueError("Unexpected /api/embed response")
+        return [normalize(vector) for vector in embeddings]
+
+class VectorIndex:
+    """In-memory cosine-similarity index over normalized vectors."""
+
+    def __init__(self):
+        self.vectors = []
+        self.items = []
+
+    def add(self, vector, item):
+        self.vectors.append(vector)
+        self.items.append(item)
+
+    def search(self, query_vector, k):
+        scored = ((sum(q * v for q, v in zip(query_vector, vector)), i)
+                  for i, vector in enumerate(self.vectors))
+        return [(score, self.items[i]) for score, i in heapq.nlargest(k, scored)]
+
+# --- RETRIEVAL ---
+
+class ExampleRetriever:
+    """
+    Selects the few-shot examples most relevant to a prompt.
+
+    A local hashing index is always available; when an Ollama embedder is
+    given, its index is preferred and the local one is used whenever the
+    embedding call fails. Indexes are built lazily on first use.
+
+    Ollama may not be ready (or the embed model not pulled) when the first
+    request arrives, so a failed /api/embed call only switches to the local
+    index for a backoff period; the remote index is then built (or the
+    query embedded) again. Prompt embeddings are cached and requested with
+    a short timeout, since they sit on the request path.
+    """
+
+    def __init__(self, examples, embedder=None, k=None, query_timeout=None, cache_size=None,
+                 retry_seconds=None, retry_max_seconds=None):
+        self.examples = examples
+        self.embedder = embedder
+        self.k = FEW_SHOT_K if k is None else k
+        self.query_timeout = query_timeout or EMBED_QUERY_TIMEOUT
+        self.cache_size = EMBED_CACHE_SIZE if cache_size is None else cache_size
+        self.retry_seconds = EMBED_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self.retry_max_seconds = retry_max_seconds or EMBED_RETRY_MAX_SECONDS
+        self._local_index = None
+        self._remote_index = None
+        self._query_cache = OrderedDict()
+        # The embedder is skipped until this time (time.monotonic) after a failure
+        self._remote_retry_at = 0.0
+        self._remote_failures = 0
+        self._lock = threading.Lock()
+        self._remote_lock = threading.Lock()
+
+    def _build(self):
+        with self._lock:
+            if self._local_index is not None:
+                return
+            local_index = VectorIndex()
+            for example in self.examples:
+                local_index.add(local_embed(example["prompt"]), example)
+            self._local_index = local_index
+
+    def _remote_failed(self):
+        delay = min(self.retry_seconds * 2 ** self._remote_failures, self.retry_max_seconds)
+        self._remote_failures += 1
+        self._remote_retry_at = time.monotonic() + delay
+
+    def _remote(self):
+        """The remote index, building it when due; None while the embedder is unavailable."""
+        if self.embedder is None or time.monotonic() < self._remote_retry_at:
+            return None
+        if self._remote_index is not None:
+            return self._remote_index
+        # One request builds the index; concurrent ones use the local index meanwhile
+        if not self._remote_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._remote_index is None:
+                vectors = self.embedder.embed([example["prompt"] for example in self.examples])
+                remote_index = VectorIndex()
+                for vector, example in zip(vectors, self.examples):
+                    remote_index.add(vector, example)
+                self._remote_index = remote_index
+                self._remote_failures = 0
+        except (requests.exceptions.RequestException, ValueError):
+            self._remote_failed()
+        finally:
+            self._remote_lock.release()
+        return self._remote_index
+
+    def _embed_query(self, query):
+        with self._lock:
+            vector = self._query_cache.get(query)
+            if vector is not None:
+                self._query_cache.move_to_end(query)
+                return vector
+        vector = self.embedder.embed([query], timeout=self.query_timeout)[0]
+        with self._lock:
+            self._query_cache[query] = vector
+            while len(self._query_cache) > self.cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def retrieve(self, query, k=None):
+        """Returns up to k examples ordered by similarity to the query."""
+        k = self.k if k is None else k
+        if k <= 0:
+            return []
+        self._build()
+        remote_index = self._remote()
+        if remote_index is not None:
+            try:
+                query_vector = self._embed_query(query)
+                self._remote_failures = 0
+                return [example for _, example in remote_index.search(query_vector, k)]
+            except (requests.exceptions.RequestException, ValueError):
+                self._remote_failed()
+        return [example for _, example in self._local_index.search(local_embed(query), k)]
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import threading
+
+# --- HISTORY CONFIGURATION ---
+
+# Number of most recent turns whose execution result digest is shown to the LLM
+HISTORY_INCLUDE_RESULTS = int(os.environ.get("HISTORY_INCLUDE_RESULTS", 3))
+# Max characters kept from each execution result
+HISTORY_RESULT_CHARS = int(os.environ.get("HISTORY_RESULT_CHARS", 400))
+# Oldest turns are dropped beyond this many per session
+HISTORY_MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", 50))
+
+# --- IMPLEMENTATION ---
+
+def digest_result(execution_result, max_chars=None):
+    """
+    Reduces an execution result to a short string for the prompt.
+    API results keep the status code and compact JSON body; bash results
+    keep stdout (or stderr when stdout is empty).
+    """
+    if max_chars is None:
+        max_chars = HISTORY_RESULT_CHARS
+    if not isinstance(execution_result, dict):
+        text = str(execution_result)
+    elif "status_code" in execution_result:
+        data = execution_result.get("data")
+        body = data if isinstance(data, str) else json.dumps(data, separators=(",", ":"), default=str)
+        text = f"HTTP {execution_result['status_code']} {body}"
+    elif "stdout" in execution_result:
+        text = (execution_result.get("stdout") or execution_result.get("stderr") or "").strip()
+    else:
+        text = str(execution_result.get("output") or execution_result.get("error") or "")
+
+    if len(text) > max_chars:
+        return text[:max_chars] + "..."
+    return text
+
+class Turn:
+    """
+    One user prompt and the action taken for it.
+    kind is "bash", "api", another action name, or None if no action was parsed;
+    target is the command or "METHOD url". pending is True while the
+    request that started the turn is still running.
+    """
+
+    __slots__ = ("prompt", "kind", "target", "status", "digest", "pending")
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.kind = None
+        self.target = None
+        self.status = None
+        self.digest = None
+        self.pending = False
+
+    def to_dict(self):
+        return {
+            "prompt": self.prompt,
+            "action": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "result": self.digest,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        turn = cls(data.get("prompt", ""))
+        turn.kind = data.get("action")
+        turn.target = data.get("target")
+        turn.status = data.get("status")
+        turn.digest = data.get("result")
+        return turn
+
+class SessionHistory:
+    """
+    Compact per-session conversation record.
+
+    Instead of storing chat messages, each turn keeps the prompt and a
+    structured summary of the action; messages for the LLM are rendered on
+    demand, including result digests for the most recent turns so follow-ups
+    ("delete that user") can refer to IDs and outputs.
+
+    Requests in the same session can run concurrently (gunicorn threads),
+    so each request keeps the Turn returned by add_prompt and passes it to
+    record_action; turn changes and reads go through the session's lock.
+    """
+
+    __slots__ = ("turns", "max_turns", "updated_at", "lock")
+
+    def __init__(self, max_turns=None):
+        self.turns = []
+        self.max_turns = max_turns or HISTORY_MAX_TURNS
+        # Last change, used for snapshots and TTL expiry (see sessions.py)
+        self.updated_at = time.time()
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add_prompt(self, prompt):
+        """Appends a turn for the prompt and returns it."""
+        turn = Turn(prompt)
+        with self.lock:
+            self.turns.append(turn)
+            if len(self.turns) > self.max_turns:
+                del self.turns[:len(self.turns) - self.max_turns]
+            self.updated_at = time.time()
+        return turn
+
+    def start_turn(self, prompt):
+        """
+        Renders the messages for a new prompt and appends its turn, as one
+        step. Turns of requests still in flight are left out, so concurrent
+        requests with the same prompt send identical messages to the LLM
+        (and share one call). Returns (turn, messages).
+        """
+        with self.lock:
+            messages = self.to_messages(skip_pending=True)
+            messages.append({"role": "user", "content": prompt})
+            turn = self.add_prompt(prompt)
+            turn.pending = True
+        return turn, messages
+
+    def finish_turn(self, turn):
+        """Marks a turn as done without an action (e.g. the plan did not parse)."""
+        with self.lock:
+            turn.pending = False
+            self.updated_at = time.time()
+
+    def record_action(self, action_plan, execution_result, raw_response=None, turn=None):
+        """Fills in the action for `turn` (from add_prompt; defaults to the latest turn)."""
+        with self.lock:
+            if turn is None:
+                if not self.turns:
+                    return
+                turn = self.turns[-1]
+            turn.pending = False
+            turn.kind = action_plan.get("action") or "unknown"
+            if turn.kind == "bash":
+                command = action_plan.get("command")
+                turn.target = " ".join(command) if isinstance(command, list) else command
+            elif turn.kind == "api":
+                api_details = action_plan.get("api", {})
+                turn.target = f"{api_details.get('method', 'GET')} {api_details.get('url', 'N/A')}"
+            else:
+                turn.target = raw_response
+            turn.status = execution_result.get("status", "error") if isinstance(execution_result, dict) else None
+            turn.digest = digest_result(execution_result)
+            self.updated_at = time.time()
+
+    def to_messages(self, include_results=None, skip_pending=False):
+        """
+        Renders the history as chat messages.
+        Result digests are included for the last include_results turns
+        that have an action; skip_pending leaves out turns still in flight.
+        """
+        if include_results is None:
+            include_results = HISTORY_INCLUDE_RESULTS
+        with self.lock:
+            turns = [turn for turn in self.turns if not (skip_pending and turn.pending)]
+        messages = []
+        completed = [i for i, turn in enumerate(turns) if turn.kind is not None]
+        with_results = set(completed[-include_results:]) if include_results > 0 else set()
+        for i, turn in enumerate(turns):
+            messages.append({"role": "user", "content": turn.prompt})
+            if turn.kind is None:
+                continue
+            if turn.kind == "bash":
+                content = f"I suggested the bash command: {turn.target}"
+            elif turn.kind == "api":
+                content = f"I suggested an API call: {turn.target}"
+            else:
+                content = turn.target or ""
+            if turn.status:
+                content += f" (status: {turn.status})"
+            if i in with_results and turn.digest:
+                content += f"\nResult: {turn.digest}"
+            messages.append({"role": "assistant", "content": content})
+        return messages
+
+    def to_dict(self):
+        with self.lock:
+            return {"turns": [turn.to_dict() for turn in self.turns], "updated_at": self.updated_at}
+
+    @classmethod
+    def from_dict(cls, data, max_turns=None):
+        history = cls(max_turns)
+        history.turns = [Turn.from_dict(turn) for turn in data.get("turns", [])][-history.max_turns:]
+        history.updated_at = data.get("updated_at", history.updated_at)
+        return history
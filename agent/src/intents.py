@@ -0,0 +1,226 @@
+import os
+import re
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from urllib.parse import quote
+
+# --- INTENT CONFIGURATION ---
+
+INTENT_MATCHER_ENABLED = os.environ.get("INTENT_MATCHER_ENABLED", "true").lower() in ("true", "1", "yes")
+# Also ask the LLM for matched prompts (in the background) and compare the plans
+INTENT_SHADOW_MODE = os.environ.get("INTENT_SHADOW_MODE", "false").lower() in ("true", "1", "yes")
+# Fraction of intent hits compared with the LLM in shadow mode
+INTENT_SHADOW_SAMPLE_RATE = float(os.environ.get("INTENT_SHADOW_SAMPLE_RATE", 0.1))
+# Shadow LLM calls in flight at most; comparisons beyond this are skipped
+INTENT_SHADOW_WORKERS = int(os.environ.get("INTENT_SHADOW_WORKERS", 2))
+
+WORD_RE = re.compile(r"[a-z0-9@._-]+")
+# One to three name-like words (a person's name, a city)
+NAME_WORDS = r"[a-z][a-z'-]*(?: [a-z][a-z'-]*){0,2}"
+# Prompts that chain several steps ("... and then list users") are left to the LLM
+NO_SEQUENCE = r"(?!.*(?:[,;]|\b(?:and|then|also|plus|after|before|afterwards)\b))"
+# Pronouns, relative clauses and comparisons refer to context or need reasoning
+NO_CONTEXT = (r"(?!.*\b(?:i|me|my|we|our|you|it|he|she|they|them|that|this|those|these|who|which|whom|whose|"
+              r"just|earlier|recently|last|ago|older|younger|than|more|less|over|under|since)\b)")
+USER_ID = r"(?P<id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)"
+
+# --- IMPLEMENTATION ---
+
+def normalize_prompt(prompt):
+    """Collapses whitespace and strips trailing punctuation."""
+    return " ".join(prompt.split()).rstrip(" .!?")
+
+def plan_signature(plan):
+    """
+    Reduces an action plan to what matters when comparing two plans:
+    the command for bash, method + URL for API calls.
+    """
+    if not isinstance(plan, dict):
+        return None
+    if plan.get("action") == "bash":
+        command = plan.get("command")
+        if isinstance(command, list):
+            command = " ".join(command)
+        return ("bash", " ".join(str(command).split()))
+    if plan.get("action") == "api":
+        api = plan.get("api") or {}
+        return ("api", str(api.get("method", "GET")).upper(), str(api.get("url", "")).rstrip("/"))
+    return (plan.get("action"),)
+
+class Intent:
+    """A high-confidence prompt pattern mapped directly to an action plan."""
+
+    __slots__ = ("name", "pattern", "keywords", "build")
+
+    def __init__(self, name, pattern, keywords, build):
+        self.name = name
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.keywords = frozenset(keywords)
+        self.build = build
+
+class IntentMatch:
+    __slots__ = ("name", "plan")
+
+    def __init__(self, name, plan):
+        self.name = name
+        self.plan = plan
+
+def build_intents(user_service_url):
+    """
+    Returns the intent table. Patterns are anchored so that only prompts
+    which unambiguously mean one action are answered without the LLM.
+    """
+    users_url = f"{user_service_url}/users"
+
+    def api(method, url, body=None):
+        return {"action": "api", "api": {"method": method, "url": url, "headers": {}, "body": body or {}}}
+
+    def bash(command):
+        return lambda m: {"action": "bash", "command": command}
+
+    def add_user(m):
+        body = {"name": m.group("name").strip(), "city": m.group("city").strip()}
+        if m.group("email"):
+            body["email"] = m.group("email")
+        return api("POST", users_url, body)
+
+    def search_users(m):
+        return api("GET", f"{users_url}/search?q={quote(m.group('q').strip())}")
+
+    return [
+        Intent("list_users",
+               r"^(?:list|show|get|display)(?: me)?(?: all)?(?: the)? users$",
+               {"list", "show", "get", "display"}, lambda m: api("GET", users_url)),
+        Intent("get_user",
+               rf"^(?:show|get|find|display)(?: me)?(?: the)? user(?: with id)? {USER_ID}$",
+               {"show", "get", "find", "display"}, lambda m: api("GET", f"{users_url}/{m.group('id')}")),
+        Intent("search_users",
+               rf"^{NO_SEQUENCE}{NO_CONTEXT}(?:find|search(?: for)?)(?: all)?(?: the)? users?"
+               r"(?: named| called| from| in| living in| with email| matching| for)? (?!with id )"
+               r"(?P<q>[\w@.'-]+(?: [\w@.'-]+){0,2})$",
+               {"find", "search"}, search_users),
+        Intent("delete_user",
+               rf"^(?:delete|remove)(?: the)? user(?: with id)? {USER_ID}$",
+               {"delete", "remove"}, lambda m: api("DELETE", f"{users_url}/{m.group('id')}")),
+        Intent("add_user",
+               rf"^{NO_SEQUENCE}(?:add|create)(?: a)?(?: new)? user(?: named| called)? (?P<name>{NAME_WORDS}) from "
+               rf"(?P<city>{NAME_WORDS})(?: with email (?P<email>[^\s@]+@[^\s@]+\.[a-z]+))?$",
+               {"add", "create"}, add_user),
+        Intent("pwd",
+               r"^(?:where am i|(?:show|print|what is|what's)(?: me)?(?: the)? (?:current|working) (?:directory|folder|dir))$",
+               {"where", "show", "print", "what"}, bash("pwd")),
+        Intent("date",
+               r"^(?:show|print|what is|what's)(?: the)? (?:current )?(?:date|time|date and time)(?: today| now)?$",
+               {"show", "print", "what"}, bash("date")),
+        Intent("whoami",
+               r"^(?:who am i|(?:show|what is|what's) (?:my|the current) user ?name)$",
+               {"who", "show", "what"}, bash("whoami")),
+        Intent("list_files",
+               r"^(?:list|show)(?: all)?(?: the)? files(?: in (?:the )?(?:current directory|current folder|here))?$",
+               {"list", "show"}, bash("ls -la")),
+        Intent("system_info",
+               r"^(?:show|print|what is|what's)(?: the)? (?:system|os|kernel) (?:info|information|version)$",
+               {"show", "print", "what"}, bash("uname -a")),
+    ]
+
+class IntentMatcher:
+    """
+    Answers common prompts without calling the LLM.
+
+    Intents are indexed by their leading keywords, so each prompt is only
+    tested against the few patterns that could match it. Hit rate and (in
+    shadow mode) agreement with the LLM are tracked for /debug/intents.
+    Shadow comparisons are sampled and run on a small thread pool; when all
+    its workers are busy the comparison is skipped, so shadow mode never
+    queues up LLM work.
+    """
+
+    def __init__(self, intents, shadow_sample_rate=None, shadow_workers=None):
+        self.intents = intents
+        self.shadow_sample_rate = INTENT_SHADOW_SAMPLE_RATE if shadow_sample_rate is None else shadow_sample_rate
+        self.shadow_workers = max(1, shadow_workers or INTENT_SHADOW_WORKERS)
+        self._shadow_slots = threading.BoundedSemaphore(self.shadow_workers)
+        self._shadow_pool = None
+        self._index = {}
+        for intent in intents:
+            for keyword in intent.keywords:
+                self._index.setdefault(keyword, []).append(intent)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0, "by_intent": {},
+                      "shadow": {"compared": 0, "agreed": 0, "errors": 0, "skipped": 0}}
+        self.mismatches = deque(maxlen=20)
+
+    def match(self, prompt):
+        """Returns an IntentMatch for a high-confidence prompt, or None."""
+        text = normalize_prompt(prompt)
+        words = WORD_RE.findall(text.lower())
+        candidates = self._index.get(words[0], ()) if words else ()
+
+        result = None
+        for intent in candidates:
+            m = intent.pattern.match(text)
+            if m:
+                result = IntentMatch(intent.name, intent.build(m))
+                break
+
+        with self._lock:
+            self.stats["requests"] += 1
+            if result:
+                self.stats["hits"] += 1
+                self.stats["by_intent"][result.name] = self.stats["by_intent"].get(result.name, 0) + 1
+        return result
+
+    def shadow_check(self, prompt, intent_match, llm_plan_fn):
+        """
+        Compares an intent plan with the LLM's plan in the background, for a
+        sample of hits. llm_plan_fn() must return the parsed LLM plan (or
+        None on failure). Returns a Future, or None when not sampled or
+        every shadow worker is busy.
+        """
+        if random.random() >= self.shadow_sample_rate:
+            return None
+        if not self._shadow_slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["shadow"]["skipped"] += 1
+            return None
+
+        def run():
+            try:
+                llm_plan = llm_plan_fn()
+            except Exception:
+                llm_plan = None
+            finally:
+                self._shadow_slots.release()
+            with self._lock:
+                shadow = self.stats["shadow"]
+                if llm_plan is None:
+                    shadow["errors"] += 1
+                    return
+                shadow["compared"] += 1
+                if plan_signature(llm_plan) == plan_signature(intent_match.plan):
+                    shadow["agreed"] += 1
+                else:
+                    self.mismatches.append({"prompt": prompt, "intent": intent_match.name,
+                                            "intent_plan": intent_match.plan, "llm_plan": llm_plan})
+
+        with self._lock:
+            if self._shadow_pool is None:
+                self._shadow_pool = ThreadPoolExecutor(max_workers=self.shadow_workers,
+                                                       thread_name_prefix="intent-shadow")
+        return self._shadow_pool.submit(run)
+
+    def report(self):
+        with self._lock:
+            requests_seen = self.stats["requests"]
+            shadow = dict(self.stats["shadow"])
+            return {
+                "requests": requests_seen,
+                "hits": self.stats["hits"],
+                "hit_rate": round(self.stats["hits"] / requests_seen, 4) if requests_seen else 0.0,
+                "by_intent": dict(self.stats["by_intent"]),
+                "shadow": dict(shadow, accuracy=round(shadow["agreed"] / shadow["compared"], 4)
+                               if shadow["compared"] else None),
+                "recent_mismatches": list(self.mismatches),
+            }
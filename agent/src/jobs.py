@@ -0,0 +1,140 @@
+import os
+import time
+import uuid
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- JOB CONFIGURATION ---
+
+# Background workers running /jobs requests
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+# Job records kept for GET /jobs/<id>; the oldest finished jobs are evicted first
+JOB_MAX_RECORDS = int(os.environ.get("JOB_MAX_RECORDS", 200))
+# Partial output kept per job (the most recent characters)
+JOB_OUTPUT_CHARS = int(os.environ.get("JOB_OUTPUT_CHARS", 16000))
+# Timeout for bash commands and API calls run by jobs (seconds)
+JOB_COMMAND_TIMEOUT = int(os.environ.get("JOB_COMMAND_TIMEOUT", 300))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# --- IMPLEMENTATION ---
+
+class JobLimitError(Exception):
+    """Raised when every job slot is taken by unfinished jobs."""
+
+class Job:
+    """State of one background job, updated by its worker thread."""
+
+    __slots__ = ("id", "status", "callback_url", "created_at", "started_at", "finished_at",
+                 "result", "error", "output", "timings", "callback", "_lock")
+
+    def __init__(self, callback_url=None):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.callback_url = callback_url
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.output = ""
+        self.timings = {}
+        self.callback = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def append_output(self, text):
+        """Adds partial output, keeping only the last JOB_OUTPUT_CHARS characters."""
+        with self._lock:
+            self.output = (self.output + text)[-JOB_OUTPUT_CHARS:]
+
+    def to_dict(self, include_output=True):
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "timings_ms": dict(self.timings),
+                "result": self.result,
+                "error": self.error,
+            }
+            if include_output:
+                data["output"] = self.output
+            if self.callback_url:
+                data["callback"] = dict(self.callback or {}, url=self.callback_url)
+            return data
+
+class JobManager:
+    """
+    Runs jobs on a thread pool and keeps a bounded table of their records.
+
+    Each job runs fn(job, *args), which returns (result, ok). notify(job) is
+    called after a job with a callback_url finishes and returns a dict
+    describing the delivery. The submitting request's context variables
+    (request ID, trace span) are carried into the worker.
+    """
+
+    def __init__(self, notify=None, max_workers=None, max_jobs=None):
+        self.notify = notify
+        self.max_jobs = JOB_MAX_RECORDS if max_jobs is None else max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or JOB_WORKERS, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, callback_url=None):
+        """Queues fn(job, *args) and returns the job; raises JobLimitError when full."""
+        job = Job(callback_url)
+        with self._lock:
+            self._evict(room_for=1)
+            if len(self._jobs) >= self.max_jobs:
+                raise JobLimitError(f"{len(self._jobs)} jobs are still queued or running")
+            self._jobs[job.id] = job
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._execute, job, fn, args)
+        return job
+
+    def _evict(self, room_for=0):
+        """Drops the oldest finished jobs until room_for more fit."""
+        excess = len(self._jobs) + room_for - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+
+    def _execute(self, job, fn, args):
+        job.started_at = time.time()
+        job.status = RUNNING
+        job.timings["queued"] = round((job.started_at - job.created_at) * 1000, 2)
+        try:
+            job.result, ok = fn(job, *args)
+        except Exception as e:
+            job.error = str(e)
+            ok = False
+        job.finished_at = time.time()
+        job.timings["run"] = round((job.finished_at - job.started_at) * 1000, 2)
+        # Set last so pollers never see a finished job without its result
+        job.status = SUCCEEDED if ok else FAILED
+
+        if job.callback_url and self.notify is not None:
+            try:
+                job.callback = self.notify(job)
+            except Exception as e:
+                job.callback = {"delivered": False, "error": str(e)}
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {"records": len(self._jobs), "max_records": self.max_jobs, "by_status": counts}
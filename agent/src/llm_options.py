@@ -0,0 +1,103 @@
+import os
+
+# --- OLLAMA GENERATION CONFIGURATION ---
+# Defaults are tuned for action planning: a plan is a short JSON object, so
+# output is capped and sampling is deterministic.
+
+# Max tokens generated per reply (a plan is well under 100 tokens); 0 = model default
+OLLAMA_NUM_PREDICT = int(os.environ.get("OLLAMA_NUM_PREDICT", 256))
+# Context window; must fit the system prompt, examples and session history; 0 = model default
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", 4096))
+OLLAMA_TEMPERATURE = float(os.environ.get("OLLAMA_TEMPERATURE", 0.0))
+# Comma-separated stop sequences
+OLLAMA_STOP = [stop for stop in os.environ.get("OLLAMA_STOP", "").split(",") if stop]
+# json (any JSON object), schema (constrained to ACTION_SCHEMA, Ollama >= 0.5) or none
+OLLAMA_FORMAT = os.environ.get("OLLAMA_FORMAT", "json").lower()
+
+FORMATS = ("json", "schema", "none")
+
+# JSON schema of an action plan, used when format is "schema"
+ACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": ["bash", "api"]},
+        "command": {"type": "string"},
+        "api": {
+            "type": "object",
+            "properties": {
+                "method": {"type": "string", "enum": ["GET", "POST", "PUT", "PATCH", "DELETE"]},
+                "url": {"type": "string"},
+                "headers": {"type": "object"},
+                "body": {"type": "object"},
+            },
+            "required": ["method", "url"],
+        },
+    },
+    "required": ["action"],
+}
+
+# --- IMPLEMENTATION ---
+
+def default_options():
+    """Generation settings from the environment."""
+    return {
+        "num_predict": OLLAMA_NUM_PREDICT,
+        "num_ctx": OLLAMA_NUM_CTX,
+        "temperature": OLLAMA_TEMPERATURE,
+        "stop": list(OLLAMA_STOP),
+        "format": OLLAMA_FORMAT,
+    }
+
+def parse_llm_options(overrides):
+    """
+    Validates per-request overrides (the /chat "llm_options" object) and
+    merges them over the defaults. Raises ValueError for unknown keys or
+    malformed values.
+    """
+    options = default_options()
+    if overrides is None:
+        return options
+    if not isinstance(overrides, dict):
+        raise ValueError("'llm_options' must be an object")
+    for key, value in overrides.items():
+        if key in ("num_predict", "num_ctx"):
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"'llm_options.{key}' must be a non-negative integer (0 = model default)")
+        elif key == "temperature":
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 2:
+                raise ValueError("'llm_options.temperature' must be a number between 0 and 2")
+        elif key == "stop":
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list) or not all(isinstance(stop, str) and stop for stop in value):
+                raise ValueError("'llm_options.stop' must be a string or a list of strings")
+        elif key == "format":
+            if value not in FORMATS:
+                raise ValueError(f"'llm_options.format' must be one of {', '.join(FORMATS)}")
+        else:
+            raise ValueError(f"Unknown llm_options key: {key}")
+        options[key] = value
+    return options
+
+def build_chat_payload(model, messages, options=None):
+    """
+    Builds an Ollama /api/chat payload. num_predict and num_ctx left at 0
+    fall back to the model's defaults and are not sent.
+    """
+    options = default_options() if options is None else options
+    payload = {"model": model, "messages": messages, "stream": False}
+
+    if options["format"] == "json":
+        payload["format"] = "json"
+    elif options["format"] == "schema":
+        payload["format"] = ACTION_SCHEMA
+
+    ollama_options = {}
+    for key in ("num_predict", "num_ctx"):
+        if options[key] > 0:
+            ollama_options[key] = options[key]
+    ollama_options["temperature"] = options["temperature"]
+    if options["stop"]:
+        ollama_options["stop"] = options["stop"]
+    payload["options"] = ollama_options
+    return payload
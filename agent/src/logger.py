@@ -0,0 +1,202 @@
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+import contextvars
+
+# --- LOGGING CONFIGURATION ---
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Long string fields (prompts, LLM output, command output) are cut to this size
+LOG_MAX_FIELD_CHARS = int(os.environ.get("LOG_MAX_FIELD_CHARS", 500))
+# Fraction of requests whose full payloads (prompt, LLM response, history) are logged
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", 0.0))
+
+# Per-request context, set by the Flask hooks and picked up by every log record
+request_id_var = contextvars.ContextVar("request_id", default=None)
+session_id_var = contextvars.ContextVar("session_id", default=None)
+
+_listener = None
+
+# --- IMPLEMENTATION ---
+
+def truncate(value, max_chars=None):
+    """
+    Caps the size of a log field value.
+    Strings longer than max_chars are cut and annotated with the dropped length;
+    dicts and lists are truncated recursively.
+    """
+    if max_chars is None:
+        max_chars = LOG_MAX_FIELD_CHARS
+    if isinstance(value, str):
+        if len(value) > max_chars:
+            return f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+        return value
+    if isinstance(value, dict):
+        return {k: truncate(v, max_chars) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [truncate(v, max_chars) for v in value]
+    return value
+
+class ContextFilter(logging.Filter):
+    """Attaches the current request and session IDs to each record."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the event name and traceback separate.
+    The stock handler folds the traceback into the message text.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+            record.exc_text = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+    Structured data passed as extra={"fields": {...}} is merged into the line.
+    """
+
+    def __init__(self, max_field_chars=None):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        session_id = getattr(record, "session_id", None)
+        if session_id:
+            entry["session_id"] = session_id
+
+        fields = getattr(record, "fields", None)
+        if fields:
+            for key, value in truncate(fields, self.max_field_chars).items():
+                entry.setdefault(key, value)
+
+        exc = getattr(record, "exc", None)
+        if record.exc_info:
+            exc = self.formatException(record.exc_info)
+        if exc:
+            entry["exc"] = truncate(exc, self.max_field_chars)
+
+        return json.dumps(entry, default=str)
+
+def setup_logging(level=None, stream=None, max_field_chars=None):
+    """
+    Configures the "agent" logger to emit JSON lines through a queue.
+
+    Request threads only enqueue records; a background QueueListener thread
+    formats them and writes to the stream, so slow stdout never blocks a request.
+    Safe to call more than once (the previous listener is stopped).
+    """
+    global _listener
+
+    logger = logging.getLogger("agent")
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(JsonFormatter(max_field_chars))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    logger.addHandler(queue_handler)
+    logger.setLevel(level or LOG_LEVEL)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    return logger
+
+def stop_logging():
+    """Flushes pending records and stops the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
+def get_logger(name="agent"):
+    """Returns a logger under the "agent" hierarchy."""
+    if name == "agent" or name.startswith("agent."):
+        return logging.getLogger(name)
+    return logging.getLogger(f"agent.{name}")
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """Logs an event name with structured fields."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+def should_log_payload(debug=False):
+    """
+    Decides whether verbose payloads are logged for the current request.
+    Always true in DEBUG mode, otherwise sampled at LOG_PAYLOAD_SAMPLE_RATE.
+    """
+    if debug:
+        return True
+    return LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+
+class StageTimer:
+    """
+    Records elapsed milliseconds for named stages of a request.
+
+    Usage:
+        timer = StageTimer()
+        with timer.stage("llm"):
+            ...
+        timer.timings  # {"llm": 812.4}
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.timings = {}
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def total_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+class _Stage:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        self.timer.timings[self.name] = round(self.timer.timings.get(self.name, 0) + elapsed, 2)
+        return False
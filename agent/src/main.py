@@ -1,9 +1,32 @@
 import os
+import re
 import json
+import logging
 import time
+import uuid
+import math
 import requests
-from flask import Flask, request, jsonify
-from tools import execute_bash, execute_api
+from urllib.parse import urlparse
+from flask import Flask, request, jsonify, g, Response
+from tools import execute_bash, execute_api, validate_api_request, is_internal_url
+from logger import (
+    setup_logging, get_logger, log_event, should_log_payload, truncate,
+    StageTimer, request_id_var, session_id_var
+)
+from tracing import start_span, current_span, current_traceparent
+from singleflight import SingleFlight, request_key
+from history import SessionHistory
+from sessions import create_session_store
+from intents import IntentMatcher, build_intents, INTENT_MATCHER_ENABLED, INTENT_SHADOW_MODE
+from responses import init_compression, init_json_provider, JSON_PROVIDER
+from llm_options import build_chat_payload, parse_llm_options
+from ratelimit import RateLimiter
+from profiling import SamplingProfiler, SlowRequestLog
+from recording import TrafficRecorder, RECORD_RESULT_CHARS
+from jobs import JobManager, JobLimitError, JOB_COMMAND_TIMEOUT
+from shaping import ResultStore, shape_result, parse_shape_options
+from examples import ExampleRetriever, OllamaEmbedder, build_examples, format_examples, EMBED_MODEL
+from prompts import render_system_prompt
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,8 +35,10 @@ app = Flask(__name__)
 
 # --- CONVERSATION MEMORY ---
 # Store conversation history per session
-# Key: session_id, Value: list of message dicts with role/content
-conversation_history = {}
+# Key: session_id, Value: SessionHistory (prompts + structured action records,
+# rendered into chat messages on demand). Snapshotted to SESSION_SNAPSHOT_FILE
+# when set, so sessions survive restarts and worker recycling.
+conversation_history = create_session_store(SessionHistory.from_dict)
 
 OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://ollama:11434")
 MODEL_NAME = os.environ.get("MODEL_NAME", "llama3.2")
@@ -22,16 +47,61 @@ USER_SERVICE_PORT = int(os.environ.get("USER_SERVICE_PORT", 5001))
 USER_SERVICE_HOST = f"http://user-service:{USER_SERVICE_PORT}"
 DEBUG = os.environ.get("DEBUG", "false").lower() in ("true", "1", "yes")
 
+# Few-shot examples are retrieved per request by similarity to the prompt
+example_retriever = ExampleRetriever(
+    build_examples(USER_SERVICE_HOST),
+    embedder=OllamaEmbedder(OLLAMA_HOST, EMBED_MODEL) if EMBED_MODEL else None
+)
+
+# Common prompts are mapped to action plans without calling the LLM
+intent_matcher = IntentMatcher(build_intents(USER_SERVICE_HOST))
+
+JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*\n?(.*?)\n?```', re.DOTALL)
+
+# Full results of shaped responses, retrievable via GET /results/<ref_id>
+result_store = ResultStore()
+
+# Token buckets for inbound clients and outbound API domains
+rate_limiter = RateLimiter()
+
+# On-demand sampling profiler and capture of slow /chat requests
+profiler = SamplingProfiler()
+slow_requests = SlowRequestLog()
+
+# Optional JSONL recording of /chat traffic for scripts/replay.py (RECORD_FILE),
+# written in the background; records that cannot be written are logged and dropped
+traffic_recorder = TrafficRecorder(on_error=lambda error, count: log_event(
+    logger, "recording.write_failed", level=logging.WARNING, dropped=count, error=str(error)))
+
+# Concurrent identical LLM requests (same model + messages) share one Ollama call
+llm_flight = SingleFlight()
+
+setup_logging(level="DEBUG" if DEBUG else None)
+logger = get_logger()
+
+# Restore sessions from the last snapshot and keep snapshotting changes
+if conversation_history.snapshot_file is not None:
+    conversation_history.start()
+    log_event(logger, "sessions.loaded", count=conversation_history.stats["loaded"],
+              load_ms=conversation_history.stats["load_ms"], file=conversation_history.snapshot_file.path)
+
+# Negotiated gzip/br responses and the JSON provider (JSON_PROVIDER=orjson for speed)
+init_compression(app)
+json_provider = init_json_provider(app)
+if json_provider != JSON_PROVIDER:
+    log_event(logger, "json.provider_unavailable", level=logging.WARNING,
+              requested=JSON_PROVIDER, using=json_provider)
+
 # --- OLLAMA HELPERS ---
 
 def wait_for_ollama():
     """Loops until Ollama is ready."""
-    print(f"Waiting for Ollama at {OLLAMA_HOST}...")
+    log_event(logger, "ollama.waiting", host=OLLAMA_HOST)
     while True:
         try:
             resp = requests.get(f"{OLLAMA_HOST}/api/tags")
             if resp.status_code == 200:
-                print("Ollama is ready!")
+                log_event(logger, "ollama.ready", host=OLLAMA_HOST)
                 break
         except requests.exceptions.ConnectionError:
             pass
@@ -39,64 +109,44 @@ def wait_for_ollama():
 
 def check_and_pull_model():
     """Checks if the model exists, otherwise pulls it."""
-    print(f"Checking for model '{MODEL_NAME}'...")
+    log_event(logger, "model.checking", model=MODEL_NAME)
     try:
         resp = requests.get(f"{OLLAMA_HOST}/api/tags")
         models = [m['name'] for m in resp.json().get('models', [])]
         
         # Check against full name or 'latest'
         if MODEL_NAME in models or f"{MODEL_NAME}:latest" in models:
-            print(f"Model '{MODEL_NAME}' is already present.")
+            log_event(logger, "model.present", model=MODEL_NAME)
             return
 
-        print(f"Model '{MODEL_NAME}' not found. Pulling... (This might take a while)")
+        log_event(logger, "model.pulling", model=MODEL_NAME)
         pull_resp = requests.post(f"{OLLAMA_HOST}/api/pull", json={"name": MODEL_NAME}, stream=True)
         # Consume stream to ensure it finishes
         for line in pull_resp.iter_lines():
             if line:
-                print(f"Pulling: {line.decode('utf-8')}")
-        print("Model pulled successfully.")
+                log_event(logger, "model.pull_progress", status=line.decode('utf-8'))
+        log_event(logger, "model.pulled", model=MODEL_NAME)
 
-    except Exception as e:
-        print(f"Error checking/pulling model: {e}")
+    except Exception:
+        logger.exception("model.pull_failed")
+
+def build_system_prompt(user_instruction, with_context=False):
+    """
+    Builds the system prompt with the few-shot examples most relevant to the
+    user's instruction (see examples.py) instead of a fixed example list.
+    """
+    examples = format_examples(example_retriever.retrieve(user_instruction))
+    return render_system_prompt(examples, USER_SERVICE_HOST, with_context=with_context)
 
 def chat_with_ollama(user_instruction):
     """
     Sends the user prompt to Ollama with the specialized system prompt.
     Returns the raw response text.
     """
-    system_prompt = f"""
-You are a helpful Agent that can ONLY perform two types of actions: bash commands or API requests.
-You must reply with ONLY valid JSON. No markdown, no explanations, ONLY JSON.
-
-AVAILABLE ACTIONS:
-
-1. "bash" - Execute a shell command
-   Example: {{"action": "bash", "command": "ls -la"}}
-
-2. "api" - Make an HTTP API request
-   Example: {{"action": "api", "api": {{"method": "GET", "url": "https://jsonplaceholder.typicode.com/todos/1", "headers": {{}}, "body": {{}}}}}}
-
-IMPORTANT RULES:
-- ONLY use "action": "bash" or "action": "api"
-- DO NOT use any other action types (no "email", no "search", etc)
-- For user management, use API calls to http://user-service:{USER_SERVICE_PORT}/users
-- To add a user, use: {{"action": "api", "api": {{"method": "POST", "url": "http://user-service:{USER_SERVICE_PORT}/users", "headers": {{}}, "body": {{"name": "Name", "city": "City", "email": "email@example.com"}}}}}}
-- To list users, use: {{"action": "api", "api": {{"method": "GET", "url": "http://user-service:{USER_SERVICE_PORT}/users", "headers": {{}}, "body": {{}}}}}}
-- To delete a user, use: {{"action": "api", "api": {{"method": "DELETE", "url": "http://user-service:{USER_SERVICE_PORT}/users/USER_ID", "headers": {{}}, "body": {{}}}}}}
-
-Return ONLY JSON matching one of the two action formats above.
-"""
-    
-    payload = {
-        "model": MODEL_NAME,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_instruction}
-        ],
-        "stream": False,
-         "format": "json" # Ollama supports forcing JSON mode with newer models
-    }
+    payload = build_chat_payload(MODEL_NAME, [
+        {"role": "system", "content": build_system_prompt(user_instruction)},
+        {"role": "user", "content": user_instruction}
+    ])
 
     try:
         resp = requests.post(f"{OLLAMA_HOST}/api/chat", json=payload)
@@ -105,7 +155,7 @@ Return ONLY JSON matching one of the two action formats above.
     except Exception as e:
         return json.dumps({"error": str(e)})
 
-def chat_with_ollama_with_history(user_instruction, message_history):
+def chat_with_ollama_with_history(user_instruction, message_history, llm_options=None):
     """
     Sends the user prompt to Ollama WITH full conversation history.
     This allows the LLM to maintain context across multiple exchanges.
@@ -113,56 +163,93 @@ def chat_with_ollama_with_history(user_instruction, message_history):
     Args:
         user_instruction: Current user prompt
         message_history: List of previous message dicts (role/content)
+        llm_options: Generation options from parse_llm_options (defaults from env)
 
     Returns:
         Raw response text from Ollama
     """
-    system_prompt = f"""
-You are a helpful Agent that can ONLY perform two types of actions: bash commands or API requests.
-You must reply with ONLY valid JSON. No markdown, no explanations, ONLY JSON.
-
-AVAILABLE ACTIONS:
-
-1. "bash" - Execute a shell command
-   Example: {{"action": "bash", "command": "ls -la"}}
-
-2. "api" - Make an HTTP API request
-   Example: {{"action": "api", "api": {{"method": "GET", "url": "https://jsonplaceholder.typicode.com/todos/1", "headers": {{}}, "body": {{}}}}}}
-
-IMPORTANT RULES:
-- ONLY use "action": "bash" or "action": "api"
-- DO NOT use any other action types (no "email", no "search", etc)
-- For user management, use API calls to http://user-service:{USER_SERVICE_PORT}/users
-- To add a user, use: {{"action": "api", "api": {{"method": "POST", "url": "http://user-service:{USER_SERVICE_PORT}/users", "headers": {{}}, "body": {{"name": "Name", "city": "City", "email": "email@example.com"}}}}}}
-- To list users, use: {{"action": "api", "api": {{"method": "GET", "url": "http://user-service:{USER_SERVICE_PORT}/users", "headers": {{}}, "body": {{}}}}}}
-- To delete a user, use: {{"action": "api", "api": {{"method": "DELETE", "url": "http://user-service:{USER_SERVICE_PORT}/users/USER_ID", "headers": {{}}, "body": {{}}}}}}
-
-CONTEXT AWARENESS:
-- You can now remember previous commands and their results from this conversation
-- Use pronouns like "it", "that folder", "the file" when referring to previous context
-- When the user says "create X in it" or "add Y there", refer to the conversation history to understand the context
-
-Return ONLY JSON matching one of the two action formats above.
-"""
+    system_prompt = build_system_prompt(user_instruction, with_context=True)
 
     # Build full message array: system + all history
     messages = [{"role": "system", "content": system_prompt}]
     messages.extend(message_history)
 
-    payload = {
-        "model": MODEL_NAME,
-        "messages": messages,
-        "stream": False,
-        "format": "json"
-    }
+    payload = build_chat_payload(MODEL_NAME, messages, llm_options)
 
     try:
-        resp = requests.post(f"{OLLAMA_HOST}/api/chat", json=payload)
-        resp_data = resp.json()
-        return resp_data.get("message", {}).get("content", "{}")
+        with start_span("ollama.chat", model=MODEL_NAME, message_count=len(messages),
+                        num_predict=payload["options"].get("num_predict"),
+                        temperature=payload["options"].get("temperature")) as span:
+            key = request_key(MODEL_NAME, messages, {"options": payload["options"], "format": payload.get("format")})
+            content, shared = llm_flight.do(key, post_ollama_chat, payload)
+            span.set_attribute("coalesced", shared)
+        return content
     except Exception as e:
         return json.dumps({"error": str(e)})
 
+def post_ollama_chat(payload):
+    """Sends a chat payload to Ollama and returns the message content."""
+    resp = requests.post(f"{OLLAMA_HOST}/api/chat", json=payload,
+                         headers={"traceparent": current_traceparent()})
+    resp_data = resp.json()
+    if resp_data.get("done_reason") == "length":
+        # Output hit num_predict; the plan is probably cut off
+        log_event(logger, "ollama.truncated", level=logging.WARNING,
+                  num_predict=payload.get("options", {}).get("num_predict"), eval_count=resp_data.get("eval_count"))
+    return resp_data.get("message", {}).get("content", "{}")
+
+# --- REQUEST CONTEXT ---
+
+@app.before_request
+def start_request_context():
+    """Assigns a request ID (honouring X-Request-ID) and starts the stage timer."""
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    g.timer = StageTimer()
+    g.request_id_token = request_id_var.set(g.request_id)
+    # Continue the caller's trace (W3C traceparent) or start a new one
+    g.span = start_span(f"{request.method} {request.path}",
+                        traceparent=request.headers.get("traceparent"),
+                        request_id=g.request_id)
+
+@app.after_request
+def finish_request_context(response):
+    response.headers["X-Request-ID"] = g.get("request_id", "")
+    span = g.get("span")
+    if span is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        response.headers["traceparent"] = span.traceparent
+    decision = g.get("rate_limit")
+    if decision is not None:
+        response.headers.update(decision.headers())
+    return response
+
+@app.teardown_request
+def clear_request_context(exc):
+    span = g.pop("span", None)
+    if span is not None:
+        span.end("error" if exc is not None or span.attributes.get("http.status_code", 200) >= 500 else None)
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        request_id_var.reset(token)
+    session_id_var.set(None)
+
+def parse_action_plan(llm_response_text):
+    """
+    Parses the LLM response as a JSON action plan (handles markdown-wrapped JSON).
+    Returns None if it is not valid JSON.
+    """
+    # Try to extract JSON from markdown code blocks if present
+    json_match = JSON_BLOCK_RE.search(llm_response_text)
+    if json_match:
+        json_text = json_match.group(1).strip()
+    else:
+        json_text = llm_response_text.strip()
+
+    try:
+        return json.loads(json_text)
+    except json.JSONDecodeError:
+        return None
+
 # --- FLASK ROUTES ---
 
 @app.route("/", methods=["GET"])
@@ -170,10 +257,14 @@ def handle_index():
     return jsonify({
         "status": "ok",
         "message": "LLM Agent is running.",
+        "model": MODEL_NAME,  # Checked by the CLI to invalidate cached commands
         "endpoints": {
             "POST /chat": "Interact with the LLM agent",
             "GET /health": "Check agent and Ollama health",
-            "GET /users": "List all users from user service"
+            "GET /users": "List all users from user service",
+            "GET /results/<ref_id>": "Full execution result of a trimmed /chat response",
+            "POST /jobs": "Run a /chat request in the background (returns a job ID)",
+            "GET /jobs/<id>": "Job status, partial output and result"
         }
         }), 200
 
@@ -201,14 +292,25 @@ def handle_users():
             "message": f"Failed to connect to user service: {str(e)}"
         }), 500
 
+@app.route("/results/<ref_id>", methods=["GET"])
+def handle_result(ref_id):
+    """Returns the full execution result behind a shaped /chat response."""
+    result = result_store.get(ref_id)
+    if result is None:
+        return jsonify({"error": "Result not found or expired"}), 404
+    return jsonify({"result_ref": ref_id, "execution_result": result})
+
 @app.route("/debug/session/<session_id>", methods=["GET"])
 def debug_session(session_id):
     """Debug endpoint to view conversation history for a session"""
-    if session_id in conversation_history:
+    history = conversation_history.get(session_id)
+    if history is not None:
+        messages = history.to_messages()
         return jsonify({
             "session_id": session_id,
-            "message_count": len(conversation_history[session_id]),
-            "messages": conversation_history[session_id]
+            "message_count": len(messages),
+            "messages": messages,
+            "turns": history.to_dict()["turns"]
         })
     else:
         return jsonify({"error": "Session not found"}), 404
@@ -218,17 +320,80 @@ def debug_sessions():
     """Debug endpoint to list all active sessions"""
     sessions = {}
     for sid, history in conversation_history.items():
+        turns = history.to_dict()["turns"]
         sessions[sid] = {
-            "message_count": len(history),
-            "last_message": history[-1] if history else None
+            "turn_count": len(turns),
+            "last_turn": turns[-1] if turns else None
         }
-    return jsonify({"sessions": sessions})
+    return jsonify({"sessions": sessions, "persistence": conversation_history.status()})
+
+@app.route("/debug/llm", methods=["GET"])
+def debug_llm():
+    """Debug endpoint showing in-flight and coalesced LLM requests"""
+    return jsonify({
+        "in_flight": llm_flight.in_flight(),
+        "executed": llm_flight.stats["executed"],
+        "coalesced": llm_flight.stats["coalesced"]
+    })
+
+@app.route("/debug/jobs", methods=["GET"])
+def debug_jobs():
+    """Debug endpoint showing job records by status"""
+    return jsonify(job_manager.stats())
+
+@app.route("/debug/profile/start", methods=["POST"])
+def start_profile():
+    """Starts the sampling profiler for `seconds` (default 30), sampling every `interval_ms`"""
+    params = request.get_json(silent=True) or request.args
+    try:
+        seconds = float(params.get("seconds", 30))
+        interval_ms = float(params["interval_ms"]) if params.get("interval_ms") is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "'seconds' and 'interval_ms' must be numbers"}), 400
+    if seconds <= 0 or (interval_ms is not None and interval_ms <= 0):
+        return jsonify({"error": "'seconds' and 'interval_ms' must be positive"}), 400
+    if not profiler.start(seconds, interval_ms):
+        return jsonify(dict(profiler.status(), error="Profiler is already running")), 409
+    log_event(logger, "profile.started", seconds=profiler.duration, interval_ms=interval_ms)
+    return jsonify(profiler.status())
+
+@app.route("/debug/profile/stop", methods=["POST"])
+def stop_profile():
+    """Stops the sampling profiler early"""
+    profiler.stop()
+    return jsonify(profiler.status())
+
+@app.route("/debug/profile", methods=["GET"])
+def profile_status():
+    """Sampling profiler status"""
+    return jsonify(profiler.status())
+
+@app.route("/debug/profile/folded", methods=["GET"])
+def download_profile():
+    """Folded stacks of the last profiling run (input for flamegraph.pl or speedscope)"""
+    return Response(profiler.folded(), mimetype="text/plain",
+                    headers={"Content-Disposition": "attachment; filename=agent-profile.folded"})
+
+@app.route("/debug/slow-requests", methods=["GET"])
+def debug_slow_requests():
+    """Debug endpoint listing captured slow /chat requests, slowest first"""
+    return jsonify({"threshold_ms": slow_requests.threshold_ms, "captured": slow_requests.captured,
+                    "requests": slow_requests.entries()})
+
+@app.route("/debug/slow-requests", methods=["DELETE"])
+def clear_slow_requests():
+    slow_requests.clear()
+    return jsonify({"status": "success", "message": "Cleared slow requests"})
+
+@app.route("/debug/intents", methods=["GET"])
+def debug_intents():
+    """Debug endpoint showing intent matcher hit rate and shadow-mode accuracy"""
+    return jsonify(dict(intent_matcher.report(), enabled=INTENT_MATCHER_ENABLED, shadow_mode=INTENT_SHADOW_MODE))
 
 @app.route("/debug/session/<session_id>", methods=["DELETE"])
 def clear_session(session_id):
     """Clear conversation history for a specific session"""
-    if session_id in conversation_history:
-        del conversation_history[session_id]
+    if conversation_history.pop(session_id) is not None:
         return jsonify({"status": "success", "message": f"Cleared session {session_id}"})
     else:
         return jsonify({"error": "Session not found"}), 404
@@ -239,97 +404,261 @@ def clear_all_sessions():
     conversation_history.clear()
     return jsonify({"status": "success", "message": "Cleared all sessions"})
 
-@app.route("/chat", methods=["POST"])
-def handle_chat():
-    data = request.json
-    user_prompt = data.get("prompt")
-    session_id = data.get("session_id", "default")  # Get session ID or use "default"
-
-    if not user_prompt:
-        return jsonify({"error": "No prompt provided"}), 400
-
-    print(f"[Session: {session_id}] Received prompt: {user_prompt}")
-
-    # Initialize conversation history for this session if it doesn't exist
-    if session_id not in conversation_history:
-        conversation_history[session_id] = []
-        print(f"[Session: {session_id}] Started new conversation")
-
-    # Add user message to history
-    conversation_history[session_id].append({
-        "role": "user",
-        "content": user_prompt
-    })
+def record_if_slow(endpoint, user_prompt, session_id, body, status, timer, **details):
+    """Captures the request in the slow-request buffer when it exceeded the threshold."""
+    plan = body.get("llm_plan") or {}
+    span = current_span()
+    slow_requests.record(
+        timer.total_ms(), endpoint=endpoint, request_id=request_id_var.get(),
+        trace_id=span.trace_id if span else None, session_id=session_id,
+        prompt=truncate(user_prompt, 200), source=body.get("source"), action=plan.get("action"),
+        status_code=status, execution_status=(body.get("execution_result") or {}).get("status"),
+        timings_ms=dict(timer.timings), **details
+    )
 
-    # Debug: Print conversation history if DEBUG is enabled
-    if DEBUG:
-        print(f"[Session: {session_id}] Conversation history has {len(conversation_history[session_id])} messages")
-        for i, msg in enumerate(conversation_history[session_id]):
-            content_preview = msg['content'][:100] if len(msg['content']) > 100 else msg['content']
-            print(f"  [{i}] {msg['role']}: {content_preview}...")
-
-    # 1. Ask LLM with full conversation history
-    llm_response_text = chat_with_ollama_with_history(
-        user_prompt,
-        conversation_history[session_id]
+def record_traffic(user_prompt, session_id, messages, llm_options, body, timer):
+    """Appends the request, its LLM input and the outcome to RECORD_FILE (when enabled)."""
+    if not traffic_recorder.enabled:
+        return
+    execution_result = body.get("execution_result")
+    traffic_recorder.record(
+        request_id=request_id_var.get(), session_id=session_id, prompt=user_prompt,
+        messages=messages, model=MODEL_NAME, llm_options=llm_options, source=body.get("source", "llm"),
+        plan=body.get("llm_plan"), raw_response=body.get("raw_response"),
+        status=(execution_result or {}).get("status", "error" if execution_result else "parse_failed"),
+        result=shape_result(execution_result, max_chars=RECORD_RESULT_CHARS) if execution_result else None,
+        timings_ms=dict(timer.timings), total_ms=timer.total_ms()
     )
-    print(f"[Session: {session_id}] LLM Response: {llm_response_text}")
 
-    # 2. Parse JSON (handle markdown-wrapped JSON)
-    try:
-        # Try to extract JSON from markdown code blocks if present
-        import re
-        json_match = re.search(r'```(?:json)?\s*\n?(.*?)\n?```', llm_response_text, re.DOTALL)
-        if json_match:
-            json_text = json_match.group(1).strip()
-        else:
-            json_text = llm_response_text.strip()
+def check_client_rate_limit():
+    """
+    Takes a token for the calling client (a known API key, or its IP and
+    session_id). Returns a 429 response when the client is over its limit, else None.
+    """
+    data = request.get_json(silent=True)
+    session_id = data.get("session_id") if isinstance(data, dict) else None
+    clients = rate_limiter.client_keys(api_key=request.headers.get("X-API-Key"),
+                                       session_id=session_id, ip=request.remote_addr)
+    decision = g.rate_limit = rate_limiter.hit_client(clients)
+    if decision is None or decision.allowed:
+        return None
+    log_event(logger, "chat.rate_limited", level=logging.WARNING,
+              client=clients[0].partition(":")[0], retry_after=round(decision.retry_after, 2))
+    return jsonify({"error": "Rate limit exceeded", "retry_after": math.ceil(decision.retry_after)}), 429
+
+def execute_api_limited(api_details, timeout=10):
+    """Runs execute_api unless the destination domain is over its rate limit."""
+    url = api_details.get("url")
+    is_valid, _ = validate_api_request(url)
+    if is_valid:
+        hostname = urlparse(url).hostname
+        decision = rate_limiter.hit_domain(hostname)
+        if decision is not None and not decision.allowed:
+            log_event(logger, "api.rate_limited", level=logging.WARNING,
+                      domain=hostname, retry_after=round(decision.retry_after, 2))
+            return {"status": "error",
+                    "output": f"Rate limit for {hostname} exceeded, retry in {math.ceil(decision.retry_after)}s",
+                    "retry_after": math.ceil(decision.retry_after)}
+    # Trace context stays inside our services; external APIs do not get our trace IDs
+    extra_headers = {"traceparent": current_traceparent()} if is_internal_url(url) else None
+    return execute_api(api_details, extra_headers=extra_headers, timeout=timeout)
+
+def parse_chat_request(data):
+    """
+    Validates a /chat or /jobs body.
+    Returns (prompt, session_id, shape_options, llm_options) or raises ValueError.
+    """
+    if not isinstance(data, dict) or not data.get("prompt"):
+        raise ValueError("No prompt provided")
+    session_id = data.get("session_id", "default")  # Get session ID or use "default"
+    return data["prompt"], session_id, parse_shape_options(data), parse_llm_options(data.get("llm_options"))
 
-        action_plan = json.loads(json_text)
-    except json.JSONDecodeError:
-        return jsonify({
+def process_chat(user_prompt, session_id, shape_options, timer, llm_options=None, command_timeout=10,
+                 on_output=None):
+    """
+    Plans and executes one prompt: intent or LLM plan, action execution,
+    result shaping and history update.
+    Returns (response_body, http_status). Used by /chat and background jobs.
+    """
+    session_id_var.set(session_id)
+    log_payload = should_log_payload(DEBUG)
+    log_event(logger, "chat.received", prompt_chars=len(user_prompt),
+              **({"prompt": user_prompt} if log_payload else {}))
+
+    # Initialize conversation history for this session if it doesn't exist
+    # (in one step, since the snapshot thread may expire sessions at any time)
+    new_history = SessionHistory()
+    history = conversation_history.setdefault(session_id, new_history)
+    if history is new_history:
+        log_event(logger, "session.created")
+
+    # Render the messages for the LLM from the completed turns, then add the prompt.
+    # Concurrent retries in a session render the same messages, so their
+    # LLM calls are coalesced (see llm_flight)
+    turn, messages = history.start_turn(user_prompt)
+
+    # Verbose history dump only for sampled requests (always in DEBUG mode)
+    if log_payload:
+        log_event(logger, "chat.history", message_count=len(messages),
+                  history=[f"{msg['role']}: {truncate(msg['content'], 100)}" for msg in messages])
+
+    # 1. Answer common prompts directly, otherwise ask LLM with full conversation history
+    with timer.stage("intent"):
+        intent = intent_matcher.match(user_prompt) if INTENT_MATCHER_ENABLED else None
+
+    if intent:
+        action_plan = intent.plan
+        llm_response_text = json.dumps(action_plan)
+        if INTENT_SHADOW_MODE:
+            intent_matcher.shadow_check(
+                user_prompt, intent,
+                lambda: parse_action_plan(chat_with_ollama_with_history(user_prompt, messages, llm_options))
+            )
+    else:
+        with timer.stage("llm"):
+            llm_response_text = chat_with_ollama_with_history(user_prompt, messages, llm_options)
+        if log_payload:
+            log_event(logger, "chat.llm_response", response=llm_response_text)
+
+        # 2. Parse JSON (handle markdown-wrapped JSON)
+        action_plan = parse_action_plan(llm_response_text)
+
+    if action_plan is None:
+        history.finish_turn(turn)
+        log_event(logger, "chat.parse_failed", level=logging.WARNING,
+                  response=llm_response_text, timings_ms=timer.timings, total_ms=timer.total_ms())
+        body = {
             "error": "Failed to parse LLM response as JSON",
             "raw_response": llm_response_text
-        }), 500
+        }
+        record_traffic(user_prompt, session_id, messages, llm_options, body, timer)
+        return body, 500
 
     # 3. Execute Action
     action_type = action_plan.get("action")
     execution_result = {}
 
-    if action_type == "bash":
-        cmd = action_plan.get("command")
-        execution_result = execute_bash(cmd)
-
-    elif action_type == "api":
-        api_details = action_plan.get("api", {})
-        execution_result = execute_api(api_details)
+    with timer.stage("execute"), start_span(f"action.{action_type}") as span:
+        if action_type == "bash":
+            cmd = action_plan.get("command")
+            execution_result = execute_bash(cmd, timeout=command_timeout, on_output=on_output)
 
-    else:
-        execution_result = {"error": f"Unknown action: {action_type}"}
-
-    # Add assistant response to history
-    # Format it clearly so the LLM understands what command it generated
-    if action_type == "bash":
-        assistant_content = f"I suggested the bash command: {action_plan.get('command', 'N/A')}"
-    elif action_type == "api":
-        api_details = action_plan.get("api", {})
-        assistant_content = f"I suggested an API call: {api_details.get('method', 'GET')} {api_details.get('url', 'N/A')}"
-    else:
-        assistant_content = llm_response_text  # Fallback to raw response
-
-    conversation_history[session_id].append({
-        "role": "assistant",
-        "content": assistant_content
-    })
+        elif action_type == "api":
+            api_details = action_plan.get("api", {})
+            span.set_attribute("http.url", str(api_details.get("url")))
+            execution_result = execute_api_limited(api_details, timeout=command_timeout)
 
-    print(f"[Session: {session_id}] Conversation length: {len(conversation_history[session_id])} messages")
+        else:
+            execution_result = {"error": f"Unknown action: {action_type}"}
+        span.set_attribute("status", execution_result.get("status", "error"))
+
+    # Trim large results; the full one stays available by reference
+    if not shape_options["full"]:
+        with timer.stage("shape"):
+            shaped_result = shape_result(execution_result, fields=shape_options["fields"],
+                                         max_items=shape_options["max_items"],
+                                         max_chars=shape_options["max_chars"])
+            if shaped_result is not execution_result:
+                shaped_result["result_ref"] = result_store.put(execution_result)
+                execution_result = shaped_result
+
+    # Record the action and a digest of its result for follow-up prompts
+    history.record_action(action_plan, execution_result, raw_response=llm_response_text, turn=turn)
+
+    log_event(logger, "chat.completed", action=action_type, intent=intent.name if intent else None,
+              status=execution_result.get("status", "error"),
+              history_length=len(history),
+              timings_ms=timer.timings, total_ms=timer.total_ms(),
+              trace_id=current_span().trace_id if current_span() else None)
 
     # 4. Return result with session_id
-    return jsonify({
+    body = {
         "llm_plan": action_plan,
         "execution_result": execution_result,
-        "session_id": session_id  # Return session ID so client can reuse it
-    })
+        "session_id": session_id,  # Return session ID so client can reuse it
+        "model": MODEL_NAME,  # Lets clients key cached commands by model
+        "source": f"intent:{intent.name}" if intent else "llm"
+    }
+    record_traffic(user_prompt, session_id, messages, llm_options, body, timer)
+    return body, 200
+
+@app.route("/chat", methods=["POST"])
+def handle_chat():
+    try:
+        user_prompt, session_id, shape_options, llm_options = parse_chat_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limited = check_client_rate_limit()
+    if limited:
+        return limited
+    body, status = process_chat(user_prompt, session_id, shape_options, g.timer, llm_options)
+    record_if_slow("/chat", user_prompt, session_id, body, status, g.timer)
+    return jsonify(body), status
+
+# --- BACKGROUND JOBS ---
+
+def run_chat_job(job, user_prompt, session_id, shape_options, llm_options):
+    """Runs process_chat for a job, streaming bash output into the job record."""
+    timer = StageTimer()
+    with start_span("job.run", job_id=job.id):
+        body, status = process_chat(user_prompt, session_id, shape_options, timer, llm_options,
+                                    command_timeout=JOB_COMMAND_TIMEOUT, on_output=job.append_output)
+    job.timings.update(timer.timings)
+    record_if_slow("/jobs", user_prompt, session_id, body, status, timer, job_id=job.id)
+    execution_status = body.get("execution_result", {}).get("status") if status == 200 else None
+    return body, status == 200 and execution_status == "success"
+
+def notify_job_callback(job):
+    """POSTs the finished job to its callback URL."""
+    try:
+        resp = requests.post(job.callback_url, json=job.to_dict(include_output=False), timeout=10,
+                             headers={"traceparent": current_traceparent()})
+        return {"delivered": resp.status_code < 400, "status_code": resp.status_code}
+    except requests.exceptions.RequestException as e:
+        log_event(logger, "job.callback_failed", level=logging.WARNING, job_id=job.id, error=str(e))
+        return {"delivered": False, "error": str(e)}
+
+job_manager = JobManager(notify=notify_job_callback)
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queues a /chat request on the background pool and returns its job ID immediately."""
+    data = request.get_json(silent=True)
+    try:
+        user_prompt, session_id, shape_options, llm_options = parse_chat_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    limited = check_client_rate_limit()
+    if limited:
+        return limited
+
+    callback_url = data.get("callback_url")
+    if callback_url is not None:
+        is_valid, msg = validate_api_request(callback_url) if isinstance(callback_url, str) else (False, "Invalid URL")
+        if not is_valid:
+            return jsonify({"error": f"Invalid callback_url: {msg}"}), 400
+
+    try:
+        job = job_manager.submit(run_chat_job, user_prompt, session_id, shape_options, llm_options,
+                                 callback_url=callback_url)
+    except JobLimitError as e:
+        return jsonify({"error": f"Too many jobs in progress: {e}"}), 503
+
+    log_event(logger, "job.submitted", job_id=job.id, session=session_id)
+    response = jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"})
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return response, 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Job status, partial output (bash stdout so far), timings and result."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    include_output = request.args.get("output", "true").lower() not in ("false", "0", "no")
+    return jsonify(job.to_dict(include_output=include_output))
+
 
 if __name__ == "__main__":
     wait_for_ollama()
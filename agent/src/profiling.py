@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+
+# --- PROFILING CONFIGURATION ---
+
+# /chat requests slower than this are captured for /debug/slow-requests (0 disables)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 5000))
+# Number of slow requests kept (oldest dropped first)
+SLOW_REQUEST_BUFFER = int(os.environ.get("SLOW_REQUEST_BUFFER", 50))
+# Longest allowed profiling run (seconds)
+PROFILE_MAX_SECONDS = int(os.environ.get("PROFILE_MAX_SECONDS", 300))
+# Default interval between stack samples (milliseconds)
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+
+# --- SAMPLING PROFILER ---
+
+def frame_label(frame):
+    """function (file:line) label for one stack frame; ';' is the folded-format separator."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def fold_stack(frame, thread_name):
+    """Returns the stack as 'thread;outermost;...;innermost'."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name.replace(";", ":"))
+    return ";".join(reversed(labels))
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for all threads in the process.
+
+    A background thread snapshots every other thread's stack with
+    sys._current_frames() at a fixed interval and counts identical stacks.
+    folded() returns the counts in the folded-stack format read by
+    flamegraph.pl, speedscope and similar tools. Idle threads (e.g. workers
+    waiting for a request) are sampled too, which shows where wall time goes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self.samples = 0
+        self.interval = None
+        self.started_at = None
+        self.stopped_at = None
+        self.duration = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, interval_ms=None):
+        """Starts a run that stops by itself after `seconds`; returns False if one is running."""
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.interval = (interval_ms or PROFILE_INTERVAL_MS) / 1000
+            self.duration = min(seconds, PROFILE_MAX_SECONDS)
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stops the current run (if any) and waits for the sampler to exit."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != own_id:
+                        self._stacks[fold_stack(frame, names.get(thread_id, str(thread_id)))] += 1
+                self.samples += 1
+            del frames
+            self._stop.wait(self.interval)
+        self.stopped_at = time.time()
+
+    def folded(self):
+        """Folded stacks ('frame;frame;frame count' per line), most frequent first."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": self.running,
+                "samples": self.samples,
+                "unique_stacks": len(self._stacks),
+                "interval_ms": round(self.interval * 1000, 3) if self.interval else None,
+                "duration_s": self.duration,
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at,
+            }
+
+# --- SLOW REQUEST CAPTURE ---
+
+class SlowRequestLog:
+    """Ring buffer of requests slower than a threshold."""
+
+    def __init__(self, threshold_ms=None, maxlen=None):
+        self.threshold_ms = SLOW_REQUEST_MS if threshold_ms is None else threshold_ms
+        self._entries = deque(maxlen=maxlen or SLOW_REQUEST_BUFFER)
+        self._lock = threading.Lock()
+        self.captured = 0
+
+    def record(self, total_ms, **details):
+        """Keeps the request if it took at least threshold_ms; returns True if kept."""
+        if self.threshold_ms <= 0 or total_ms < self.threshold_ms:
+            return False
+        with self._lock:
+            self._entries.append(dict(details, total_ms=total_ms, ts=round(time.time(), 3)))
+            self.captured += 1
+        return True
+
+    def entries(self):
+        """Captured requests, slowest first."""
+        with self._lock:
+            return sorted(self._entries, key=lambda entry: -entry["total_ms"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
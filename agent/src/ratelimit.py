@@ -0,0 +1,259 @@
+import os
+import re
+import math
+import time
+import sqlite3
+import threading
+
+# --- RATE LIMIT CONFIGURATION ---
+
+# Inbound /chat and /jobs requests per client, e.g. "60/minute" ("off" disables)
+RATE_LIMIT_CHAT = os.environ.get("RATE_LIMIT_CHAT", "60/minute")
+# Outbound execute_api calls per destination domain
+RATE_LIMIT_API = os.environ.get("RATE_LIMIT_API", "120/minute")
+# Per-domain overrides, e.g. "jsonplaceholder.typicode.com=10/minute,httpbin.org=off"
+RATE_LIMIT_DOMAINS = os.environ.get("RATE_LIMIT_DOMAINS", "")
+# Client identities. The IP is always limited; "session" adds a bucket per session_id and
+# "api_key" gives clients with a known X-API-Key (RATE_LIMIT_API_KEYS) their own bucket instead
+RATE_LIMIT_KEYS = os.environ.get("RATE_LIMIT_KEYS", "api_key,ip")
+# Comma-separated API keys that are trusted as a client identity
+RATE_LIMIT_API_KEYS = os.environ.get("RATE_LIMIT_API_KEYS", "")
+# memory (per process) or sqlite (shared by every worker using RATE_LIMIT_DB)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB = os.environ.get("RATE_LIMIT_DB", "/tmp/agent-ratelimit.db")
+
+# Buckets that have refilled completely are forgotten once this many keys exist
+RATE_LIMIT_MAX_KEYS = 10000
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(?:(\d+)\s*)?(second|minute|hour|day)s?\s*$")
+
+# --- IMPLEMENTATION ---
+
+class Rate:
+    """A bucket size and refill speed: `capacity` requests per `period` seconds."""
+
+    __slots__ = ("capacity", "period")
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+
+    @property
+    def per_second(self):
+        return self.capacity / self.period
+
+    def __repr__(self):
+        return f"Rate({self.capacity}/{self.period}s)"
+
+def parse_rate(text):
+    """
+    Parses "60/minute", "5/second" or "100/10 minutes" into a Rate.
+    Returns None for "", "off", "none" or "0" (no limit).
+    """
+    if text is None or text.strip().lower() in ("", "off", "none", "0"):
+        return None
+    m = RATE_RE.match(text.lower())
+    if not m or int(m.group(1)) == 0:
+        raise ValueError(f"Invalid rate limit: {text!r} (expected e.g. 60/minute)")
+    return Rate(int(m.group(1)), int(m.group(2) or 1) * PERIODS[m.group(3)])
+
+def parse_domain_rates(text):
+    """Parses "host=rate,host=rate" overrides into {host: Rate or None}."""
+    rates = {}
+    for item in text.split(","):
+        if item.strip():
+            host, _, rate = item.partition("=")
+            rates[host.strip().lower()] = parse_rate(rate)
+    return rates
+
+class Decision:
+    """Outcome of taking a token: whether it was allowed and the quota left."""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after")
+
+    def __init__(self, allowed, limit, remaining, reset_after, retry_after):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self):
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+def refill(tokens, updated, now, rate):
+    """Tokens in a bucket after refilling it from `updated` to `now`."""
+    return min(float(rate.capacity), tokens + max(0.0, now - updated) * rate.per_second)
+
+def take(buckets, rate, cost):
+    """
+    Applies one request to refilled buckets (a list of token counts): tokens
+    are taken from every bucket or, if any of them is short, from none.
+    Returns [(new tokens, Decision)] in the same order.
+    """
+    allowed = all(tokens >= cost for tokens in buckets)
+    results = []
+    for tokens in buckets:
+        if allowed:
+            tokens -= cost
+        retry_after = 0.0 if allowed else max(0.0, cost - tokens) / rate.per_second
+        results.append((tokens, Decision(allowed, rate.capacity, int(tokens),
+                                         (rate.capacity - tokens) / rate.per_second, retry_after)))
+    return results
+
+class MemoryBackend:
+    """Buckets in a process-local dict (each gunicorn worker limits separately)."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, updated, time at which the bucket is full again)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, rate, cost=1, now=None):
+        return self.hit_all([key], rate, cost, now)[0]
+
+    def hit_all(self, keys, rate, cost=1, now=None):
+        """Takes a token from every bucket, or from none if any is empty; returns their Decisions."""
+        now = time.time() if now is None else now
+        with self._lock:
+            buckets = []
+            for key in keys:
+                tokens, updated, _ = self._buckets.get(key, (float(rate.capacity), now, now))
+                buckets.append(refill(tokens, updated, now, rate))
+            results = take(buckets, rate, cost)
+            for key, (tokens, decision) in zip(keys, results):
+                self._buckets[key] = (tokens, now, now + decision.reset_after)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return [decision for _, decision in results]
+
+    def _prune(self, now):
+        """Drops buckets that are full again; they behave exactly like new ones."""
+        for key in [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+            del self._buckets[key]
+
+class SQLiteBackend:
+    """
+    Buckets in a SQLite file shared by every worker on the host. Each hit
+    (of one or several buckets) is a read-modify-write in a single BEGIN
+    IMMEDIATE transaction, so concurrent workers never hand out the same
+    token twice.
+    """
+
+    def __init__(self, path, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        self._hits = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, rate, cost=1, now=None):
+        return self.hit_all([key], rate, cost, now)[0]
+
+    def hit_all(self, keys, rate, cost=1, now=None):
+        """Takes a token from every bucket, or from none if any is empty; returns their Decisions."""
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            buckets = []
+            for key in keys:
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens, updated = row if row else (float(rate.capacity), now)
+                buckets.append(refill(tokens, updated, now, rate))
+            results = take(buckets, rate, cost)
+            conn.executemany("INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                             [(key, tokens, now, now + decision.reset_after)
+                              for key, (tokens, decision) in zip(keys, results)])
+            # Occasionally forget full buckets so the table stays small
+            self._hits += 1
+            if self._hits % 1000 == 0:
+                count = conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+                if count > self.max_keys:
+                    conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [decision for _, decision in results]
+
+def create_backend(name=None, path=None):
+    name = (name or RATE_LIMIT_BACKEND).lower()
+    if name == "sqlite":
+        return SQLiteBackend(path or RATE_LIMIT_DB)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+class RateLimiter:
+    """
+    Token-bucket limits for inbound clients and outbound API domains.
+
+    client_keys() lists the buckets a request draws from: a known API key,
+    or else the client IP plus (optionally) its session. Headers and
+    session IDs are chosen by the client, so an unknown API key or a new
+    session never escapes the IP bucket. hit_client() and hit_domain()
+    return a Decision, or None when that limit is switched off.
+    """
+
+    def __init__(self, backend=None, chat_rate=None, api_rate=None, domain_rates=None, keys=None, api_keys=None):
+        self.backend = backend or create_backend()
+        self.chat_rate = parse_rate(RATE_LIMIT_CHAT) if chat_rate is None else chat_rate
+        self.api_rate = parse_rate(RATE_LIMIT_API) if api_rate is None else api_rate
+        self.domain_rates = parse_domain_rates(RATE_LIMIT_DOMAINS) if domain_rates is None else domain_rates
+        self.keys = {key.strip() for key in (keys or RATE_LIMIT_KEYS).split(",") if key.strip()}
+        self.api_keys = {key.strip() for key in (RATE_LIMIT_API_KEYS if api_keys is None else api_keys).split(",")
+                         if key.strip()}
+
+    def client_keys(self, api_key=None, session_id=None, ip=None):
+        """Bucket keys for a request; it is limited by all of them."""
+        if "api_key" in self.keys and api_key and api_key in self.api_keys:
+            return [f"api_key:{api_key}"]
+        keys = [f"ip:{ip or 'unknown'}"]
+        if "session" in self.keys and session_id:
+            keys.append(f"session:{session_id}")
+        return keys
+
+    def hit_client(self, client_keys, cost=1):
+        """
+        Takes a token from every bucket if all of them allow the request (a
+        denied request costs nothing); returns the most restrictive Decision.
+        """
+        if self.chat_rate is None:
+            return None
+        decisions = self.backend.hit_all([f"chat:{key}" for key in client_keys], self.chat_rate, cost)
+        if decisions[0].allowed:
+            return min(decisions, key=lambda decision: decision.remaining)
+        return max(decisions, key=lambda decision: decision.retry_after)
+
+    def hit_domain(self, hostname, cost=1):
+        hostname = (hostname or "").lower()
+        rate = self.domain_rates.get(hostname, self.api_rate)
+        if rate is None:
+            return None
+        return self.backend.hit(f"api:{hostname}", rate, cost)
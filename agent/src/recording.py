@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import queue
+import atexit
+import random
+import threading
+
+# --- TRAFFIC RECORDING CONFIGURATION ---
+
+# Append /chat and job requests (prompt, history, plan, result) to this JSONL file; empty disables
+RECORD_FILE = os.environ.get("RECORD_FILE", "")
+# Fraction of requests recorded
+RECORD_SAMPLE_RATE = float(os.environ.get("RECORD_SAMPLE_RATE", 1.0))
+# Longer strings in the recorded execution result are cut
+RECORD_RESULT_CHARS = int(os.environ.get("RECORD_RESULT_CHARS", 1000))
+
+# --- IMPLEMENTATION ---
+
+class TrafficRecorder:
+    """
+    Appends one JSON line per request to a local file, for replaying real
+    traffic against another model or prompt (scripts/replay.py).
+
+    record() only queues the line; a background thread writes queued lines
+    in batches, each with a single write() on a file opened with O_APPEND,
+    so gunicorn workers can share the file without interleaving records.
+    Requests never wait on the file or fail because of it: when the queue
+    is full or the write fails the records are counted as dropped and
+    on_error(exception, count) is called from the writer thread.
+    """
+
+    def __init__(self, path=None, sample_rate=None, max_queue=1024, on_error=None):
+        self.path = RECORD_FILE if path is None else path
+        self.sample_rate = RECORD_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.on_error = on_error
+        self.recorded = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                except OSError:
+                    pass  # Reported by the writer when the first record cannot be written
+
+    @property
+    def enabled(self):
+        return bool(self.path) and self.sample_rate > 0
+
+    def record(self, **fields):
+        """Queues a record (with a timestamp) if recording is on and sampled; returns True if queued."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        line = json.dumps(dict(fields, ts=round(time.time(), 3)), default=str) + "\n"
+        self._start()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="traffic-recorder", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while len(lines) < 256:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(lines)
+            for _ in lines:
+                self._queue.task_done()
+
+    def _write(self, lines):
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, "".join(lines).encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            with self._lock:
+                self.dropped += len(lines)
+            if self.on_error is not None:
+                self.on_error(e, len(lines))
+            return
+        with self._lock:
+            self.recorded += len(lines)
+
+    def flush(self):
+        """Waits until every queued record has been written (or dropped)."""
+        if self._thread is not None:
+            self._queue.join()
+
+def load_records(path):
+    """Yields the records of a recording file, skipping lines that do not parse (e.g. a torn last line)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("prompt"):
+                yield record
@@ -0,0 +1,298 @@
+import os
+import re
+import json
+import time
+import fcntl
+import atexit
+import threading
+from contextlib import contextmanager
+
+# --- SESSION PERSISTENCE CONFIGURATION ---
+
+# Append-only snapshot file for conversation history; empty keeps sessions in memory only
+SESSION_SNAPSHOT_FILE = os.environ.get("SESSION_SNAPSHOT_FILE", "")
+# Seconds between snapshots of changed sessions
+SESSION_SNAPSHOT_INTERVAL = float(os.environ.get("SESSION_SNAPSHOT_INTERVAL", 10))
+# Sessions idle for longer than this (seconds) are dropped from memory and the file (0 = never)
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 86400))
+# Compact once the file holds this many times more records than live sessions...
+SESSION_COMPACT_RATIO = float(os.environ.get("SESSION_COMPACT_RATIO", 3))
+# ...and at least this many records
+SESSION_COMPACT_MIN_RECORDS = int(os.environ.get("SESSION_COMPACT_MIN_RECORDS", 1000))
+
+# Every record starts with the session ID and timestamp, so superseded records
+# can be skipped without decoding their turns
+RECORD_HEAD_RE = re.compile(r'^\{"sid": ("(?:[^"\\]|\\.)*"), "ts": ([0-9.eE+-]+)(, "deleted": true)?')
+
+# --- SNAPSHOT FILE ---
+
+def encode_record(session_id, history=None):
+    """One JSON line: the session's turns, or a tombstone when history is None."""
+    if history is None:
+        record = {"sid": session_id, "ts": time.time(), "deleted": True}
+    else:
+        data = history.to_dict()  # one snapshot of turns and updated_at, under the session lock
+        record = {"sid": session_id, "ts": data["updated_at"], "turns": data["turns"]}
+    return json.dumps(record, default=str) + "\n"
+
+def record_head(line):
+    """Returns (session_id, ts, deleted) from the start of a record, or None if the line is damaged."""
+    if not line.endswith("\n"):
+        return None  # torn write
+    m = RECORD_HEAD_RE.match(line)
+    if m:
+        return json.loads(m.group(1)), float(m.group(2)), m.group(3) is not None
+    try:
+        record = json.loads(line)
+        return record["sid"], float(record["ts"]), bool(record.get("deleted"))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+class SnapshotFile:
+    """
+    Append-only JSONL file of session records; the last record for a
+    session wins and a tombstone ("deleted": true) removes it.
+
+    Appends, loads and compaction hold a flock on a sidecar .lock file, so
+    several gunicorn workers can share one snapshot file. Compaction
+    rewrites the file with the latest live record of every session
+    (including sessions written by other workers) and renames it in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        # Records in the file, as last seen by this process
+        self.records = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, mode=fcntl.LOCK_EX):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append(self, lines):
+        if not lines:
+            return
+        data = "".join(lines).encode("utf-8")
+        with self._locked():
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+        self.records += len(lines)
+
+    def _latest(self, expired_before):
+        """Streams the file and returns {session_id: raw line} for live sessions."""
+        latest = {}
+        self.records = 0
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return latest
+        with f:
+            for line in f:
+                head = record_head(line)
+                if head is None:
+                    continue
+                self.records += 1
+                sid, ts, deleted = head
+                latest[sid] = (ts, None if deleted else line)
+        return {sid: line for sid, (ts, line) in latest.items() if line is not None and ts >= expired_before}
+
+    def load(self, expired_before=0):
+        """Returns {session_id: {"turns", "updated_at"}} for sessions that are live and not expired."""
+        with self._locked(fcntl.LOCK_SH):
+            latest = self._latest(expired_before)
+        sessions = {}
+        for sid, line in latest.items():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            sessions[sid] = {"turns": record.get("turns", []), "updated_at": record["ts"]}
+        return sessions
+
+    def compact(self, expired_before=0):
+        """Rewrites the file with one record per live session; returns the number kept."""
+        with self._locked():
+            latest = self._latest(expired_before)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(latest.values())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        self.records = len(latest)
+        return len(latest)
+
+# --- SESSION STORE ---
+
+class SessionStore:
+    """
+    Conversation histories by session ID, with optional warm-restart
+    persistence.
+
+    Used like a dict by the request handlers (every access takes the store
+    lock, and flush() may expire a session at any time, so handlers use
+    get/setdefault/pop rather than `in` followed by an index); values are SessionHistory
+    objects (anything with updated_at and to_dict()), rebuilt from snapshot
+    records by `restore` (SessionHistory.from_dict). With a SnapshotFile, flush()
+    appends only the sessions changed since the previous flush plus
+    tombstones for deleted ones, drops sessions idle for longer than the
+    TTL and compacts the file when it has grown well past the number of
+    live sessions. load() restores the sessions at startup.
+    """
+
+    def __init__(self, snapshot_file=None, restore=None, ttl=None, compact_ratio=None, compact_min_records=None):
+        self.snapshot_file = snapshot_file
+        self.restore = restore
+        self.ttl = SESSION_TTL if ttl is None else ttl
+        self.compact_ratio = compact_ratio or SESSION_COMPACT_RATIO
+        self.compact_min_records = SESSION_COMPACT_MIN_RECORDS if compact_min_records is None else compact_min_records
+        self._sessions = {}
+        self._deleted = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"loaded": 0, "load_ms": None, "flushes": 0, "written": 0, "expired": 0, "compactions": 0}
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def __getitem__(self, session_id):
+        with self._lock:
+            return self._sessions[session_id]
+
+    def get(self, session_id, default=None):
+        with self._lock:
+            return self._sessions.get(session_id, default)
+
+    def setdefault(self, session_id, history):
+        """Returns the session's history, storing `history` first if there is none."""
+        with self._lock:
+            if session_id not in self._sessions:
+                self._sessions[session_id] = history
+                self._deleted.discard(session_id)
+            return self._sessions[session_id]
+
+    def __setitem__(self, session_id, history):
+        with self._lock:
+            self._sessions[session_id] = history
+            self._deleted.discard(session_id)
+
+    def __delitem__(self, session_id):
+        with self._lock:
+            del self._sessions[session_id]
+            self._deleted.add(session_id)
+
+    def pop(self, session_id, default=None):
+        with self._lock:
+            history = self._sessions.pop(session_id, None)
+            if history is None:
+                return default
+            self._deleted.add(session_id)
+            return history
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def items(self):
+        with self._lock:
+            return list(self._sessions.items())
+
+    def clear(self):
+        with self._lock:
+            self._deleted.update(self._sessions)
+            self._sessions.clear()
+
+    def _expired_before(self, now):
+        return now - self.ttl if self.ttl > 0 else 0
+
+    def load(self):
+        """Restores sessions from the snapshot file (compacting it if needed); returns the count."""
+        if self.snapshot_file is None:
+            return 0
+        start = time.perf_counter()
+        now = time.time()
+        sessions = self.snapshot_file.load(self._expired_before(now))
+        with self._lock:
+            for sid, record in sessions.items():
+                self._sessions.setdefault(sid, self.restore(record))
+        self._last_flush = now
+        self.stats["loaded"] = len(sessions)
+        self.stats["load_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self._maybe_compact(now)
+        return len(sessions)
+
+    def flush(self):
+        """Expires idle sessions and appends changed ones; returns the number of records written."""
+        with self._flush_lock:
+            now = time.time()
+            expired_before = self._expired_before(now)
+            with self._lock:
+                expired = [sid for sid, history in self._sessions.items() if history.updated_at < expired_before]
+                for sid in expired:
+                    del self._sessions[sid]
+                changed = [(sid, history) for sid, history in self._sessions.items()
+                           if history.updated_at >= self._last_flush]
+                deleted, self._deleted = self._deleted, set()
+            self.stats["expired"] += len(expired)
+            if self.snapshot_file is None:
+                return 0
+
+            # Sessions changed while encoding have a newer updated_at and go out next time
+            self._last_flush = now
+            lines = [encode_record(sid) for sid in deleted]
+            lines.extend(encode_record(sid, history) for sid, history in changed)
+            self.snapshot_file.append(lines)
+            self.stats["flushes"] += 1
+            self.stats["written"] += len(lines)
+            self._maybe_compact(now)
+            return len(lines)
+
+    def _maybe_compact(self, now):
+        records = self.snapshot_file.records
+        if records >= self.compact_min_records and records > self.compact_ratio * max(len(self._sessions), 1):
+            self.snapshot_file.compact(self._expired_before(now))
+            self.stats["compactions"] += 1
+
+    def start(self, interval=None):
+        """Loads the snapshot and flushes every `interval` seconds (and at exit) from a daemon thread."""
+        self.load()
+        interval = interval or SESSION_SNAPSHOT_INTERVAL
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="session-snapshots", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def stop(self):
+        """Stops the snapshot thread and writes the last changes."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def status(self):
+        return dict(self.stats, sessions=len(self._sessions),
+                    file=self.snapshot_file.path if self.snapshot_file else None,
+                    file_records=self.snapshot_file.records if self.snapshot_file else None)
+
+def create_session_store(restore, path=None):
+    """A SessionStore persisted to SESSION_SNAPSHOT_FILE when it is set."""
+    path = SESSION_SNAPSHOT_FILE if path is None else path
+    return SessionStore(SnapshotFile(path) if path else None, restore)
@@ -0,0 +1,140 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+
+# --- RESULT SHAPING CONFIGURATION ---
+
+# Longer strings (bash stdout/stderr, text bodies, JSON string values) are cut to this many characters
+RESULT_MAX_CHARS = int(os.environ.get("RESULT_MAX_CHARS", 4000))
+# Longer lists in API responses are cut to this many items
+RESULT_MAX_ITEMS = int(os.environ.get("RESULT_MAX_ITEMS", 50))
+# Number of full (unshaped) results kept for GET /results/<ref_id>
+RESULT_STORE_SIZE = int(os.environ.get("RESULT_STORE_SIZE", 100))
+
+# --- IMPLEMENTATION ---
+
+def parse_fields(fields):
+    """
+    Builds a projection tree from JSON paths such as "users[*].name" or
+    "users.email". Lists are traversed transparently, so "[*]" is optional.
+    An empty subtree means "keep the whole value".
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    tree = {}
+    for path in fields:
+        node = tree
+        for part in path.strip().replace("[*]", "").split("."):
+            if part and part != "*":
+                node = node.setdefault(part, {})
+    return tree
+
+def project(data, tree):
+    """Keeps only the parts of data selected by a parse_fields tree."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: project(value, tree[key]) for key, value in data.items() if key in tree}
+    return data
+
+def cap_text(text, max_chars):
+    """Returns (text, original length if it was cut else None)."""
+    if max_chars is None or len(text) <= max_chars:
+        return text, None
+    return text[:max_chars], len(text)
+
+def _shape_value(value, path, max_items, max_chars, notes):
+    if isinstance(value, str):
+        value, total = cap_text(value, max_chars)
+        if total is not None:
+            notes.append({"path": path, "total_chars": total, "kept_chars": max_chars})
+        return value
+    if isinstance(value, list):
+        if max_items is not None and len(value) > max_items:
+            notes.append({"path": path, "total": len(value), "kept": max_items})
+            value = value[:max_items]
+        return [_shape_value(item, f"{path}[{i}]", max_items, max_chars, notes) for i, item in enumerate(value)]
+    if isinstance(value, dict):
+        return {key: _shape_value(item, f"{path}.{key}", max_items, max_chars, notes) for key, item in value.items()}
+    return value
+
+def shape_result(execution_result, fields=None, max_items=None, max_chars=None):
+    """
+    Returns a copy of an execution result that is cheap to send and print:
+    API data is projected to the requested fields, long lists are truncated
+    and long strings capped. Every cut is listed under "truncated" with the
+    original size; the input is returned unchanged when nothing was cut.
+    """
+    if not isinstance(execution_result, dict):
+        return execution_result
+    max_items = RESULT_MAX_ITEMS if max_items is None else max_items
+    max_chars = RESULT_MAX_CHARS if max_chars is None else max_chars
+
+    notes = []
+    shaped = dict(execution_result)
+    if "data" in shaped:
+        data = shaped["data"]
+        if fields:
+            data = project(data, parse_fields(fields))
+        shaped["data"] = _shape_value(data, "data", max_items, max_chars, notes)
+        if fields:
+            shaped["fields"] = fields
+    for key in ("stdout", "stderr", "output"):
+        if isinstance(shaped.get(key), str):
+            shaped[key] = _shape_value(shaped[key], key, max_items, max_chars, notes)
+
+    if not notes and not fields:
+        return execution_result
+    if notes:
+        shaped["truncated"] = notes
+    return shaped
+
+def parse_shape_options(data):
+    """
+    Reads per-request shaping options from a /chat body:
+    fields (list or comma-separated string), max_items, max_chars and full.
+    Raises ValueError for malformed values.
+    """
+    options = {"fields": data.get("fields"), "full": bool(data.get("full", False))}
+    fields = options["fields"]
+    if fields is not None and not isinstance(fields, (str, list)):
+        raise ValueError("'fields' must be a list or a comma-separated string")
+    if isinstance(fields, list) and not all(isinstance(path, str) for path in fields):
+        raise ValueError("'fields' must contain only strings")
+    for key in ("max_items", "max_chars"):
+        value = data.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0):
+            raise ValueError(f"'{key}' must be a non-negative integer")
+        options[key] = value
+    return options
+
+class ResultStore:
+    """
+    Bounded store of full execution results, so a shaped response can point
+    at the complete data. Oldest results are evicted first.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = RESULT_STORE_SIZE if max_entries is None else max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result):
+        """Stores a result and returns its reference ID."""
+        ref_id = uuid.uuid4().hex
+        with self._lock:
+            self._results[ref_id] = result
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return ref_id
+
+    def get(self, ref_id):
+        with self._lock:
+            return self._results.get(ref_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
@@ -2,6 +2,7 @@ import subprocess
 import requests
 import json
 import shlex
+import threading
 from urllib.parse import urlparse
 
 # --- SAFETY CONFIGURATION ---
@@ -25,6 +26,9 @@ ALLOWED_DOMAINS = {
     "httpbin.org" # Good for testing
 }
 
+# Internal services; only these receive our trace context (traceparent) on API actions
+INTERNAL_DOMAINS = {"localhost", "127.0.0.1", "user-service"}
+
 # --- IMPLEMENTATION ---
 
 def validate_bash_command(command):
@@ -49,21 +53,26 @@ def validate_bash_command(command):
         
     return parts, "OK"
 
-def execute_bash(command):
+def execute_bash(command, timeout=10, on_output=None):
     """
     Executes a bash command if allowed.
     Returns a unified result dict.
+    on_output, if given, is called with each line of stdout as it is produced
+    (used by background jobs to expose partial output).
     """
     parts, msg = validate_bash_command(command)
     if not parts:
         return {"status": "error", "output": msg}
 
+    if on_output is not None:
+        return _execute_bash_streaming(parts, timeout, on_output)
+
     try:
         result = subprocess.run(
             parts, 
             capture_output=True, 
             text=True, 
-            timeout=10
+            timeout=timeout
         )
         
         return {
@@ -77,6 +86,44 @@ def execute_bash(command):
     except Exception as e:
         return {"status": "error", "output": str(e)}
 
+def _execute_bash_streaming(parts, timeout, on_output):
+    """Runs a validated command, reporting stdout line by line."""
+    try:
+        proc = subprocess.Popen(parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+    except Exception as e:
+        return {"status": "error", "output": str(e)}
+
+    # stderr is drained in the background so a chatty command cannot block on a full pipe
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    stderr_reader.start()
+    timed_out = threading.Event()
+
+    def kill():
+        timed_out.set()
+        proc.kill()
+
+    killer = threading.Timer(timeout, kill)
+    killer.start()
+    stdout_lines = []
+    try:
+        for line in proc.stdout:
+            stdout_lines.append(line)
+            on_output(line)
+        proc.wait()
+    finally:
+        killer.cancel()
+        stderr_reader.join()
+
+    if timed_out.is_set():
+        return {"status": "error", "output": "Command timed out", "stdout": "".join(stdout_lines)}
+    return {
+        "status": "success" if proc.returncode == 0 else "failure",
+        "stdout": "".join(stdout_lines),
+        "stderr": "".join(stderr_chunks),
+        "return_code": proc.returncode
+    }
+
 def validate_api_request(url):
     """
     Checks if the URL hostname is in the allowlist.
@@ -97,7 +144,14 @@ def validate_api_request(url):
     except Exception as e:
         return False, f"Error validating URL: {str(e)}"
 
-def execute_api(api_details):
+def is_internal_url(url):
+    """True when the URL points at one of our own services (INTERNAL_DOMAINS)."""
+    try:
+        return urlparse(url).hostname in INTERNAL_DOMAINS
+    except (TypeError, ValueError, AttributeError):
+        return False
+
+def execute_api(api_details, extra_headers=None, timeout=10):
     """
     Executes an HTTP API request.
     Expected dict structure:
@@ -107,10 +161,13 @@ def execute_api(api_details):
         "headers": {},
         "body": {}
     }
+    extra_headers (e.g. trace context) are added without overriding
+    headers from the plan. timeout is in seconds.
     """
     method = api_details.get("method", "GET").upper()
     url = api_details.get("url")
-    headers = api_details.get("headers", {})
+    headers = dict(extra_headers or {})
+    headers.update(api_details.get("headers") or {})
     body = api_details.get("body", {})
 
     is_valid, msg = validate_api_request(url)
@@ -123,7 +180,7 @@ def execute_api(api_details):
             url=url,
             headers=headers,
             json=body,
-            timeout=10
+            timeout=timeout
         )
         
         # Try to parse JSON response, fallback to text
@@ -0,0 +1,275 @@
+import os
+import re
+import json
+import time
+import queue
+import atexit
+import threading
+import contextvars
+
+# --- TRACING CONFIGURATION ---
+
+SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "agent")
+# Append finished spans as JSON lines to this file
+TRACE_EXPORT_FILE = os.environ.get("TRACE_EXPORT_FILE", "")
+# POST finished spans in OTLP/HTTP JSON format (e.g. http://collector:4318/v1/traces)
+TRACE_EXPORT_URL = os.environ.get("TRACE_EXPORT_URL", "")
+
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# --- W3C TRACE CONTEXT ---
+
+def new_trace_id():
+    return os.urandom(16).hex()
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+def parse_traceparent(header):
+    """
+    Parses a W3C traceparent header.
+    Returns (trace_id, parent_span_id, flags) or None if missing/invalid.
+    """
+    if not header:
+        return None
+    match = TRACEPARENT_RE.match(header.strip().lower())
+    if not match:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, flags
+
+def format_traceparent(trace_id, span_id, flags="01"):
+    return f"00-{trace_id}-{span_id}-{flags}"
+
+# --- SPANS ---
+
+class Span:
+    """
+    A timed unit of work within a trace.
+
+    Spans become the current span when started and restore the previous one
+    when ended, so nested spans pick up their parent automatically. They can
+    be used as context managers or ended explicitly (e.g. from Flask hooks).
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, flags="01", attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.flags = flags
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._token = _current_span.set(self)
+
+    @property
+    def traceparent(self):
+        return format_traceparent(self.trace_id, self.span_id, self.flags)
+
+    @property
+    def duration_ms(self):
+        end_ns = self.end_ns or time.time_ns()
+        return round((end_ns - self.start_ns) / 1e6, 3)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, status=None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if status:
+            self.status = status
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended from a different context than it was started in
+            _current_span.set(None)
+        get_exporter().export(self)
+
+    def to_dict(self):
+        return {
+            "service": SERVICE_NAME,
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.set_attribute("error", str(exc))
+        self.end("error" if exc_type is not None else None)
+        return False
+
+def start_span(name, traceparent=None, **attributes):
+    """
+    Starts a span and makes it current.
+
+    The parent is taken from an incoming traceparent header when given,
+    otherwise from the current span; with neither, a new trace is started.
+    """
+    remote = parse_traceparent(traceparent)
+    if remote:
+        trace_id, parent_id, flags = remote
+    else:
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id, parent_id, flags = parent.trace_id, parent.span_id, parent.flags
+        else:
+            trace_id, parent_id, flags = new_trace_id(), None, "01"
+    return Span(name, trace_id, parent_id, flags, attributes)
+
+def current_span():
+    return _current_span.get()
+
+def current_traceparent():
+    """Returns the traceparent header for the current span, or None."""
+    span = _current_span.get()
+    return span.traceparent if span else None
+
+# --- EXPORTERS ---
+
+class NoopExporter:
+    def export(self, span):
+        pass
+
+    def shutdown(self):
+        pass
+
+class BatchExporter:
+    """
+    Exports spans from a background thread in batches. export() only puts
+    the span on a bounded queue; when it is full new spans are dropped
+    (and counted) rather than slowing down requests. Subclasses implement
+    _send(spans).
+    """
+
+    def __init__(self, batch_size=64, flush_interval=2.0, max_queue=2048, name="span-exporter"):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._send(batch)
+
+    def _send(self, spans):
+        raise NotImplementedError
+
+    def shutdown(self):
+        """Sends the queued spans and stops the thread."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+class FileExporter(BatchExporter):
+    """Appends finished spans as JSON lines to a local file, one open/write per batch."""
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        super().__init__(name="file-exporter", **kwargs)
+
+    def _send(self, spans):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        try:
+            with open(self.path, "a") as f:
+                f.write(lines)
+        except OSError:
+            self.dropped += len(spans)
+
+class OTLPHttpExporter(BatchExporter):
+    """Sends spans to an OTLP/HTTP JSON endpoint in batches."""
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        super().__init__(name="otlp-exporter", **kwargs)
+
+    def _send(self, spans):
+        import requests
+        try:
+            requests.post(self.url, json=to_otlp_json(spans), timeout=5)
+        except requests.exceptions.RequestException:
+            self.dropped += len(spans)
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def to_otlp_json(spans):
+    """Converts spans to the OTLP/HTTP JSON request body."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "ollama-actions"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "startTimeUnixNano": str(span.start_ns),
+                    "endTimeUnixNano": str(span.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                    "status": {"code": 2 if span.status == "error" else 1},
+                } for span in spans],
+            }],
+        }]
+    }
+
+_exporter = None
+
+def get_exporter():
+    """Returns the configured exporter, created on first use."""
+    global _exporter
+    if _exporter is None:
+        if TRACE_EXPORT_URL:
+            _exporter = OTLPHttpExporter(TRACE_EXPORT_URL)
+        elif TRACE_EXPORT_FILE:
+            _exporter = FileExporter(TRACE_EXPORT_FILE)
+        else:
+            _exporter = NoopExporter()
+    return _exporter
+
+def set_exporter(exporter):
+    """Replaces the exporter (used by tests and custom setups)."""
+    global _exporter
+    _exporter = exporter
+
+atexit.register(lambda: _exporter.shutdown() if _exporter else None)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Modules shared with the user-service live in the repository's shared/ directory;
+# the Docker image copies them into src/, which is where they are found there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+shared = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared")
+if os.path.isdir(shared):
+    sys.path.insert(0, shared)
@@ -0,0 +1,85 @@
+import requests
+from src.examples import (
+    ExampleRetriever, VectorIndex, build_examples, format_examples, local_embed
+)
+
+class FailingEmbedder:
+    def embed(self, texts, timeout=None):
+        raise requests.exceptions.ConnectionError("ollama down")
+
+class KeywordEmbedder:
+    """Embeds texts on two axes: mentions users / mentions files."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, texts, timeout=None):
+        self.calls.append((list(texts), timeout))
+        return [[1.0 if "user" in t else 0.0, 1.0 if "file" in t or "folder" in t else 0.0] for t in texts]
+
+def test_local_embed_is_normalized():
+    """Tests that local vectors are unit length and deterministic."""
+    vector = local_embed("list all users")
+    assert abs(sum(x * x for x in vector) - 1.0) < 1e-9
+    assert vector == local_embed("list all users")
+
+def test_vector_index_returns_top_k():
+    """Tests that the index returns the most similar items first."""
+    index = VectorIndex()
+    index.add([1.0, 0.0], "a")
+    index.add([0.0, 1.0], "b")
+    index.add([0.7071, 0.7071], "c")
+    assert [item for _, item in index.search([1.0, 0.0], 2)] == ["a", "c"]
+
+def test_retriever_selects_relevant_examples():
+    """Tests that the local index picks user-service examples for user prompts."""
+    retriever = ExampleRetriever(build_examples("http://user-service:8001"), k=2)
+    examples = retriever.retrieve("remove the user with id 42")
+    assert examples[0]["action"]["api"]["method"] == "DELETE"
+    assert len(examples) == 2
+
+def test_retriever_uses_embedder_and_falls_back():
+    """Tests that a configured embedder is used, and failures fall back to local vectors."""
+    examples = build_examples("http://user-service:8001")
+    remote = ExampleRetriever(examples, embedder=KeywordEmbedder(), k=1)
+    assert "user" in remote.retrieve("show a user")[0]["prompt"]
+
+    fallback = ExampleRetriever(examples, embedder=FailingEmbedder(), k=1)
+    assert fallback.retrieve("what is the date today")[0]["action"] == {"action": "bash", "command": "date"}
+
+def test_remote_index_retried_after_backoff():
+    """Tests that an embedder that was down at startup is used once it recovers."""
+    examples = build_examples("http://user-service:8001")
+    retriever = ExampleRetriever(examples, embedder=FailingEmbedder(), k=1, retry_seconds=0)
+    assert retriever.retrieve("what is the date today")[0]["action"]["command"] == "date"
+    assert retriever._remote_index is None
+
+    retriever.embedder = KeywordEmbedder()
+    assert "user" in retriever.retrieve("show a user")[0]["prompt"]
+    assert retriever._remote_index is not None
+
+def test_failed_embedder_is_skipped_during_backoff():
+    """Tests that after a failure the embedder is not called again until the backoff expires."""
+    retriever = ExampleRetriever(build_examples("http://user-service:8001"), embedder=FailingEmbedder(),
+                                 k=1, retry_seconds=60)
+    retriever.retrieve("list files")
+    retriever.embedder = KeywordEmbedder()
+    retriever.retrieve("show a user")
+    assert retriever.embedder.calls == []
+
+def test_query_embeddings_are_cached_with_short_timeout():
+    """Tests that a repeated prompt is embedded once, with the query timeout."""
+    embedder = KeywordEmbedder()
+    retriever = ExampleRetriever(build_examples("http://user-service:8001"), embedder=embedder,
+                                 k=1, query_timeout=1.5, cache_size=1)
+    retriever.retrieve("show a user")
+    retriever.retrieve("show a user")
+    retriever.retrieve("list files")
+    retriever.retrieve("show a user")
+    queries = [call for call in embedder.calls if len(call[0]) == 1]
+    assert queries == [(["show a user"], 1.5), (["list files"], 1.5), (["show a user"], 1.5)]
+
+def test_format_examples():
+    """Tests that examples are rendered as prompt/reply lines."""
+    text = format_examples([{"prompt": "show date", "action": {"action": "bash", "command": "date"}}])
+    assert text == '- User: "show date"\n  Reply: {"action": "bash", "command": "date"}'
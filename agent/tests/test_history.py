@@ -0,0 +1,85 @@
+import threading
+from src.history import SessionHistory, Turn, digest_result
+from src.singleflight import SingleFlight, request_key
+
+def test_digest_api_result_is_compact_and_capped():
+    """Tests that API results are digested as status code plus compact JSON."""
+    result = {"status": "success", "status_code": 201, "data": {"user": {"id": "abc", "name": "Bob"}}}
+    assert digest_result(result) == 'HTTP 201 {"user":{"id":"abc","name":"Bob"}}'
+    assert digest_result(result, max_chars=10) == "HTTP 201 {..."
+
+def test_digest_bash_result():
+    """Tests that bash results use stdout, falling back to stderr."""
+    assert digest_result({"status": "success", "stdout": "/app\n", "stderr": ""}) == "/app"
+    assert digest_result({"status": "failure", "stdout": "", "stderr": "no such file"}) == "no such file"
+    assert digest_result({"status": "error", "output": "Command 'rm' is not allowed."}) == "Command 'rm' is not allowed."
+
+def test_render_messages_with_recent_results():
+    """Tests that only the most recent turns include result digests."""
+    history = SessionHistory()
+    history.add_prompt("create folder demo")
+    history.record_action({"action": "bash", "command": "mkdir demo"}, {"status": "success", "stdout": ""})
+    history.add_prompt("add user Bob")
+    history.record_action(
+        {"action": "api", "api": {"method": "POST", "url": "http://user-service:8001/users"}},
+        {"status": "success", "status_code": 201, "data": {"user": {"id": "abc"}}}
+    )
+    history.add_prompt("delete that user")
+
+    messages = history.to_messages(include_results=1)
+    assert [m["role"] for m in messages] == ["user", "assistant", "user", "assistant", "user"]
+    assert messages[1]["content"] == "I suggested the bash command: mkdir demo (status: success)"
+    assert messages[3]["content"] == (
+        "I suggested an API call: POST http://user-service:8001/users (status: success)\n"
+        'Result: HTTP 201 {"user":{"id":"abc"}}'
+    )
+    assert messages[4] == {"role": "user", "content": "delete that user"}
+
+def test_history_is_bounded_and_slotted():
+    """Tests that old turns are dropped and turns have no per-instance dict."""
+    history = SessionHistory(max_turns=2)
+    for prompt in ["a", "b", "c"]:
+        history.add_prompt(prompt)
+    assert [turn.prompt for turn in history.turns] == ["b", "c"]
+    assert not hasattr(Turn("x"), "__dict__")
+
+def test_overlapping_requests_record_their_own_turn():
+    """Tests that concurrent requests in one session fill in their own turns."""
+    history = SessionHistory()
+    first = history.add_prompt("show the date")
+    second = history.add_prompt("list files")
+    history.record_action({"action": "bash", "command": "ls"}, {"status": "success", "stdout": ""}, turn=second)
+    history.record_action({"action": "bash", "command": "date"}, {"status": "success", "stdout": ""}, turn=first)
+    assert [(turn.prompt, turn.target) for turn in history.turns] == [("show the date", "date"), ("list files", "ls")]
+
+def test_concurrent_same_prompt_requests_share_one_llm_call():
+    """Tests that same-session retries render identical messages and are coalesced."""
+    history = SessionHistory()
+    history.add_prompt("show the date")
+    history.record_action({"action": "bash", "command": "date"}, {"status": "success", "stdout": ""})
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def chat(messages):
+        calls.append(messages)
+        release.wait(5)
+        return "{}"
+
+    def request():
+        turn, messages = history.start_turn("list files")
+        flight.do(request_key("llama3.2", messages), chat, messages)
+        history.record_action({"action": "bash", "command": "ls"}, {"status": "success", "stdout": ""}, turn=turn)
+
+    threads = [threading.Thread(target=request) for _ in range(2)]
+    for t in threads:
+        t.start()
+    while flight.stats["executed"] + flight.stats["coalesced"] < 2:
+        pass
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert [m["content"] for m in calls[0]][-1] == "list files"
+    assert [turn.target for turn in history.turns] == ["date", "ls", "ls"]
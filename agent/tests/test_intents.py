@@ -0,0 +1,96 @@
+import threading
+from src.intents import IntentMatcher, build_intents, plan_signature
+
+USERS_URL = "http://user-service:8001/users"
+
+def make_matcher():
+    return IntentMatcher(build_intents("http://user-service:8001"))
+
+def test_common_prompts_match():
+    """Tests that trivial prompts map directly to action plans."""
+    matcher = make_matcher()
+    assert matcher.match("List all users").plan["api"] == {"method": "GET", "url": USERS_URL, "headers": {}, "body": {}}
+    assert matcher.match("show current directory").plan == {"action": "bash", "command": "pwd"}
+    assert matcher.match("What's the date today?").plan == {"action": "bash", "command": "date"}
+    assert matcher.match("who am i").plan == {"action": "bash", "command": "whoami"}
+
+def test_user_crud_shapes():
+    """Tests that user-service prompts produce the documented API shapes."""
+    matcher = make_matcher()
+    plan = matcher.match("add a user named Mario Rossi from Rome with email mario@example.com").plan
+    assert plan["api"]["method"] == "POST"
+    assert plan["api"]["body"] == {"name": "Mario Rossi", "city": "Rome", "email": "mario@example.com"}
+
+    user_id = "123e4567-e89b-12d3-a456-426614174000"
+    plan = matcher.match(f"delete user {user_id}").plan
+    assert plan["api"]["method"] == "DELETE"
+    assert plan["api"]["url"] == f"{USERS_URL}/{user_id}"
+
+    assert matcher.match(f"find user {user_id}").name == "get_user"
+    plan = matcher.match("find users named Mario Rossi").plan
+    assert plan["api"]["url"] == f"{USERS_URL}/search?q=Mario%20Rossi"
+
+def test_ambiguous_prompts_fall_through():
+    """Tests that context-dependent or unusual prompts go to the LLM."""
+    matcher = make_matcher()
+    assert matcher.match("delete that user") is None
+    assert matcher.match("list all python files larger than 1MB") is None
+    assert matcher.match("") is None
+
+def test_multi_step_add_user_prompts_fall_through():
+    """Tests that add-user prompts with extra clauses are not turned into a direct POST."""
+    matcher = make_matcher()
+    assert matcher.match("add user Bob from Rome").plan["api"]["body"] == {"name": "Bob", "city": "Rome"}
+    for prompt in ["add user Bob from Rome and then list all users",
+                   "add user Bob from Rome, then delete user 3",
+                   "add user Bob from Rome also create a folder called backup",
+                   "create user Bob from Rome then show the current directory",
+                   "add user Bob from New York City in the United States"]:
+        assert matcher.match(prompt) is None, prompt
+
+def test_context_dependent_searches_fall_through():
+    """Tests that searches referring to context or needing reasoning go to the LLM."""
+    matcher = make_matcher()
+    assert matcher.match("search for users in Milan").plan["api"]["url"] == f"{USERS_URL}/search?q=Milan"
+    assert matcher.match("find users with email bob@example.com").name == "search_users"
+    for prompt in ["find the user that I just created",
+                   "find the user I added earlier",
+                   "search for users who joined last week",
+                   "find users older than 30",
+                   "find users named Mario and delete them"]:
+        assert matcher.match(prompt) is None, prompt
+
+def test_hit_rate_and_shadow_accuracy():
+    """Tests that hits and shadow-mode agreement are reported."""
+    matcher = IntentMatcher(build_intents("http://user-service:8001"), shadow_sample_rate=1.0)
+    hit = matcher.match("list users")
+    matcher.match("write a poem")
+
+    matcher.shadow_check("list users", hit, lambda: {"action": "api", "api": {"method": "get", "url": USERS_URL + "/"}}).result(5)
+    matcher.shadow_check("list users", hit, lambda: {"action": "bash", "command": "ls"}).result(5)
+
+    report = matcher.report()
+    assert report["hit_rate"] == 0.5
+    assert report["by_intent"] == {"list_users": 1}
+    assert report["shadow"]["compared"] == 2
+    assert report["shadow"]["accuracy"] == 0.5
+    assert report["recent_mismatches"][0]["llm_plan"] == {"action": "bash", "command": "ls"}
+
+def test_plan_signature_ignores_formatting():
+    """Tests that equivalent plans compare equal."""
+    assert plan_signature({"action": "bash", "command": ["ls", "-la"]}) == plan_signature({"action": "bash", "command": "ls  -la"})
+
+def test_shadow_checks_are_sampled_and_bounded():
+    """Tests that unsampled hits and hits arriving while every shadow worker is busy are not compared."""
+    hit = make_matcher().match("list users")
+    assert IntentMatcher([], shadow_sample_rate=0.0).shadow_check("list users", hit, lambda: None) is None
+
+    matcher = IntentMatcher([], shadow_sample_rate=1.0, shadow_workers=1)
+    release = threading.Event()
+    busy = matcher.shadow_check("list users", hit, lambda: release.wait(5) and hit.plan)
+    assert matcher.shadow_check("list users", hit, lambda: hit.plan) is None
+    release.set()
+    busy.result(5)
+    assert matcher.report()["shadow"]["skipped"] == 1
+    assert matcher.report()["shadow"]["compared"] == 1
+    assert matcher.shadow_check("list users", hit, lambda: hit.plan) is not None
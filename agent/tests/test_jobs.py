@@ -0,0 +1,70 @@
+import time
+import threading
+import pytest
+from src.jobs import JobManager, JobLimitError
+from src.tools import execute_bash
+
+def wait(manager, job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if manager.get(job.id).finished:
+            return manager.get(job.id)
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+def test_job_runs_in_background_and_reports_result():
+    """Tests that jobs record output, result, status and timings."""
+    manager = JobManager(max_workers=1)
+
+    def work(job, value):
+        job.append_output("step 1\n")
+        return {"value": value}, True
+
+    job = wait(manager, manager.submit(work, 42))
+    data = job.to_dict()
+    assert data["status"] == "succeeded"
+    assert data["result"] == {"value": 42}
+    assert data["output"] == "step 1\n"
+    assert set(data["timings_ms"]) == {"queued", "run"}
+
+def test_failed_jobs_and_callbacks():
+    """Tests that errors fail the job and the callback is reported."""
+    notified = []
+    manager = JobManager(notify=lambda job: notified.append(job.id) or {"delivered": True}, max_workers=1)
+
+    def boom(job):
+        raise RuntimeError("upstream down")
+
+    job = wait(manager, manager.submit(boom, callback_url="http://localhost/hook"))
+    assert job.status == "failed"
+    assert job.error == "upstream down"
+    for _ in range(100):
+        if job.callback:
+            break
+        time.sleep(0.01)
+    assert notified == [job.id]
+    assert job.to_dict()["callback"] == {"delivered": True, "url": "http://localhost/hook"}
+
+def test_records_are_bounded():
+    """Tests that finished jobs are evicted and unfinished ones are never dropped."""
+    release = threading.Event()
+    manager = JobManager(max_workers=2, max_jobs=2)
+    first = wait(manager, manager.submit(lambda job: ({}, True)))
+
+    blocked = manager.submit(lambda job: (release.wait(5), True))
+    second_blocked = manager.submit(lambda job: (release.wait(5), True))
+    assert manager.get(first.id) is None
+
+    with pytest.raises(JobLimitError):
+        manager.submit(lambda job: ({}, True))
+    release.set()
+    assert wait(manager, blocked).status == "succeeded"
+    assert wait(manager, second_blocked).status == "succeeded"
+    assert manager.stats()["by_status"]["succeeded"] == 2
+
+def test_execute_bash_streams_output():
+    """Tests that bash output is reported line by line when requested."""
+    lines = []
+    result = execute_bash("echo hello", on_output=lines.append)
+    assert lines == ["hello\n"]
+    assert result["stdout"] == "hello\n"
+    assert result["return_code"] == 0
@@ -0,0 +1,34 @@
+import pytest
+from src.llm_options import ACTION_SCHEMA, build_chat_payload, default_options, parse_llm_options
+from src.singleflight import request_key
+
+MESSAGES = [{"role": "user", "content": "list files"}]
+
+def test_default_payload_caps_generation():
+    """Tests that the default payload sends the planning-tuned options."""
+    payload = build_chat_payload("llama3", MESSAGES)
+    assert payload["format"] == "json"
+    assert payload["options"] == {"num_predict": 256, "num_ctx": 4096, "temperature": 0.0}
+
+def test_overrides_are_validated_and_merged():
+    """Tests per-request overrides and their validation."""
+    options = parse_llm_options({"num_predict": 64, "temperature": 0.5, "stop": "\n\n", "format": "schema"})
+    assert options["num_ctx"] == default_options()["num_ctx"]
+    payload = build_chat_payload("llama3", MESSAGES, options)
+    assert payload["format"] == ACTION_SCHEMA
+    assert payload["options"]["num_predict"] == 64
+    assert payload["options"]["stop"] == ["\n\n"]
+
+    # 0 falls back to the model's own default
+    assert "num_ctx" not in build_chat_payload("llama3", MESSAGES, parse_llm_options({"num_ctx": 0}))["options"]
+    assert "format" not in build_chat_payload("llama3", MESSAGES, parse_llm_options({"format": "none"}))
+
+    for bad in ({"num_predict": -1}, {"num_predict": True}, {"temperature": 3}, {"stop": [1]},
+                {"format": "xml"}, {"top_k": 5}, "fast"):
+        with pytest.raises(ValueError):
+            parse_llm_options(bad)
+
+def test_options_are_part_of_the_coalescing_key():
+    """Tests that requests with different options are not coalesced."""
+    assert request_key("llama3", MESSAGES) == request_key("llama3", MESSAGES)
+    assert request_key("llama3", MESSAGES, {"num_predict": 64}) != request_key("llama3", MESSAGES, {"num_predict": 16})
@@ -0,0 +1,49 @@
+import io
+import json
+import logging
+from src.logger import (
+    truncate, setup_logging, stop_logging, get_logger, log_event,
+    StageTimer, request_id_var
+)
+
+def test_truncate_long_string():
+    """Tests that long strings are capped and annotated."""
+    assert truncate("a" * 20, 5) == "aaaaa...(+15 chars)"
+    assert truncate("short", 10) == "short"
+
+def test_truncate_nested():
+    """Tests that nested dicts and lists are truncated recursively."""
+    result = truncate({"out": ["x" * 10, 3], "n": 1}, 4)
+    assert result == {"out": ["xxxx...(+6 chars)", 3], "n": 1}
+
+def test_json_log_line_with_context():
+    """Tests that events are written as JSON lines with request context."""
+    stream = io.StringIO()
+    setup_logging(level="INFO", stream=stream, max_field_chars=8)
+    token = request_id_var.set("req-1")
+    try:
+        log_event(get_logger("test"), "chat.completed", prompt="p" * 20, total_ms=1.5)
+        log_event(get_logger("test"), "chat.debug", level=logging.DEBUG, prompt="hidden")
+    finally:
+        request_id_var.reset(token)
+        stop_logging()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["event"] == "chat.completed"
+    assert entry["logger"] == "agent.test"
+    assert entry["request_id"] == "req-1"
+    assert entry["prompt"] == "pppppppp...(+12 chars)"
+    assert entry["total_ms"] == 1.5
+
+def test_stage_timer_accumulates():
+    """Tests that repeated stages accumulate elapsed time."""
+    timer = StageTimer()
+    with timer.stage("llm"):
+        pass
+    with timer.stage("llm"):
+        pass
+    assert set(timer.timings) == {"llm"}
+    assert timer.timings["llm"] >= 0
+    assert timer.total_ms() >= timer.timings["llm"]
@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import main  # noqa: E402
+
+def test_chat_survives_unwritable_recording(tmp_path, monkeypatch):
+    """Tests that /chat answers 200 when RECORD_FILE cannot be written, and the record is dropped."""
+    recorder = main.TrafficRecorder(str(tmp_path), sample_rate=1.0)  # a directory, so writes fail
+    monkeypatch.setattr(main, "traffic_recorder", recorder)
+    response = main.app.test_client().post("/chat", json={"prompt": "show current directory",
+                                                          "session_id": "recording-test"})
+    assert response.status_code == 200
+    assert response.get_json()["llm_plan"] == {"action": "bash", "command": "pwd"}
+    recorder.flush()
+    assert recorder.dropped == 1
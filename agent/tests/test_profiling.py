@@ -0,0 +1,41 @@
+import time
+import threading
+from src.profiling import SamplingProfiler, SlowRequestLog
+
+def spin_until(event):
+    while not event.is_set():
+        sum(range(100))
+
+def test_profiler_samples_other_threads():
+    """Tests that busy threads show up in the folded stacks."""
+    done = threading.Event()
+    worker = threading.Thread(target=spin_until, args=(done,), name="busy-worker")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        assert profiler.start(seconds=5, interval_ms=1)
+        assert not profiler.start(seconds=5)
+        time.sleep(0.2)
+        profiler.stop()
+    finally:
+        done.set()
+        worker.join()
+
+    status = profiler.status()
+    assert not status["running"]
+    assert status["samples"] > 0
+    lines = profiler.folded().splitlines()
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy and "spin_until (test_profiling.py:" in busy[0]
+    assert int(busy[0].rsplit(" ", 1)[1]) > 0
+    assert not any(line.startswith("sampling-profiler;") for line in lines)
+
+def test_slow_request_log_is_bounded():
+    """Tests that only slow requests are kept, newest N, slowest first."""
+    log = SlowRequestLog(threshold_ms=100, maxlen=2)
+    assert not log.record(50, endpoint="/chat")
+    log.record(150, endpoint="/chat", prompt="a")
+    log.record(300, endpoint="/chat", prompt="b")
+    log.record(200, endpoint="/chat", prompt="c")
+    assert [entry["prompt"] for entry in log.entries()] == ["b", "c"]
+    assert log.captured == 3
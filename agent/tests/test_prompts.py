@@ -0,0 +1,9 @@
+from src.prompts import render_system_prompt
+
+def test_system_prompt_sections():
+    """Tests that examples, the user-service URL and the optional context rules are rendered."""
+    prompt = render_system_prompt('- User: "pwd"', "http://user-service:5001")
+    assert 'EXAMPLES:\n- User: "pwd"' in prompt
+    assert "GET http://user-service:5001/users/search?q=TEXT" in prompt
+    assert "CONTEXT AWARENESS" not in prompt
+    assert "CONTEXT AWARENESS" in render_system_prompt("", "http://user-service:5001", with_context=True)
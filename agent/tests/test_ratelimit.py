@@ -0,0 +1,77 @@
+import pytest
+from src.ratelimit import MemoryBackend, Rate, RateLimiter, SQLiteBackend, parse_domain_rates, parse_rate
+
+def test_parse_rate():
+    """Tests rate strings and the ways to switch a limit off."""
+    rate = parse_rate("60/minute")
+    assert (rate.capacity, rate.period) == (60, 60)
+    assert parse_rate("100/10 seconds").period == 10
+    assert parse_rate("off") is None
+    rates = parse_domain_rates("httpbin.org=5/second, localhost=off")
+    assert rates["httpbin.org"].capacity == 5
+    assert rates["localhost"] is None
+    with pytest.raises(ValueError):
+        parse_rate("lots")
+
+def test_bucket_allows_burst_then_refills():
+    """Tests that a bucket allows `capacity` hits, then refills over time."""
+    backend = MemoryBackend()
+    rate = Rate(2, 10)
+    assert backend.hit("k", rate, now=100).remaining == 1
+    assert backend.hit("k", rate, now=100).allowed
+    denied = backend.hit("k", rate, now=100)
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(5)
+    assert denied.headers()["Retry-After"] == "5"
+    assert backend.hit("k", rate, now=105).allowed
+    assert backend.hit("other", rate, now=105).remaining == 1
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """Tests that workers sharing the database share the buckets."""
+    path = str(tmp_path / "ratelimit.db")
+    worker_a, worker_b = SQLiteBackend(path), SQLiteBackend(path)
+    rate = Rate(2, 60)
+    assert worker_a.hit("k", rate, now=100).allowed
+    assert worker_b.hit("k", rate, now=100).allowed
+    assert not worker_a.hit("k", rate, now=100).allowed
+
+def test_client_keys_and_domain_overrides():
+    """Tests client buckets and per-domain limits."""
+    limiter = RateLimiter(backend=MemoryBackend(), chat_rate=Rate(1, 60), api_rate=Rate(5, 60),
+                          domain_rates={"httpbin.org": Rate(1, 60), "localhost": None},
+                          keys="api_key,session,ip", api_keys="abc")
+    assert limiter.client_keys(api_key="abc", session_id="s", ip="1.2.3.4") == ["api_key:abc"]
+    assert limiter.client_keys(api_key="forged", session_id="s", ip="1.2.3.4") == ["ip:1.2.3.4", "session:s"]
+    assert limiter.client_keys() == ["ip:unknown"]
+
+    assert limiter.hit_client(["ip:1.2.3.4"]).allowed
+    assert not limiter.hit_client(["ip:1.2.3.4"]).allowed
+    assert limiter.hit_domain("httpbin.org").allowed
+    assert not limiter.hit_domain("HTTPBIN.org").allowed
+    assert limiter.hit_domain("localhost") is None
+    assert limiter.hit_domain("jsonplaceholder.typicode.com").limit == 5
+
+def test_rotating_identities_still_hit_the_ip_bucket():
+    """Tests that new session IDs or unknown API keys do not reset a client's limit."""
+    limiter = RateLimiter(backend=MemoryBackend(), chat_rate=Rate(2, 60), keys="api_key,session,ip", api_keys="")
+    decisions = [limiter.hit_client(limiter.client_keys(api_key=f"key-{i}", session_id=f"s-{i}", ip="1.2.3.4"))
+                 for i in range(3)]
+    assert [decision.allowed for decision in decisions] == [True, True, False]
+    assert decisions[1].remaining == 0
+    assert limiter.hit_client(limiter.client_keys(session_id="s-0", ip="5.6.7.8")).allowed
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_denied_requests_do_not_drain_other_buckets(backend, tmp_path):
+    """Tests that a request refused by one bucket takes no token from the others."""
+    backend = MemoryBackend() if backend == "memory" else SQLiteBackend(str(tmp_path / "ratelimit.db"))
+    limiter = RateLimiter(backend=backend, chat_rate=Rate(2, 60), keys="session,ip")
+    assert limiter.hit_client(limiter.client_keys(session_id="roaming", ip="1.1.1.1")).allowed
+    assert limiter.hit_client(limiter.client_keys(session_id="roaming", ip="1.1.1.1")).allowed
+
+    # The session moves to another IP: its own bucket is empty, so it is refused there...
+    for _ in range(3):
+        denied = limiter.hit_client(limiter.client_keys(session_id="roaming", ip="2.2.2.2"))
+        assert not denied.allowed
+        assert denied.retry_after > 0
+    # ...without using up the IP's bucket for the other sessions behind it
+    assert limiter.hit_client(limiter.client_keys(session_id="other", ip="2.2.2.2")).remaining == 1
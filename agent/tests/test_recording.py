@@ -0,0 +1,33 @@
+from src.recording import TrafficRecorder, load_records
+
+def test_recorder_appends_json_lines(tmp_path):
+    """Tests that records are appended and read back, skipping torn lines."""
+    path = tmp_path / "traffic" / "chat.jsonl"
+    recorder = TrafficRecorder(str(path), sample_rate=1.0)
+    assert recorder.record(prompt="list files", plan={"action": "bash", "command": "ls"})
+    assert recorder.record(prompt="whoami", plan={"action": "bash", "command": "whoami"})
+    recorder.flush()
+    with open(path, "a") as f:
+        f.write('{"prompt": "cut of')
+
+    records = list(load_records(str(path)))
+    assert [record["prompt"] for record in records] == ["list files", "whoami"]
+    assert records[0]["plan"]["command"] == "ls"
+    assert "ts" in records[0]
+    assert recorder.recorded == 2
+
+def test_recorder_disabled_or_unsampled(tmp_path):
+    """Tests that nothing is written without a path or with a zero sample rate."""
+    assert not TrafficRecorder("", sample_rate=1.0).record(prompt="ls")
+    path = tmp_path / "chat.jsonl"
+    assert not TrafficRecorder(str(path), sample_rate=0.0).record(prompt="ls")
+    assert not path.exists()
+
+def test_unwritable_file_drops_records(tmp_path):
+    """Tests that write failures are counted and reported instead of raised to the caller."""
+    errors = []
+    recorder = TrafficRecorder(str(tmp_path), sample_rate=1.0, on_error=lambda e, count: errors.append(count))
+    assert recorder.record(prompt="pwd")  # tmp_path is a directory, so the write fails
+    recorder.flush()
+    assert recorder.dropped == 1 and recorder.recorded == 0
+    assert errors == [1]
@@ -0,0 +1,62 @@
+import gzip
+import json
+import pytest
+from flask import Flask, jsonify
+import responses
+from responses import OrjsonProvider, choose_encoding, init_compression, init_json_provider
+
+def make_app(payload):
+    app = Flask(__name__)
+    init_compression(app)
+
+    @app.route("/data")
+    def data():
+        return jsonify(payload)
+
+    return app
+
+def test_choose_encoding_honours_q_values(monkeypatch):
+    """Tests Accept-Encoding negotiation with and without brotli."""
+    monkeypatch.setattr(responses, "brotli", None)
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("*") == "gzip"
+
+    monkeypatch.setattr(responses, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0.1, gzip") == "gzip"
+
+def test_large_responses_are_gzipped(monkeypatch):
+    """Tests that only large responses for accepting clients are compressed."""
+    monkeypatch.setattr(responses, "brotli", None)
+    payload = {"users": [{"name": f"User {i}", "city": "Rome"} for i in range(200)]}
+    client = make_app(payload).test_client()
+
+    resp = client.get("/data", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert json.loads(gzip.decompress(resp.data)) == payload
+
+    assert "Content-Encoding" not in client.get("/data").headers
+    assert "Content-Encoding" not in make_app({"ok": True}).test_client().get(
+        "/data", headers={"Accept-Encoding": "gzip"}).headers
+
+def test_orjson_provider_matches_default():
+    """Tests that the orjson provider produces the same JSON as Flask's."""
+    pytest.importorskip("orjson")
+    payload = {"b": [1, 2.5, None], "a": {"z": "é", "y": True}}
+    app = Flask(__name__)
+    default = app.json.dumps(payload)
+    assert init_json_provider(app, "orjson") == "orjson"
+    assert isinstance(app.json, OrjsonProvider)
+    # Same keys order and separators; non-ASCII is emitted as UTF-8 instead of \u escapes
+    assert app.json.dumps(payload) == json.dumps(payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+    assert app.json.loads(app.json.dumps(payload)) == json.loads(default)
+
+    with app.test_request_context():
+        assert json.loads(app.json.response(payload).get_data()) == json.loads(default)
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        init_json_provider(Flask(__name__), "simplejson")
@@ -0,0 +1,98 @@
+import time
+import threading
+from src.history import SessionHistory
+from src.sessions import SessionStore, SnapshotFile
+
+def make_history(*prompts):
+    history = SessionHistory()
+    for prompt in prompts:
+        history.add_prompt(prompt)
+        history.record_action({"action": "bash", "command": prompt}, {"status": "success", "stdout": "ok"})
+    return history
+
+def test_snapshots_survive_restart(tmp_path):
+    """Tests that changed sessions are appended and restored, deleted ones are not."""
+    path = str(tmp_path / "sessions.jsonl")
+    store = SessionStore(SnapshotFile(path), SessionHistory.from_dict)
+    store["a"] = make_history("pwd")
+    store["b"] = make_history("ls")
+    assert store.flush() == 2
+    assert store.flush() == 0  # nothing changed
+
+    store["a"].add_prompt("whoami")
+    del store["b"]
+    assert store.flush() == 2  # a's new state + b's tombstone
+    with open(path, "a") as f:
+        f.write('{"sid": "c", "ts": 1')  # torn last write
+
+    restarted = SessionStore(SnapshotFile(path), SessionHistory.from_dict)
+    assert restarted.load() == 1
+    assert "b" not in restarted
+    assert [turn.prompt for turn in restarted["a"].turns] == ["pwd", "whoami"]
+    assert restarted["a"].turns[0].target == "pwd"
+    assert restarted["a"].to_messages()[1]["content"].startswith("I suggested the bash command: pwd")
+
+def test_ttl_expiry_and_compaction(tmp_path):
+    """Tests that idle sessions are dropped and the file is compacted to live sessions."""
+    path = str(tmp_path / "sessions.jsonl")
+    store = SessionStore(SnapshotFile(path), SessionHistory.from_dict, ttl=3600,
+                         compact_ratio=2, compact_min_records=5)
+    store["old"] = make_history("date")
+    store["old"].updated_at = time.time() - 7200
+    store["live"] = make_history("pwd")
+    for i in range(5):
+        store["live"].add_prompt(f"ls {i}")
+        store.flush()
+
+    assert "old" not in store
+    assert store.stats["expired"] == 1
+    assert store.stats["compactions"] >= 1
+    with open(path) as f:
+        assert len(f.readlines()) <= 2
+    restarted = SessionStore(SnapshotFile(path), SessionHistory.from_dict, ttl=3600)
+    restarted.load()
+    assert len(restarted["live"]) == 6
+
+def test_dict_access_races_with_expiry():
+    """Tests that get/setdefault/pop never raise while flush() expires sessions."""
+    store = SessionStore(ttl=3600)
+    stop = threading.Event()
+    errors = []
+
+    def expire():
+        while not stop.is_set():
+            for _, history in store.items():
+                history.updated_at = 0
+            store.flush()
+
+    def use():
+        try:
+            for i in range(2000):
+                sid = f"s{i % 5}"
+                store.setdefault(sid, make_history()).add_prompt("pwd")
+                store.get(sid)
+                store.pop(sid)
+        except Exception as e:
+            errors.append(e)
+
+    expirer = threading.Thread(target=expire)
+    expirer.start()
+    users = [threading.Thread(target=use) for _ in range(4)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    stop.set()
+    expirer.join()
+    assert errors == []
+
+def test_setdefault_and_pop(tmp_path):
+    """Tests that setdefault keeps an existing session and pop writes a tombstone only for live ones."""
+    store = SessionStore(SnapshotFile(str(tmp_path / "sessions.jsonl")), SessionHistory.from_dict)
+    first = store.setdefault("a", make_history("pwd"))
+    assert store.setdefault("a", SessionHistory()) is first
+    assert store.get("b") is None
+    assert store.pop("b") is None
+    assert store.pop("a") is first
+    assert "a" not in store
+    assert store.flush() == 1  # a's tombstone
@@ -0,0 +1,47 @@
+import pytest
+from src.shaping import ResultStore, parse_fields, parse_shape_options, project, shape_result
+
+def make_api_result(count):
+    users = [{"id": str(i), "name": f"User {i}", "city": "Rome", "email": f"u{i}@example.com"} for i in range(count)]
+    return {"status": "success", "status_code": 200, "data": {"status": "success", "count": count, "users": users}}
+
+def test_small_results_are_unchanged():
+    """Tests that results within the limits are returned as-is."""
+    result = make_api_result(3)
+    assert shape_result(result, max_items=10, max_chars=100) is result
+
+def test_lists_and_strings_are_truncated_with_counts():
+    """Tests that long lists and strings are cut and reported."""
+    shaped = shape_result(make_api_result(120), max_items=50)
+    assert len(shaped["data"]["users"]) == 50
+    assert shaped["truncated"] == [{"path": "data.users", "total": 120, "kept": 50}]
+
+    shaped = shape_result({"status": "success", "stdout": "x" * 5000, "stderr": "", "return_code": 0}, max_chars=100)
+    assert shaped["stdout"] == "x" * 100
+    assert shaped["truncated"] == [{"path": "stdout", "total_chars": 5000, "kept_chars": 100}]
+
+def test_field_projection():
+    """Tests that JSON paths keep only the selected fields."""
+    assert parse_fields("users[*].name, count") == {"users": {"name": {}}, "count": {}}
+    shaped = shape_result(make_api_result(2), fields=["users[*].name", "count"])
+    assert shaped["data"] == {"count": 2, "users": [{"name": "User 0"}, {"name": "User 1"}]}
+    assert "truncated" not in shaped
+    assert project({"a": {"b": 1, "c": 2}}, parse_fields(["a"])) == {"a": {"b": 1, "c": 2}}
+
+def test_shape_options_validation():
+    """Tests that malformed per-request options are rejected."""
+    assert parse_shape_options({"max_items": 5})["max_items"] == 5
+    with pytest.raises(ValueError):
+        parse_shape_options({"max_items": "5"})
+    with pytest.raises(ValueError):
+        parse_shape_options({"fields": [1]})
+
+def test_result_store_evicts_oldest():
+    """Tests that the full-result store is bounded."""
+    store = ResultStore(max_entries=2)
+    first = store.put({"n": 1})
+    store.put({"n": 2})
+    third = store.put({"n": 3})
+    assert store.get(first) is None
+    assert store.get(third) == {"n": 3}
+    assert len(store) == 2
@@ -0,0 +1,51 @@
+import threading
+import pytest
+from src.singleflight import SingleFlight, request_key
+
+def test_request_key_is_stable():
+    """Tests that keys depend on model and messages, not dict ordering."""
+    messages = [{"role": "user", "content": "list users"}]
+    assert request_key("llama3.2", messages) == request_key("llama3.2", [{"content": "list users", "role": "user"}])
+    assert request_key("llama3.2", messages) != request_key("mistral", messages)
+
+def test_concurrent_calls_are_coalesced():
+    """Tests that concurrent identical calls share a single execution."""
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("k", slow_call)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("k", slow_call))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flight.stats["coalesced"] < 3:
+        pass
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False)] + [("result", True)] * 3
+    assert flight.in_flight() == 0
+
+def test_errors_propagate_and_calls_rerun():
+    """Tests that errors reach the caller and finished keys run again."""
+    flight = SingleFlight()
+
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("k", failing)
+    assert flight.do("k", lambda: 42) == (42, False)
+    assert flight.stats["executed"] == 2
@@ -1,5 +1,5 @@
 import pytest
-from src.tools import validate_bash_command, execute_bash, validate_api_request, execute_api
+from src.tools import validate_bash_command, execute_bash, validate_api_request, execute_api, is_internal_url
 
 def test_validate_bash_command_allowed():
     """Tests that allowed commands are validated correctly."""
@@ -64,3 +64,21 @@ def test_execute_api_not_allowed():
     })
     assert result["status"] == "error"
     assert result["output"] == "Domain 'example.com' is not in the allowlist."
+
+def test_execute_api_timeout(monkeypatch):
+    """Tests that the request timeout is passed through to requests."""
+    calls = []
+    class Response:
+        status_code = 200
+        def json(self):
+            return {}
+    monkeypatch.setattr("src.tools.requests.request", lambda **kwargs: calls.append(kwargs) or Response())
+    execute_api({"method": "GET", "url": "http://jsonplaceholder.typicode.com/todos/1"}, timeout=300)
+    assert calls[0]["timeout"] == 300
+
+def test_is_internal_url():
+    """Tests that only our own services count as internal (they receive the trace context)."""
+    assert is_internal_url("http://user-service:5001/users")
+    assert is_internal_url("http://localhost:8000/health")
+    assert not is_internal_url("https://httpbin.org/get")
+    assert not is_internal_url(None)
@@ -0,0 +1,79 @@
+import json
+from src.tracing import (
+    parse_traceparent, format_traceparent, start_span, current_traceparent,
+    set_exporter, FileExporter, NoopExporter, to_otlp_json
+)
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def shutdown(self):
+        pass
+
+def test_parse_traceparent_valid():
+    """Tests that a valid traceparent header is parsed."""
+    header = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert parse_traceparent(header) == ("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", "01")
+
+def test_parse_traceparent_invalid():
+    """Tests that malformed or all-zero headers are rejected."""
+    assert parse_traceparent(None) is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(format_traceparent("0" * 32, "00f067aa0ba902b7")) is None
+
+def test_nested_spans_share_trace():
+    """Tests that child spans inherit the remote trace and nest under their parent."""
+    exporter = ListExporter()
+    set_exporter(exporter)
+    try:
+        incoming = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+        with start_span("POST /chat", traceparent=incoming) as root:
+            with start_span("ollama.chat") as child:
+                assert current_traceparent() == child.traceparent
+            assert current_traceparent() == root.traceparent
+        assert current_traceparent() is None
+    finally:
+        set_exporter(NoopExporter())
+
+    child_span, root_span = exporter.spans
+    assert root_span.trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert root_span.parent_id == "00f067aa0ba902b7"
+    assert child_span.trace_id == root_span.trace_id
+    assert child_span.parent_id == root_span.span_id
+
+def test_file_exporter_and_otlp(tmp_path):
+    """Tests that spans are written as JSON lines and convert to OTLP JSON."""
+    path = tmp_path / "spans.jsonl"
+    exporter = FileExporter(str(path), flush_interval=0.05)
+    set_exporter(exporter)
+    try:
+        with start_span("action.bash", command="ls") as span:
+            pass
+    finally:
+        set_exporter(NoopExporter())
+    exporter.shutdown()
+
+    record = json.loads(path.read_text().splitlines()[0])
+    assert record["name"] == "action.bash"
+    assert record["attributes"] == {"command": "ls"}
+    assert record["duration_ms"] >= 0
+
+    otlp_span = to_otlp_json([span])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["traceId"] == span.trace_id
+    assert otlp_span["attributes"] == [{"key": "command", "value": {"stringValue": "ls"}}]
+
+def test_file_exporter_drops_spans_it_cannot_write(tmp_path):
+    """Tests that an unwritable trace file neither raises in the request nor blocks it."""
+    exporter = FileExporter(str(tmp_path), flush_interval=0.05)  # a directory, so open() fails
+    set_exporter(exporter)
+    try:
+        with start_span("POST /chat"):
+            pass
+    finally:
+        set_exporter(NoopExporter())
+    exporter.shutdown()
+    assert exporter.dropped == 1
@@ -1,14 +1,16 @@
 #!/usr/bin/env python3
 """
 Ollama Actions CLI - Natural language command executor
+
+Startup latency matters here: shell integrations invoke this script many
+times per minute (mostly with --get-command), so heavy modules such as
+subprocess, http.client and argparse are only imported on the code paths
+that need them. Run scripts/bench_cli_startup.sh to check the budget.
 """
 
 import sys
 import os
-import subprocess
-import requests
 import json
-import argparse
 from typing import Optional, Tuple
 
 
@@ -25,6 +27,86 @@ class Colors:
     UNDERLINE = '\033[4m'
 
 
+class HTTPError(Exception):
+    """Raised by http_request for connection failures and timeouts"""
+
+    def __init__(self, message: str, kind: str = "error"):
+        super().__init__(message)
+        self.kind = kind  # "connection", "timeout" or "error"
+
+
+class HTTPResponse:
+    """Minimal response object returned by http_request"""
+
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.content = body
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def http_request(method: str, url: str, body=None, headers: Optional[dict] = None,
+                 timeout: float = 30) -> HTTPResponse:
+    """
+    Perform a single HTTP request using only the standard library.
+
+    This replaces `requests` for the one or two calls the CLI makes per run;
+    importing requests alone costs more than the rest of the startup path.
+
+    Args:
+        method: HTTP method
+        url: Absolute http(s) URL
+        body: Optional JSON-serializable request body
+        headers: Optional extra request headers
+        timeout: Socket timeout in seconds
+
+    Returns:
+        HTTPResponse with status_code and raw content
+    """
+    import http.client
+    import socket
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise HTTPError(f"Invalid URL: {url}")
+
+    conn_cls = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    path = parts.path or '/'
+    if parts.query:
+        path += f"?{parts.query}"
+
+    request_headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+    request_headers.update(headers or {})
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode('utf-8')
+        request_headers['Content-Type'] = 'application/json'
+
+    conn = conn_cls(parts.hostname, parts.port, timeout=timeout)
+    try:
+        conn.request(method.upper(), path, body=payload, headers=request_headers)
+        resp = conn.getresponse()
+        content = resp.read()
+        if resp.getheader('Content-Encoding', '').lower() == 'gzip':
+            import zlib
+            content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+        return HTTPResponse(resp.status, content)
+    except (socket.timeout, TimeoutError) as e:
+        raise HTTPError(f"Request timed out: {e}", kind="timeout")
+    except (ConnectionError, socket.gaierror) as e:
+        raise HTTPError(f"Connection failed: {e}", kind="connection")
+    except (OSError, http.client.HTTPException) as e:
+        raise HTTPError(str(e))
+    finally:
+        conn.close()
+
+
 def load_config() -> Tuple[str, int]:
     """Load configuration from .env file"""
     env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -44,30 +126,81 @@ def load_config() -> Tuple[str, int]:
     return agent_url, app_port
 
 
-def call_agent(prompt: str, agent_url: str, session_id: Optional[str] = None) -> Optional[dict]:
+def new_traceparent() -> Tuple[str, str, str]:
+    """Start a W3C trace for this invocation: returns (header, trace_id, span_id)"""
+    trace_id = os.urandom(16).hex()
+    span_id = os.urandom(8).hex()
+    return f"00-{trace_id}-{span_id}-01", trace_id, span_id
+
+
+def export_client_span(trace_id: str, span_id: str, start_ns: int, end_ns: int, status: str, agent_url: str):
+    """Append the CLI's own span to TRACE_EXPORT_FILE (same format as the services)"""
+    path = os.environ.get('TRACE_EXPORT_FILE')
+    if not path:
+        return
+    span = {
+        "service": "ollama-cli",
+        "name": "POST /chat",
+        "trace_id": trace_id,
+        "span_id": span_id,
+        "parent_span_id": None,
+        "start_time_unix_nano": start_ns,
+        "end_time_unix_nano": end_ns,
+        "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+        "status": status,
+        "attributes": {"agent.url": agent_url}
+    }
+    try:
+        with open(path, 'a') as f:
+            f.write(json.dumps(span) + '\n')
+    except OSError:
+        pass
+
+
+def call_agent(prompt: str, agent_url: str, session_id: Optional[str] = None,
+               full: bool = False) -> Optional[dict]:
     """Call the agent API with a natural language prompt"""
+    import time
+
+    traceparent, trace_id, span_id = new_traceparent()
+    start_ns = time.time_ns()
+    status = "error"
     try:
         payload = {"prompt": prompt}
         if session_id:
             payload["session_id"] = session_id
+        if full:
+            payload["full"] = True
 
-        response = requests.post(
-            f"{agent_url}/chat",
-            json=payload,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.ConnectionError:
-        print(f"{Colors.FAIL}Error: Cannot connect to agent at {agent_url}{Colors.ENDC}")
-        print(f"{Colors.WARNING}Make sure the agent is running: make up{Colors.ENDC}")
-        return None
-    except requests.exceptions.Timeout:
-        print(f"{Colors.FAIL}Error: Request timed out{Colors.ENDC}")
+        response = http_request("POST", f"{agent_url}/chat", body=payload,
+                                headers={"traceparent": traceparent}, timeout=30)
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get('retry_after')
+            except ValueError:
+                retry_after = None
+            wait = f", retry in {retry_after}s" if retry_after is not None else ""
+            raise HTTPError(f"Rate limit exceeded{wait}")
+        if response.status_code >= 400:
+            raise HTTPError(f"{response.status_code} error from agent: {response.text[:200]}")
+        result = response.json()
+        result.setdefault('trace_id', trace_id)
+        status = "ok"
+        return result
+    except HTTPError as e:
+        if e.kind == "connection":
+            print(f"{Colors.FAIL}Error: Cannot connect to agent at {agent_url}{Colors.ENDC}")
+            print(f"{Colors.WARNING}Make sure the agent is running: make up{Colors.ENDC}")
+        elif e.kind == "timeout":
+            print(f"{Colors.FAIL}Error: Request timed out{Colors.ENDC}")
+        else:
+            print(f"{Colors.FAIL}Error: {str(e)}{Colors.ENDC}")
         return None
     except Exception as e:
         print(f"{Colors.FAIL}Error: {str(e)}{Colors.ENDC}")
         return None
+    finally:
+        export_client_span(trace_id, span_id, start_ns, time.time_ns(), status, agent_url)
 
 
 def extract_command(agent_response: dict) -> Optional[str]:
@@ -87,6 +220,30 @@ def extract_command(agent_response: dict) -> Optional[str]:
         return None
 
 
+def print_json(data, compact: bool = False):
+    """Print JSON; compact output is for scripts (--get-command), indented for people"""
+    if compact:
+        print(json.dumps(data, separators=(',', ':')))
+    else:
+        print(json.dumps(data, indent=2))
+
+
+def print_trimmed_note(execution_result: dict, agent_url: str):
+    """Explain what the agent trimmed from a large result and where to get all of it"""
+    notes = execution_result.get('truncated')
+    ref = execution_result.get('result_ref')
+    if not notes or not ref:
+        return
+    parts = []
+    for note in notes:
+        if 'total' in note:
+            parts.append(f"{note['path']}: {note['kept']} of {note['total']} items")
+        else:
+            parts.append(f"{note['path']}: {note['kept_chars']} of {note['total_chars']} chars")
+    print(f"{Colors.WARNING}Result trimmed ({', '.join(parts)}){Colors.ENDC}")
+    print(f"{Colors.OKCYAN}Full result: {agent_url}/results/{ref} (or rerun with --full){Colors.ENDC}")
+
+
 def execute_api_action(api_plan: dict, dry_run: bool = False) -> int:
     """Execute API action from agent response"""
     try:
@@ -115,11 +272,11 @@ def execute_api_action(api_plan: dict, dry_run: bool = False) -> int:
         print()
 
         # Execute API request
-        response = requests.request(
-            method=method,
-            url=url,
+        response = http_request(
+            method,
+            url,
+            body=body if body else None,
             headers=headers,
-            json=body if body else None,
             timeout=30
         )
 
@@ -142,7 +299,7 @@ def execute_api_action(api_plan: dict, dry_run: bool = False) -> int:
             print(f"{Colors.WARNING}⚠ API request returned error status {response.status_code}{Colors.ENDC}")
             return 1
 
-    except requests.exceptions.RequestException as e:
+    except HTTPError as e:
         print(f"{Colors.FAIL}Error executing API request: {e}{Colors.ENDC}")
         return 1
     except Exception as e:
@@ -150,6 +307,199 @@ def execute_api_action(api_plan: dict, dry_run: bool = False) -> int:
         return 1
 
 
+class CommandCache:
+    """
+    On-disk cache of bash commands the user accepted, so repeated prompts can
+    be answered without a round-trip to the agent and LLM.
+
+    Entries are keyed by agent model + working directory + normalized prompt
+    and carry a usage count and timestamps. Entries older than the TTL are
+    ignored and dropped on save; the least recently used entries are evicted
+    once the cache grows past MAX_ENTRIES.
+
+    The agent's model is re-checked at most once per MODEL_CHECK_INTERVAL
+    (see current_model); when it changes, entries for the old model are
+    dropped instead of being served until they expire.
+    """
+
+    VERSION = 1
+    MAX_ENTRIES = 500
+    FUZZY_THRESHOLD = 0.88
+    DEFAULT_TTL = 7 * 24 * 3600
+    DEFAULT_MODEL_CHECK_INTERVAL = 10 * 60
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                 model_check_interval: Optional[float] = None):
+        self.path = path or self.default_path()
+        if ttl is None:
+            try:
+                ttl = float(os.environ.get('OLLAMA_CLI_CACHE_TTL', self.DEFAULT_TTL))
+            except ValueError:
+                ttl = self.DEFAULT_TTL
+        self.ttl = ttl
+        if model_check_interval is None:
+            try:
+                model_check_interval = float(os.environ.get('OLLAMA_CLI_MODEL_CHECK',
+                                                            self.DEFAULT_MODEL_CHECK_INTERVAL))
+            except ValueError:
+                model_check_interval = self.DEFAULT_MODEL_CHECK_INTERVAL
+        self.model_check_interval = model_check_interval
+        self.data = {"version": self.VERSION, "models": {}, "model_checked": {}, "entries": {}}
+        self._load()
+
+    @staticmethod
+    def default_path() -> str:
+        if os.environ.get('OLLAMA_CLI_CACHE'):
+            return os.environ['OLLAMA_CLI_CACHE']
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'ollama-actions', 'commands.json')
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return ' '.join(prompt.lower().split()).rstrip('.!?')
+
+    @staticmethod
+    def make_key(prompt: str, cwd: str, model: str) -> str:
+        return '\x1f'.join((model, cwd, CommandCache.normalize(prompt)))
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.data = data
+        except (OSError, ValueError):
+            pass
+
+    def _is_fresh(self, entry: dict, now: float) -> bool:
+        return now - entry.get('last_used', 0) <= self.ttl
+
+    def model_for(self, agent_url: str) -> str:
+        """Last model name reported by this agent (empty if unknown)"""
+        return self.data['models'].get(agent_url, '')
+
+    def set_model(self, agent_url: str, model: str) -> bool:
+        """
+        Remember the model an agent reported.
+
+        Returns True when it replaced a different model; entries for models
+        no agent reports any more are dropped then. Does not save.
+        """
+        models = self.data['models']
+        previous = models.get(agent_url)
+        models[agent_url] = model
+        if not previous or previous == model:
+            return False
+        current = set(models.values())
+        self.data['entries'] = {k: v for k, v in self.data['entries'].items() if v.get('model') in current}
+        return True
+
+    def current_model(self, agent_url: str, fetch) -> str:
+        """
+        Model of this agent, asking fetch(agent_url) when the last check is
+        older than the check interval.
+
+        fetch returns the model name or None (agent unreachable), in which
+        case the last known model is kept. Failed checks count as checks too,
+        so an unreachable agent costs one extra request per interval, not
+        one per invocation.
+        """
+        import time
+
+        now = time.time()
+        checked = self.data.setdefault('model_checked', {})
+        if now - checked.get(agent_url, 0) < self.model_check_interval:
+            return self.model_for(agent_url)
+        model = fetch(agent_url)
+        checked[agent_url] = now
+        if model:
+            self.set_model(agent_url, model)
+        self.save()
+        return self.model_for(agent_url)
+
+    def lookup(self, prompt: str, cwd: str, model: str, fuzzy: bool = True) -> Optional[dict]:
+        """
+        Find a cached command for this prompt.
+
+        Returns the entry dict plus an 'exact' flag, or None. Fuzzy matching
+        only considers entries for the same model and working directory.
+        """
+        import time
+
+        now = time.time()
+        entries = self.data['entries']
+        entry = entries.get(self.make_key(prompt, cwd, model))
+        if entry and self._is_fresh(entry, now):
+            return dict(entry, exact=True)
+        if not fuzzy:
+            return None
+
+        from difflib import SequenceMatcher
+
+        normalized = self.normalize(prompt)
+        best, best_ratio = None, self.FUZZY_THRESHOLD
+        for candidate in entries.values():
+            if candidate.get('cwd') != cwd or candidate.get('model') != model:
+                continue
+            if not self._is_fresh(candidate, now):
+                continue
+            matcher = SequenceMatcher(None, normalized, self.normalize(candidate['prompt']))
+            if matcher.real_quick_ratio() < best_ratio or matcher.quick_ratio() < best_ratio:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return dict(best, exact=False) if best else None
+
+    def record(self, prompt: str, cwd: str, model: str, command: str, agent_url: Optional[str] = None):
+        """Store (or bump the usage count of) an accepted command and save"""
+        import time
+
+        now = time.time()
+        if agent_url and model:
+            self.set_model(agent_url, model)
+        key = self.make_key(prompt, cwd, model)
+        entry = self.data['entries'].get(key)
+        if entry is None or entry.get('command') != command:
+            entry = {"prompt": prompt, "cwd": cwd, "model": model, "command": command,
+                     "uses": 0, "created": now}
+        entry['uses'] += 1
+        entry['last_used'] = now
+        self.data['entries'][key] = entry
+        self.save()
+
+    def save(self):
+        """Prune expired/excess entries and write the cache atomically"""
+        import time
+
+        now = time.time()
+        entries = {k: v for k, v in self.data['entries'].items() if self._is_fresh(v, now)}
+        if len(entries) > self.MAX_ENTRIES:
+            newest = sorted(entries.items(), key=lambda item: item[1]['last_used'], reverse=True)
+            entries = dict(newest[:self.MAX_ENTRIES])
+        self.data['entries'] = entries
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # The cache is an optimization; never fail the command over it
+
+
+def fetch_agent_model(agent_url: str) -> Optional[str]:
+    """Model name from the agent's index endpoint, or None if it cannot be reached"""
+    try:
+        response = http_request('GET', f"{agent_url.rstrip('/')}/", timeout=2)
+        if response.status_code == 200:
+            return response.json().get('model') or None
+    except (HTTPError, ValueError, AttributeError):
+        pass
+    return None
+
+
 def ask_confirmation(command: str, default: bool = True) -> bool:
     """Ask user for confirmation to execute command"""
     default_str = "Y/n" if default else "y/N"
@@ -173,6 +523,8 @@ def execute_command(command: str, dry_run: bool = False) -> int:
         print(f"{Colors.OKCYAN}[DRY RUN] Would execute: {command}{Colors.ENDC}")
         return 0
 
+    import subprocess
+
     try:
         print(f"{Colors.OKGREEN}Executing: {command}{Colors.ENDC}")
         print()
@@ -196,7 +548,33 @@ def execute_command(command: str, dry_run: bool = False) -> int:
         return 1
 
 
-def main():
+def use_cached_command(cached: dict, args) -> bool:
+    """Offer a cached command to the user; returns True if it should be run"""
+    uses = cached.get('uses', 0)
+    if cached['exact']:
+        print(f"{Colors.OKGREEN}💾 Cached command (used {uses} time{'s' if uses != 1 else ''}):{Colors.ENDC}")
+    else:
+        print(f"{Colors.OKGREEN}💾 Did you mean the cached command for \"{cached['prompt']}\"?{Colors.ENDC}")
+    print(f"{Colors.BOLD}   {cached['command']}{Colors.ENDC}")
+    print()
+
+    # --yes only auto-accepts exact matches; near matches always ask
+    if args.yes and cached['exact']:
+        return True
+
+    prompt_msg = f"{Colors.OKBLUE}Use cached command? [Y/n] (n asks the agent): {Colors.ENDC}"
+    try:
+        answer = input(prompt_msg).strip().lower()
+    except (KeyboardInterrupt, EOFError):
+        print()
+        return False
+    return answer in ('', 'y', 'yes')
+
+
+def build_parser():
+    """Build the full argparse parser (used for --help and unusual argument lists)"""
+    import argparse
+
     parser = argparse.ArgumentParser(
         description='Ollama Actions CLI - Execute commands with natural language',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -252,12 +630,97 @@ Examples:
         help='Session ID for conversation memory (allows context between prompts)'
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always ask the agent instead of reusing previously accepted commands'
+    )
+
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Show the complete API result instead of the trimmed one'
+    )
+
+    return parser
+
+
+# Options understood by the fast-path parser: flag -> (attribute, takes_value)
+_FAST_OPTIONS = {
+    '--dry-run': ('dry_run', False),
+    '-y': ('yes', False),
+    '--yes': ('yes', False),
+    '--verbose': ('verbose', False),
+    '--get-command': ('get_command', False),
+    '--agent-url': ('agent_url', True),
+    '--session-id': ('session_id', True),
+    '--no-cache': ('no_cache', False),
+    '--full': ('full', False),
+}
+
+
+def fast_parse_args(argv):
+    """
+    Parse the common argument shapes without building an argparse parser.
+
+    Returns None when argv contains anything unusual (help, unknown flags,
+    missing values, zero or several prompts) so the caller can fall back to
+    argparse for full validation and error messages.
+    """
+    from types import SimpleNamespace
+
+    values = {'prompt': None, 'dry_run': False, 'yes': False, 'verbose': False,
+              'get_command': False, 'agent_url': None, 'session_id': None, 'no_cache': False,
+              'full': False}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith('-'):
+            name, sep, inline_value = arg.partition('=')
+            option = _FAST_OPTIONS.get(name)
+            if option is None:
+                return None
+            attr, takes_value = option
+            if not takes_value:
+                if sep:
+                    return None
+                values[attr] = True
+            elif sep:
+                values[attr] = inline_value
+            elif i + 1 < len(argv) and not argv[i + 1].startswith('-'):
+                i += 1
+                values[attr] = argv[i]
+            else:
+                return None
+        elif values['prompt'] is None:
+            values['prompt'] = arg
+        else:
+            return None
+        i += 1
 
-    # Load configuration
-    agent_url, port = load_config()
+    if values['prompt'] is None:
+        return None
+    return SimpleNamespace(**values)
+
+
+def parse_args(argv=None):
+    """Parse CLI arguments, preferring the fast path"""
+    if argv is None:
+        argv = sys.argv[1:]
+    args = fast_parse_args(argv)
+    if args is None:
+        args = build_parser().parse_args(argv)
+    return args
+
+
+def main():
+    args = parse_args()
+
+    # Load configuration (the .env file is only read when no URL was given)
     if args.agent_url:
         agent_url = args.agent_url
+    else:
+        agent_url, _ = load_config()
 
     # If just getting the command, skip all printing
     if not args.get_command:
@@ -266,10 +729,28 @@ Examples:
         print(f"{Colors.OKCYAN}Prompt: {args.prompt}{Colors.ENDC}")
         print()
 
+    # Previously accepted commands are reused without asking the agent.
+    # Session prompts depend on conversation context, so they are never cached.
+    cache = None
+    cwd = os.getcwd()
+    if not args.no_cache and not args.session_id:
+        cache = CommandCache()
+        cached = cache.lookup(args.prompt, cwd, cache.current_model(agent_url, fetch_agent_model),
+                              fuzzy=not args.get_command)
+        if cached and args.get_command:
+            print(cached['command'])
+            sys.exit(0)
+        if cached and use_cached_command(cached, args):
+            if not args.dry_run:
+                cache.record(args.prompt, cwd, cached['model'], cached['command'])
+            exit_code = execute_command(cached['command'], dry_run=args.dry_run)
+            sys.exit(exit_code)
+
+    if not args.get_command:
         # Call agent
         print(f"{Colors.OKBLUE}🤖 Asking agent...{Colors.ENDC}")
 
-    response = call_agent(args.prompt, agent_url, session_id=args.session_id)
+    response = call_agent(args.prompt, agent_url, session_id=args.session_id, full=args.full)
 
     if not response:
         sys.exit(1)
@@ -310,19 +791,21 @@ Examples:
         if agent_status == 'success' and api_status != 'error':
             if not args.get_command:
                 print(f"{Colors.OKGREEN}Result: Success{Colors.ENDC}")
-            print(json.dumps(data, indent=2))
+            print_json(data, compact=args.get_command)
+            if not args.get_command:
+                print_trimmed_note(execution_result, agent_url)
             sys.exit(0)
         elif api_status == 'error':
             # Agent executed successfully but API returned error
             if not args.get_command:
                 print(f"{Colors.FAIL}Result: API Error{Colors.ENDC}")
-            print(json.dumps(data, indent=2))
+            print_json(data, compact=args.get_command)
             sys.exit(1)
         else:
             # Agent execution failed
             if not args.get_command:
                 print(f"{Colors.FAIL}Result: Execution Failed{Colors.ENDC}")
-            print(json.dumps(execution_result, indent=2))
+            print_json(execution_result, compact=args.get_command)
             sys.exit(1)
 
     # Handle API actions (when agent didn't execute them)
@@ -397,6 +880,10 @@ Examples:
             print(f"{Colors.WARNING}Cancelled.{Colors.ENDC}")
             sys.exit(0)
 
+    # Remember the accepted command for next time
+    if cache is not None and not args.dry_run:
+        cache.record(args.prompt, cwd, response.get('model', ''), command, agent_url=agent_url)
+
     # Execute command
     exit_code = execute_command(command, dry_run=args.dry_run)
     sys.exit(exit_code)
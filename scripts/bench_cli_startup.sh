@@ -0,0 +1,104 @@
+#!/bin/bash
+#
+# Startup-time benchmark for ollama-cli.py
+#
+# Shell integrations call the CLI (usually with --get-command) many times per
+# minute, so its startup cost is on every call. This script measures:
+#   1. Wall time of a full --get-command run against a closed port
+#      (exercises argument parsing, config and the HTTP path, no agent needed)
+#   2. Import time of modules loaded by the CLI itself (python -X importtime),
+#      excluding what the bare interpreter already imports
+# and fails if the import budget is exceeded or a heavy module sneaks back in.
+#
+# Usage: bash scripts/bench_cli_startup.sh [iterations]
+#   CLI_IMPORT_BUDGET_MS   - max CLI import time in ms (default: 60)
+#   CLI_FORBIDDEN_IMPORTS  - comma-separated modules that must not load (default: requests,argparse)
+#
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+PROJECT_ROOT="$(cd "$SCRIPT_DIR/.." && pwd)"
+CLI="$PROJECT_ROOT/ollama-cli.py"
+PYTHON=${PYTHON:-python3}
+ITERATIONS=${1:-10}
+BUDGET_MS=${CLI_IMPORT_BUDGET_MS:-60}
+FORBIDDEN=${CLI_FORBIDDEN_IMPORTS:-requests,argparse}
+# Port 9 (discard) is closed on almost every host: the request fails fast
+ARGS=(--get-command "list files" --agent-url "http://127.0.0.1:9")
+
+GREEN='\033[0;32m'
+RED='\033[0;31m'
+CYAN='\033[0;36m'
+BOLD='\033[1m'
+NC='\033[0m'
+
+echo -e "${BOLD}${CYAN}ollama-cli.py startup benchmark${NC}"
+echo ""
+
+# --- Wall time ---
+start=$(date +%s%N)
+for ((i = 0; i < ITERATIONS; i++)); do
+    "$PYTHON" "$CLI" "${ARGS[@]}" > /dev/null 2>&1
+done
+end=$(date +%s%N)
+avg_ms=$(( (end - start) / ITERATIONS / 1000000 ))
+
+start=$(date +%s%N)
+for ((i = 0; i < ITERATIONS; i++)); do
+    "$PYTHON" -c pass > /dev/null 2>&1
+done
+end=$(date +%s%N)
+base_ms=$(( (end - start) / ITERATIONS / 1000000 ))
+
+echo "  Wall time (avg of $ITERATIONS runs): ${avg_ms} ms (bare interpreter: ${base_ms} ms)"
+
+# --- Import time ---
+BASELINE=$("$PYTHON" -X importtime -c pass 2>&1 >/dev/null)
+CLI_IMPORTS=$("$PYTHON" -X importtime "$CLI" "${ARGS[@]}" 2>&1 >/dev/null)
+
+BASELINE="$BASELINE" CLI_IMPORTS="$CLI_IMPORTS" BUDGET_MS="$BUDGET_MS" FORBIDDEN="$FORBIDDEN" "$PYTHON" - <<'EOF'
+import os
+import sys
+
+
+def parse(text):
+    """Returns {module: (cumulative_us, is_top_level)} from -X importtime output."""
+    modules = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(cumulative), not name[1:].startswith(" "))
+    return modules
+
+
+baseline = parse(os.environ["BASELINE"])
+cli = parse(os.environ["CLI_IMPORTS"])
+budget_ms = float(os.environ["BUDGET_MS"])
+
+added = {name: us for name, (us, top) in cli.items() if top and name not in baseline}
+total_ms = sum(added.values()) / 1000
+
+print(f"  CLI import time: {total_ms:.1f} ms (budget: {budget_ms:.0f} ms)")
+for name, us in sorted(added.items(), key=lambda item: -item[1])[:5]:
+    print(f"    {us / 1000:7.1f} ms  {name}")
+
+failed = False
+forbidden = [m for m in os.environ["FORBIDDEN"].split(",") if m and m in cli]
+if forbidden:
+    print(f"\033[0;31m  ✗ Forbidden modules imported: {', '.join(forbidden)}\033[0m")
+    failed = True
+if total_ms > budget_ms:
+    print(f"\033[0;31m  ✗ Import budget exceeded\033[0m")
+    failed = True
+
+sys.exit(1 if failed else 0)
+EOF
+status=$?
+
+echo ""
+if [ $status -eq 0 ]; then
+    echo -e "${GREEN}${BOLD}✓ Startup within budget${NC}"
+else
+    echo -e "${RED}${BOLD}✗ Startup regression detected${NC}"
+fi
+exit $status
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Serialization and compression micro-benchmark for the Flask JSON responses.
+
+Builds the payloads that get large in practice (a user-service /users
+listing and an agent /debug/sessions dump), then times Flask's default JSON
+provider against the orjson provider (jsonify-equivalent response()) and
+the gzip/br compression applied on top.
+
+Usage:
+    python3 scripts/bench_json.py [--users 1000 10000] [--sessions 200] [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+
+from flask import Flask  # noqa: E402
+from history import SessionHistory  # noqa: E402
+import responses  # noqa: E402
+
+
+def make_users(count):
+    return {"status": "success", "count": count, "users": [
+        {"id": str(uuid.uuid4()), "name": f"User {i}", "city": ["Rome", "Milan", "Turin"][i % 3],
+         "email": f"user{i}@example.com", "phone": None, "address": f"Via Roma {i}",
+         "created_at": datetime.now().isoformat()}
+        for i in range(count)
+    ]}
+
+
+def make_sessions(count, turns=20):
+    sessions = {}
+    for s in range(count):
+        history = SessionHistory()
+        for t in range(turns):
+            history.add_prompt(f"list the files in folder {t}")
+            history.record_action({"action": "bash", "command": f"ls -la folder{t}"},
+                                  {"status": "success", "stdout": "total 0\n" + "-rw-r--r-- file\n" * 10})
+        sessions[f"session-{s}"] = {"turn_count": len(history), "turns": history.to_dict()["turns"]}
+    return {"sessions": sessions}
+
+
+def time_it(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def bench(label, payload, providers, repeat):
+    for name, app in providers:
+        with app.test_request_context():
+            ms, response = time_it(lambda: app.json.response(payload), repeat)
+            body = response.get_data()
+        print(f"{label:<24} {name + ' json':<14} {ms:>9.2f} {len(body) / 1024:>10.1f}")
+
+        codecs = ["gzip"] + (["br"] if responses.brotli is not None else [])
+        for codec in codecs:
+            ms, compressed = time_it(lambda: responses.compress(body, codec), repeat)
+            print(f"{label:<24} {'  + ' + codec:<14} {ms:>9.2f} {len(compressed) / 1024:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON providers and response compression")
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000], help="User list sizes")
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions in the /debug/sessions dump")
+    parser.add_argument("--repeat", type=int, default=20, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    providers = [("default", Flask("default"))]
+    orjson_app = Flask("orjson")
+    if responses.init_json_provider(orjson_app, "orjson") == "orjson":
+        providers.append(("orjson", orjson_app))
+    else:
+        print("orjson is not installed; only the default provider is measured\n")
+
+    print(f"{'payload':<24} {'step':<14} {'ms/op':>9} {'size (KB)':>10}")
+    for count in args.users:
+        bench(f"/users ({count})", make_users(count), providers, args.repeat)
+    bench(f"/debug/sessions ({args.sessions})", make_sessions(args.sessions), providers, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Latency/accuracy benchmark for the Ollama generation options.
+
+Sends the example prompts (with the agent's system prompt layout and some
+session history) to Ollama once per preset and reports latency percentiles,
+plan accuracy against the examples (compared with intents.plan_signature)
+and how many replies were cut off by num_predict.
+
+By default it runs against scripts/mock_ollama.py, started in-process. The
+mock hard-codes the effects being measured (truncation, rambling, sampling
+and context loss), so that mode is a plumbing smoke test only: it checks
+that every preset is sent and parsed, not which preset is better. Pass
+--ollama-url and --model to measure a real server; only those numbers
+should inform the defaults in agent/src/llm_options.py.
+
+Usage:
+    python3 scripts/bench_ollama_options.py [--repeat 3] [--history 10] [--concurrency 4]
+    python3 scripts/bench_ollama_options.py --ollama-url http://localhost:11434 --model qwen2.5:1.5b
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from examples import ExampleRetriever, build_examples, format_examples  # noqa: E402
+from intents import plan_signature  # noqa: E402
+from llm_options import build_chat_payload, parse_llm_options  # noqa: E402
+from mock_ollama import USER_SERVICE_URL, start_server  # noqa: E402
+
+# Name -> llm_options overrides; None sends no options at all (model defaults)
+PRESETS = [
+    ("model defaults", None),
+    ("agent defaults", {}),
+    ("num_predict=64", {"num_predict": 64}),
+    ("num_predict=16", {"num_predict": 16}),
+    ("no num_predict", {"num_predict": 0}),
+    ("temperature=0.8", {"temperature": 0.8}),
+    ("format=schema", {"format": "schema"}),
+    ("num_ctx=256", {"num_ctx": 256}),
+]
+
+SYSTEM_PROMPT = """You are an automation agent. Return ONLY a JSON action.
+1. "bash" - {{"action": "bash", "command": "..."}}
+2. "api" - {{"action": "api", "api": {{"method": "GET", "url": "...", "headers": {{}}, "body": {{}}}}}}
+EXAMPLES:
+{examples}
+"""
+
+
+def build_messages(prompt, retriever, history):
+    system = SYSTEM_PROMPT.format(examples=format_examples(retriever.retrieve(prompt)))
+    return [{"role": "system", "content": system}] + history + [{"role": "user", "content": prompt}]
+
+
+def build_history(examples, turns):
+    history = []
+    for example in examples[:turns]:
+        history.append({"role": "user", "content": example["prompt"]})
+        history.append({"role": "assistant", "content": json.dumps(example["action"])})
+    return history
+
+
+def run_one(url, model, messages, options, expected):
+    payload = build_chat_payload(model, messages, parse_llm_options(options or {}))
+    if options is None:
+        payload = {"model": model, "messages": messages, "stream": False, "format": "json"}
+    start = time.perf_counter()
+    resp = requests.post(f"{url}/api/chat", json=payload, timeout=300)
+    elapsed = (time.perf_counter() - start) * 1000
+    data = resp.json()
+    try:
+        plan = json.loads(data.get("message", {}).get("content", ""))
+    except ValueError:
+        plan = None
+    return elapsed, plan_signature(plan) == expected, data.get("done_reason") == "length", data.get("eval_count", 0)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Ollama generation options")
+    parser.add_argument("--ollama-url", help="Real Ollama server (default: in-process mock)")
+    parser.add_argument("--model", default="mock", help="Model name sent to Ollama")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the example prompts per preset")
+    parser.add_argument("--history", type=int, default=10, help="Prior conversation turns per request")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight")
+    parser.add_argument("--token-ms", type=float, default=2.0, help="Mock time per generated token")
+    args = parser.parse_args()
+
+    url = args.ollama_url
+    if not url:
+        _, url = start_server(token_ms=args.token_ms)
+        print("Smoke test against the mock Ollama: the numbers follow the mock's built-in effects, "
+              "not a real model (use --ollama-url to measure one)")
+
+    examples = build_examples(USER_SERVICE_URL)
+    retriever = ExampleRetriever(examples)
+    history = build_history(examples, args.history)
+    cases = [(build_messages(example["prompt"], retriever, history), plan_signature(example["action"]))
+             for example in examples]
+
+    print(f"{len(cases)} prompts x {args.repeat} passes, {args.history} history turns, against {url}\n")
+    print(f"{'preset':<18} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'tokens':>7} {'accuracy':>9} {'truncated':>10}")
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for name, options in PRESETS:
+            jobs = [pool.submit(run_one, url, args.model, messages, options, expected)
+                    for _ in range(args.repeat) for messages, expected in cases]
+            results = [job.result() for job in jobs]
+            latencies = [r[0] for r in results]
+            accuracy = sum(r[1] for r in results) / len(results)
+            truncated = sum(r[2] for r in results)
+            tokens = sum(r[3] for r in results) / len(results)
+            print(f"{name:<18} {percentile(latencies, 50):>8.0f} {percentile(latencies, 95):>8.0f} "
+                  f"{max(latencies):>8.0f} {tokens:>7.0f} {accuracy:>8.0%} {truncated:>10}")
+
+
+if __name__ == "__main__":
+    main()
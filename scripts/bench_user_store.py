@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the user-service storage backends.
+
+Runs read-heavy, write-heavy and search-heavy operation mixes against each
+backend from several threads (and, for SQLite, several processes sharing
+one database file, like gunicorn workers) and reports operations per
+second. In the multi-process SQLite run every search first catches up on
+the other workers' writes, so the search mix shows what keeping the
+per-worker search index in step costs.
+
+Usage:
+    python3 scripts/bench_user_store.py [--seconds 3] [--threads 8] [--processes 4] [--users 1000]
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "user-service", "src"))
+
+from storage import MemoryUserStore, SQLiteUserStore  # noqa: E402
+
+# Mix name -> (read fraction, list fraction, search fraction); the rest are updates/creates/deletes
+MIXES = {
+    "read-heavy": (0.90, 0.05, 0.0),
+    "write-heavy": (0.40, 0.02, 0.0),
+    "search-heavy": (0.20, 0.0, 0.70),
+}
+SEARCH_QUERIES = ["user 123", "user42@example.com", "1234", "usr 777", "user 5 milan"]
+
+
+def make_user(i):
+    return {"id": str(uuid.uuid4()), "name": f"User {i}", "city": "Rome",
+            "email": f"user{i}@example.com", "phone": None, "address": None}
+
+
+def seed(store, count):
+    return [store.create(make_user(i))["id"] for i in range(count)]
+
+
+def worker(store, ids, mix, deadline, counter, lock):
+    read_fraction, list_fraction, search_fraction = MIXES[mix]
+    rng = random.Random()
+    ops = 0
+    while time.perf_counter() < deadline:
+        roll = rng.random()
+        if roll < read_fraction:
+            store.get(rng.choice(ids))
+        elif roll < read_fraction + list_fraction:
+            store.list()
+        elif roll < read_fraction + list_fraction + search_fraction:
+            store.search(rng.choice(SEARCH_QUERIES))
+        elif roll < 0.98:
+            store.update(rng.choice(ids), {"city": rng.choice(["Rome", "Milan", "Turin"])})
+        else:
+            user = store.create(make_user(rng.randint(0, 10 ** 6)))
+            store.delete(user["id"])
+        ops += 1
+    with lock:
+        counter[0] += ops
+
+
+def run_threads(store, ids, mix, threads, seconds):
+    counter, lock = [0], threading.Lock()
+    deadline = time.perf_counter() + seconds
+    pool = [threading.Thread(target=worker, args=(store, ids, mix, deadline, counter, lock)) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return counter[0]
+
+
+def process_main(path, ids, mix, threads, seconds, results):
+    results.put(run_threads(SQLiteUserStore(path), ids, mix, threads, seconds))
+
+
+def run_processes(path, ids, mix, processes, threads, seconds):
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=process_main, args=(path, ids, mix, threads, seconds, results))
+             for _ in range(processes)]
+    for p in procs:
+        p.start()
+    total = sum(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user-service storage backends")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each run")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per process")
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes for the shared SQLite run")
+    parser.add_argument("--users", type=int, default=1000, help="Users seeded before each run")
+    args = parser.parse_args()
+
+    print(f"{'backend':<28} {'mix':<13} {'ops/s':>10}")
+    for mix in MIXES:
+        store = MemoryUserStore()
+        ids = seed(store, args.users)
+        ops = run_threads(store, ids, mix, args.threads, args.seconds)
+        print(f"{f'memory ({args.threads} threads)':<28} {mix:<13} {ops / args.seconds:>10.0f}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "users.db")
+            ids = seed(SQLiteUserStore(path), args.users)
+            ops = run_threads(SQLiteUserStore(path), ids, mix, args.threads, args.seconds)
+            print(f"{f'sqlite ({args.threads} threads)':<28} {mix:<13} {ops / args.seconds:>10.0f}")
+
+            ops = run_processes(path, ids, mix, args.processes, args.threads, args.seconds)
+            label = f"sqlite ({args.processes}x{args.threads} workers)"
+            print(f"{label:<28} {mix:<13} {ops / args.seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
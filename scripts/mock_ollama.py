@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for the Ollama HTTP API, for plumbing smoke tests and
+offline runs.
+
+Answers /api/chat with the action plan of the example closest to the last
+user message (using the agent's local example retriever) and simulates the
+generation behaviour that the options in agent/src/llm_options.py control:
+
+- time per prompt token and per generated token
+- num_predict: output is cut at the cap (done_reason "length")
+- occasional runs of trailing whitespace when the output is not capped and
+  the format is not schema-constrained (a known JSON-mode failure)
+- temperature: the higher it is, the more often the second-best plan is picked
+- num_ctx: a prompt larger than the context loses the start of the
+  conversation (the system prompt) and the reply is no longer a plan
+- stop sequences
+
+Also serves /api/tags and /api/pull so the agent starts against it.
+
+The effects above are hard-coded assumptions (RAMBLE_RATE, the temperature
+flip rate, DEFAULT_NUM_CTX, token timings), not measurements of a real
+model. Numbers produced against the mock only show that the options reach
+the server and change its replies; they do not justify option defaults.
+
+Usage:
+    python3 scripts/mock_ollama.py [--port 11434] [--token-ms 8] [--seed 1]
+    OLLAMA_HOST=http://localhost:11434 python3 agent/src/main.py
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent", "src"))
+
+from examples import ExampleRetriever, build_examples  # noqa: E402
+
+MODEL = "mock"
+# Ollama's default context window when num_ctx is not sent
+DEFAULT_NUM_CTX = 2048
+# Chance that an uncapped, unconstrained JSON reply trails off into whitespace
+RAMBLE_RATE = 0.1
+RAMBLE_TOKENS = 400
+# Same user-service URL as the agent, so example plans match recorded ones
+USER_SERVICE_URL = f"http://user-service:{os.environ.get('USER_SERVICE_PORT', 5001)}"
+
+
+def count_tokens(text):
+    """Rough token count (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class MockModel:
+    """Generates replies and their timings for one /api/chat payload."""
+
+    def __init__(self, token_ms=8.0, prompt_token_ms=0.1, seed=1, user_service_url=USER_SERVICE_URL):
+        self.token_ms = token_ms
+        self.prompt_token_ms = prompt_token_ms
+        self.retriever = ExampleRetriever(build_examples(user_service_url), k=2)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            return self._random.random()
+
+    def chat(self, payload):
+        options = payload.get("options") or {}
+        messages = payload.get("messages") or []
+        prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+        num_ctx = options.get("num_ctx") or DEFAULT_NUM_CTX
+
+        candidates = self.retriever.retrieve(prompt)
+        if prompt_tokens > num_ctx:
+            # The system prompt was truncated away; the model just chats
+            content = json.dumps({"response": f"Sure, I can help with: {prompt}"})
+        elif len(candidates) > 1 and self._draw() < options.get("temperature", 0.8) * 0.3:
+            content = json.dumps(candidates[1]["action"])
+        else:
+            content = json.dumps(candidates[0]["action"]) if candidates else "{}"
+
+        if payload.get("format") == "json" and not options.get("num_predict") and self._draw() < RAMBLE_RATE:
+            content += "\n" * RAMBLE_TOKENS
+
+        done_reason = "stop"
+        for stop in options.get("stop") or []:
+            if stop in content:
+                content = content[:content.index(stop)]
+        tokens = count_tokens(content.rstrip("\n")) + (len(content) - len(content.rstrip("\n")))
+        num_predict = options.get("num_predict")
+        if num_predict and tokens > num_predict:
+            content = content[:num_predict * 4]
+            tokens = num_predict
+            done_reason = "length"
+
+        prompt_eval_ms = min(prompt_tokens, num_ctx) * self.prompt_token_ms
+        eval_ms = tokens * self.token_ms
+        time.sleep((prompt_eval_ms + eval_ms) / 1000)
+        return {
+            "model": payload.get("model", MODEL),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": done_reason,
+            "prompt_eval_count": min(prompt_tokens, num_ctx),
+            "prompt_eval_duration": int(prompt_eval_ms * 1e6),
+            "eval_count": tokens,
+            "eval_duration": int(eval_ms * 1e6),
+            "total_duration": int((prompt_eval_ms + eval_ms) * 1e6),
+        }
+
+
+def make_handler(model):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, body, status=200):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send({"models": [{"name": os.environ.get("MODEL_NAME", MODEL)}]})
+            else:
+                self._send({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._send({"error": "invalid JSON"}, 400)
+            if self.path == "/api/chat":
+                self._send(model.chat(payload))
+            elif self.path == "/api/pull":
+                self._send({"status": "success"})
+            else:
+                self._send({"error": "not found"}, 404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(port=0, **model_options):
+    """Starts the mock in a background thread; returns (server, base URL)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(MockModel(**model_options)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-ms", type=float, default=8.0, help="Time per generated token")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(MockModel(token_ms=args.token_ms, seed=args.seed)))
+    print(f"Mock Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
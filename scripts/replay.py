@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Replays recorded /chat traffic against one or more models and compares
+the plans and latencies with the recording.
+
+The agent records requests when RECORD_FILE is set (see agent/src/recording.py).
+Each record keeps the conversation messages sent for the prompt; this tool
+rebuilds the system prompt with the current code, sends the request straight
+to Ollama (nothing is executed) and checks whether the new plan matches the
+recorded one (intents.plan_signature: bash command, or API method + URL).
+
+Targets are MODEL@URL, or "mock" for scripts/mock_ollama.py started
+in-process. Results are printed side by side, with the recording as the
+baseline row.
+
+Usage:
+    python3 scripts/replay.py traffic.jsonl [--target mock] [--target llama3.2@http://localhost:11434]
+                              [--speed 0] [--concurrency 4] [--llm-options '{"num_predict": 64}']
+                              [--source llm] [--limit 500] [--show-mismatches 5]
+
+--speed 1 keeps the recorded arrival times, 10 replays ten times faster and
+0 (the default) sends requests as fast as --concurrency allows.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agent", "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from examples import ExampleRetriever, OllamaEmbedder, build_examples, format_examples, EMBED_MODEL  # noqa: E402
+from intents import plan_signature  # noqa: E402
+from llm_options import build_chat_payload, parse_llm_options  # noqa: E402
+from prompts import render_system_prompt  # noqa: E402
+from recording import load_records  # noqa: E402
+
+# Same user-service URL and example library as the agent, so prompts match the recording
+USER_SERVICE_HOST = f"http://user-service:{os.environ.get('USER_SERVICE_PORT', 5001)}"
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+
+
+def parse_target(text):
+    """'mock' or 'MODEL@URL' -> (label, model, url or None for the mock)."""
+    if text == "mock":
+        return "mock", "mock", None
+    model, sep, url = text.rpartition("@")
+    if not sep or not model or not url.startswith("http"):
+        raise argparse.ArgumentTypeError(f"Invalid target {text!r} (expected MODEL@URL or mock)")
+    return text, model, url.rstrip("/")
+
+
+def parse_plan(text):
+    try:
+        plan = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    return plan if isinstance(plan, dict) else None
+
+
+def make_prompt_builder():
+    """build_system_prompt(prompt, with_context) as the agent builds it, without importing main."""
+    retriever = ExampleRetriever(build_examples(USER_SERVICE_HOST),
+                                 embedder=OllamaEmbedder(OLLAMA_HOST, EMBED_MODEL) if EMBED_MODEL else None)
+
+    def build_system_prompt(prompt, with_context=False):
+        return render_system_prompt(format_examples(retriever.retrieve(prompt)), USER_SERVICE_HOST, with_context)
+    return build_system_prompt
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Replayer:
+    """Sends recorded requests to one target and collects per-record outcomes."""
+
+    def __init__(self, model, url, options, build_system_prompt):
+        self.model = model
+        self.url = url
+        self.options = options
+        self.build_system_prompt = build_system_prompt
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.results = []
+
+    def replay(self, record):
+        messages = [{"role": "system", "content": self.build_system_prompt(record["prompt"], with_context=True)}]
+        messages.extend(record.get("messages") or [{"role": "user", "content": record["prompt"]}])
+        payload = build_chat_payload(self.model, messages, self.options)
+
+        start = time.perf_counter()
+        try:
+            resp = self.session.post(f"{self.url}/api/chat", json=payload, timeout=300)
+            data = resp.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            data = {"error": str(e)}
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        plan = parse_plan(data.get("message", {}).get("content"))
+        outcome = {
+            "prompt": record["prompt"],
+            "latency_ms": latency_ms,
+            "error": data.get("error"),
+            "parsed": plan is not None,
+            "match": plan_signature(plan) == plan_signature(record.get("plan")) if plan else False,
+            "truncated": data.get("done_reason") == "length",
+            "eval_count": data.get("eval_count"),
+            "expected": plan_signature(record.get("plan")),
+            "got": plan_signature(plan),
+        }
+        with self._lock:
+            self.results.append(outcome)
+
+
+def run(records, replayer, speed, concurrency):
+    """Replays every record, paced by the recorded timestamps unless speed is 0."""
+    first_ts = records[0].get("ts", 0)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            if speed > 0:
+                delay = (record.get("ts", first_ts) - first_ts) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(replayer.replay, record)
+    return time.monotonic() - start
+
+
+def summarize(label, latencies, matches, parsed, truncated, errors, total, wall_s=None):
+    rate = f"{matches / total:>7.1%}" if matches is not None else f"{'-':>7}"
+    valid = f"{parsed / total:>7.1%}" if parsed is not None else f"{'-':>7}"
+    throughput = f"{total / wall_s:>7.1f}" if wall_s else f"{'-':>7}"
+    print(f"{label:<36} {total:>5} {rate} {valid} {percentile(latencies, 50):>8.0f} "
+          f"{percentile(latencies, 90):>8.0f} {percentile(latencies, 99):>8.0f} {max(latencies, default=0):>8.0f} "
+          f"{truncated if truncated is not None else '-':>5} {errors if errors is not None else '-':>5} {throughput}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /chat traffic against models")
+    parser.add_argument("records", help="Recording written by the agent (RECORD_FILE)")
+    parser.add_argument("--target", action="append", type=parse_target,
+                        help="MODEL@URL or mock (repeatable; default: mock)")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed (1 = recorded pacing, 0 = max)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight per target")
+    parser.add_argument("--llm-options", type=json.loads, default=None,
+                        help="Generation options as JSON, same keys as /chat llm_options")
+    parser.add_argument("--source", choices=["llm", "intent", "all"], default="all",
+                        help="Replay only LLM-planned or intent-matched records")
+    parser.add_argument("--limit", type=int, default=0, help="Replay at most N records")
+    parser.add_argument("--show-mismatches", type=int, default=0, help="Print up to N mismatches per target")
+    args = parser.parse_args()
+
+    try:
+        options = parse_llm_options(args.llm_options)
+    except ValueError as e:
+        parser.error(str(e))
+
+    records = [record for record in load_records(args.records)
+               if record.get("plan") and (args.source == "all" or record.get("source", "llm").startswith(args.source))]
+    records.sort(key=lambda record: record.get("ts", 0))
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("No replayable records (records need a prompt and a recorded plan)")
+        return 1
+
+    # The system prompt is rebuilt with the current code, so prompt changes are part of the comparison
+    build_system_prompt = make_prompt_builder()
+
+    recorded = [record["timings_ms"]["llm"] for record in records if "llm" in (record.get("timings_ms") or {})]
+    print(f"{len(records)} records from {args.records}, speed {args.speed or 'max'}, "
+          f"concurrency {args.concurrency}\n")
+    print(f"{'target':<36} {'n':>5} {'match':>7} {'valid':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'trunc':>5} {'err':>5} {'req/s':>7}")
+    summarize("recorded (llm stage)", recorded, None, None, None, None, len(recorded))
+
+    for label, model, url in args.target or [parse_target("mock")]:
+        if url is None:
+            from mock_ollama import start_server
+            _, url = start_server()
+        replayer = Replayer(model, url, options, build_system_prompt)
+        wall_s = run(records, replayer, args.speed, args.concurrency)
+        results = replayer.results
+        summarize(label, [r["latency_ms"] for r in results], sum(r["match"] for r in results),
+                  sum(r["parsed"] for r in results), sum(r["truncated"] for r in results),
+                  sum(1 for r in results if r["error"]), len(results), wall_s)
+        for mismatch in [r for r in results if not r["match"]][:args.show_mismatches]:
+            print(f"    {mismatch['prompt'][:60]!r}: expected {mismatch['expected']}, got {mismatch['got']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
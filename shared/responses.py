@@ -0,0 +1,136 @@
+"""
+Response compression and JSON serialization for the Flask apps.
+
+- init_compression(app): gzip/br response compression negotiated from the
+  client's Accept-Encoding header (br only when the brotli package is installed).
+- init_json_provider(app): swaps Flask's JSON provider for an orjson-based one
+  when JSON_PROVIDER=orjson and orjson is installed.
+"""
+
+import os
+import gzip
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Responses smaller than this are sent uncompressed (0 disables compression)
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 5))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 4))
+# default (Flask's json module) or orjson
+JSON_PROVIDER = os.environ.get("JSON_PROVIDER", "default").lower()
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html"}
+
+# --- COMPRESSION ---
+
+def parse_accept_encoding(header):
+    """Returns {coding: q} from an Accept-Encoding header"""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+def choose_encoding(header):
+    """Picks br or gzip for an Accept-Encoding header, or None"""
+    codings = parse_accept_encoding(header or "")
+    wildcard = codings.get("*", 0.0)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in available:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+
+def compress_response(response, min_bytes=None):
+    """Compresses a response in place when the client accepts it and it is worth it"""
+    min_bytes = RESPONSE_COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+    if (min_bytes <= 0 or response.direct_passthrough
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def init_compression(app):
+    app.after_request(compress_response)
+
+# --- JSON ---
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Output is equivalent to the default
+    provider (sorted keys, compact unless in debug mode, same handling of
+    dates, UUIDs and dataclasses via DefaultJSONProvider.default), except
+    that non-ASCII text is sent as UTF-8 rather than \\u escapes.
+    """
+
+    def _options(self, sort_keys=None, indent=None):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        options = self._options(kwargs.get("sort_keys"), kwargs.get("indent"))
+        return orjson.dumps(obj, default=self.default, option=options).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent=indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+def init_json_provider(app, name=None):
+    """
+    Installs the JSON provider selected by JSON_PROVIDER.
+    Returns the provider actually in use ("orjson" or "default").
+    """
+    name = (name or JSON_PROVIDER).lower()
+    if name == "orjson" and orjson is not None:
+        app.json = OrjsonProvider(app)
+        return "orjson"
+    if name not in ("orjson", "default"):
+        raise ValueError(f"Unknown JSON_PROVIDER: {name}")
+    return "default"
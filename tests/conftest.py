@@ -0,0 +1,15 @@
+import importlib.util
+import os
+
+import pytest
+
+CLI_PATH = os.path.join(os.path.dirname(__file__), '..', 'ollama-cli.py')
+
+
+@pytest.fixture(scope='session')
+def cli():
+    """The ollama-cli.py module (its file name is not importable directly)"""
+    spec = importlib.util.spec_from_file_location('ollama_cli', CLI_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
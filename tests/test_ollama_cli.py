@@ -0,0 +1,82 @@
+def test_fast_parse_args_common_shapes(cli):
+    """Tests that the usual argument lists are parsed without argparse."""
+    args = cli.fast_parse_args(['list files', '--yes', '--agent-url=http://agent:8000', '--session-id', 's1'])
+    assert args.prompt == 'list files'
+    assert args.yes and not args.dry_run
+    assert args.agent_url == 'http://agent:8000'
+    assert args.session_id == 's1'
+    assert cli.fast_parse_args(['--get-command', 'pwd']).get_command
+
+
+def test_fast_parse_args_falls_back(cli):
+    """Tests that anything unusual is left to argparse."""
+    for argv in [[], ['--help'], ['--unknown', 'ls'], ['one', 'two'], ['ls', '--agent-url'],
+                 ['ls', '--session-id', '--yes'], ['--yes=1', 'ls']]:
+        assert cli.fast_parse_args(argv) is None, argv
+    assert cli.parse_args(['-y', 'ls']).yes
+
+
+def test_cache_lookup_and_persistence(cli, tmp_path):
+    """Tests exact and fuzzy hits, scoping by model and cwd, and reloading from disk."""
+    path = str(tmp_path / 'commands.json')
+    cache = cli.CommandCache(path, ttl=3600)
+    cache.record('List all files', '/tmp', 'llama', 'ls -la', agent_url='http://agent')
+
+    cache = cli.CommandCache(path, ttl=3600)
+    assert cache.model_for('http://agent') == 'llama'
+    hit = cache.lookup('list all files.', '/tmp', 'llama')
+    assert hit['command'] == 'ls -la' and hit['exact'] and hit['uses'] == 1
+    assert not cache.lookup('list all file', '/tmp', 'llama')['exact']
+    assert cache.lookup('list all file', '/tmp', 'llama', fuzzy=False) is None
+    assert cache.lookup('list all files', '/home', 'llama') is None
+    assert cache.lookup('list all files', '/tmp', 'qwen') is None
+
+
+def test_cache_expiry(cli, tmp_path):
+    """Tests that entries unused for longer than the TTL are ignored and pruned."""
+    cache = cli.CommandCache(str(tmp_path / 'commands.json'), ttl=3600)
+    cache.record('pwd', '/tmp', 'llama', 'pwd')
+    next(iter(cache.data['entries'].values()))['last_used'] -= 7200
+    assert cache.lookup('pwd', '/tmp', 'llama') is None
+    cache.save()
+    assert cache.data['entries'] == {}
+
+
+def test_model_change_drops_stale_entries(cli, tmp_path):
+    """Tests that the model is rechecked at most once per interval and old entries are dropped."""
+    path = str(tmp_path / 'commands.json')
+    cache = cli.CommandCache(path, ttl=3600, model_check_interval=600)
+    cache.record('pwd', '/tmp', 'llama', 'pwd', agent_url='http://agent')
+    calls = []
+
+    def fetch(agent_url):
+        calls.append(agent_url)
+        return 'qwen'
+
+    assert cache.current_model('http://agent', fetch) == 'qwen'
+    assert cache.current_model('http://agent', fetch) == 'qwen'
+    assert calls == ['http://agent']
+    assert cache.lookup('pwd', '/tmp', 'llama') is None
+    assert cli.CommandCache(path, ttl=3600).data['entries'] == {}
+
+
+def test_unreachable_agent_keeps_known_model(cli, tmp_path):
+    """Tests that a failed model check keeps the last known model and is not retried until the interval passes."""
+    path = str(tmp_path / 'commands.json')
+    cache = cli.CommandCache(path, ttl=3600, model_check_interval=600)
+    cache.record('pwd', '/tmp', 'llama', 'pwd', agent_url='http://agent')
+    calls = []
+    assert cache.current_model('http://agent', lambda url: calls.append(url)) == 'llama'
+    # The next invocation (a new process) loads the failed check time from disk
+    cache = cli.CommandCache(path, ttl=3600, model_check_interval=600)
+    assert cache.current_model('http://agent', lambda url: calls.append(url)) == 'llama'
+    assert len(calls) == 1
+    assert cache.lookup('pwd', '/tmp', 'llama')['command'] == 'pwd'
+
+
+def test_new_model_in_response_drops_stale_entries(cli, tmp_path):
+    """Tests that recording a command for a new model drops the old model's entries."""
+    cache = cli.CommandCache(str(tmp_path / 'commands.json'), ttl=3600)
+    cache.record('pwd', '/tmp', 'llama', 'pwd', agent_url='http://agent')
+    cache.record('list files', '/tmp', 'qwen', 'ls', agent_url='http://agent')
+    assert [entry['model'] for entry in cache.data['entries'].values()] == ['qwen']
@@ -1,15 +1,122 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 import uuid
 import os
+import re
+import json
+import time
+import queue
+import atexit
+import threading
 from datetime import datetime
+from storage import create_store, USER_FIELDS
+from responses import init_compression, init_json_provider, JSON_PROVIDER
 
 app = Flask(__name__)
 
+# Negotiated gzip/br responses and the JSON provider (JSON_PROVIDER=orjson for speed)
+init_compression(app)
+if init_json_provider(app) != JSON_PROVIDER:
+    app.logger.warning("JSON_PROVIDER=%s is not available, using the default provider", JSON_PROVIDER)
+
 # Configuration
 USER_SERVICE_PORT = int(os.environ.get("USER_SERVICE_PORT", 5001))
+# Append one JSON line per handled request (span) to this file when set
+TRACE_EXPORT_FILE = os.environ.get("TRACE_EXPORT_FILE", "")
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# User storage (USER_STORE=memory for a per-process dict, sqlite to share
+# data between gunicorn workers)
+users_db = create_store()
+
+# --- Request tracing (W3C traceparent) ---
+
+class SpanFileWriter:
+    """
+    Appends spans to a JSON-lines file from a background thread, so requests
+    never wait on the file or fail because of it. Spans are dropped (and
+    counted) when the queue is full or the file cannot be written.
+    """
+
+    def __init__(self, path, max_queue=2048):
+        self.path = path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            spans = [self._queue.get()]
+            while len(spans) < 256:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in spans
+            spans = [span for span in spans if span is not None]
+            if spans:
+                self._write(spans)
+            if closing:
+                return
+
+    def _write(self, spans):
+        try:
+            with open(self.path, "a") as f:
+                f.writelines(json.dumps(span) + "\n" for span in spans)
+        except OSError as e:
+            self.dropped += len(spans)
+            app.logger.warning("Could not write %d spans to %s: %s", len(spans), self.path, e)
+
+    def close(self, timeout=5):
+        """Writes the queued spans and stops the thread"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
 
-# In-memory database (simple dict)
-users_db = {}
+
+span_writer = SpanFileWriter(TRACE_EXPORT_FILE) if TRACE_EXPORT_FILE else None
+
+@app.before_request
+def start_span():
+    """Continue the caller's trace, or start a new one"""
+    match = TRACEPARENT_RE.match(request.headers.get("traceparent", "").strip().lower())
+    if match:
+        g.trace_id, g.parent_span_id, g.trace_flags = match.groups()
+    else:
+        g.trace_id, g.parent_span_id, g.trace_flags = os.urandom(16).hex(), None, "01"
+    g.span_id = os.urandom(8).hex()
+    g.span_start_ns = time.time_ns()
+
+@app.after_request
+def end_span(response):
+    """Echo the trace context and export the span"""
+    response.headers["traceparent"] = f"00-{g.trace_id}-{g.span_id}-{g.trace_flags}"
+    if span_writer is not None:
+        end_ns = time.time_ns()
+        span = {
+            "service": "user-service",
+            "name": f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+            "trace_id": g.trace_id,
+            "span_id": g.span_id,
+            "parent_span_id": g.parent_span_id,
+            "start_time_unix_nano": g.span_start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round((end_ns - g.span_start_ns) / 1e6, 3),
+            "status": "error" if response.status_code >= 500 else "ok",
+            "attributes": {"http.status_code": response.status_code}
+        }
+        span_writer.export(span)
+    return response
 
 @app.route("/", methods=["GET"])
 def index():
@@ -18,6 +125,7 @@ def index():
         "message": "User Service is running",
         "endpoints": {
             "GET /users": "List all users",
+            "GET /users/search?q=<text>": "Search users by name, city or email (prefix and typo tolerant)",
             "GET /users/<id>": "Get user by ID",
             "POST /users": "Create new user (JSON body with name, city, etc.)",
             "DELETE /users/<id>": "Delete user by ID"
@@ -27,10 +135,38 @@ def index():
 @app.route("/users", methods=["GET"])
 def get_users():
     """List all users"""
+    users = users_db.list()
     return jsonify({
         "status": "success",
-        "count": len(users_db),
-        "users": list(users_db.values())
+        "count": len(users),
+        "users": users
+    }), 200
+
+@app.route("/users/search", methods=["GET"])
+def search_users():
+    """Search users by name, city or email"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({
+            "status": "error",
+            "message": "Query parameter 'q' is required"
+        }), 400
+
+    limit = request.args.get("limit", 20)
+    try:
+        limit = max(1, min(int(limit), 100))
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "Query parameter 'limit' must be an integer"
+        }), 400
+
+    users = users_db.search(query, limit)
+    return jsonify({
+        "status": "success",
+        "query": query,
+        "count": len(users),
+        "users": users
     }), 200
 
 @app.route("/users/<user_id>", methods=["GET"])
@@ -74,7 +210,7 @@ def create_user():
     }
 
     # Store in database
-    users_db[user_id] = user
+    users_db.create(user)
 
     return jsonify({
         "status": "success",
@@ -85,14 +221,13 @@ def create_user():
 @app.route("/users/<user_id>", methods=["DELETE"])
 def delete_user(user_id):
     """Delete a user by ID"""
-    if user_id not in users_db:
+    deleted_user = users_db.delete(user_id)
+    if deleted_user is None:
         return jsonify({
             "status": "error",
             "message": f"User with ID {user_id} not found"
         }), 404
 
-    deleted_user = users_db.pop(user_id)
-
     return jsonify({
         "status": "success",
         "message": "User deleted successfully",
@@ -102,12 +237,6 @@ def delete_user(user_id):
 @app.route("/users/<user_id>", methods=["PUT", "PATCH"])
 def update_user(user_id):
     """Update a user by ID"""
-    if user_id not in users_db:
-        return jsonify({
-            "status": "error",
-            "message": f"User with ID {user_id} not found"
-        }), 404
-
     data = request.json
     if not data:
         return jsonify({
@@ -115,13 +244,15 @@ def update_user(user_id):
             "message": "No JSON data provided"
         }), 400
 
-    # Update user fields
-    user = users_db[user_id]
-    for key in ["name", "city", "email", "phone", "address"]:
-        if key in data:
-            user[key] = data[key]
-
-    user["updated_at"] = datetime.now().isoformat()
+    # Update user fields (applied atomically by the store)
+    fields = {key: data[key] for key in USER_FIELDS if key in data}
+    fields["updated_at"] = datetime.now().isoformat()
+    user = users_db.update(user_id, fields)
+    if user is None:
+        return jsonify({
+            "status": "error",
+            "message": f"User with ID {user_id} not found"
+        }), 404
 
     return jsonify({
         "status": "success",
@@ -0,0 +1,136 @@
+"""
+Inverted index for user search.
+
+Indexes the name, city and email of each user and supports exact, prefix
+and fuzzy (edit distance) token matching. The index is updated
+incrementally as users are created, updated and deleted.
+"""
+
+import re
+import bisect
+import threading
+
+SEARCH_FIELDS = ["name", "city", "email"]
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Score per query token, by how it matched
+EXACT_SCORE = 3
+PREFIX_SCORE = 2
+FUZZY_SCORE = 1
+
+
+def tokenize(text):
+    """Lowercase word tokens; emails also yield their full address"""
+    if not text:
+        return []
+    text = str(text).lower()
+    tokens = TOKEN_RE.findall(text)
+    if "@" in text:
+        tokens.append(text.strip())
+    return tokens
+
+
+def max_edits(token):
+    """Allowed edit distance for a query token"""
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) <= 6 else 2
+
+
+def within_distance(a, b, limit):
+    """True if the Levenshtein distance between a and b is <= limit"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class UserSearchIndex:
+    """Token -> user IDs postings with a sorted vocabulary for prefix lookups"""
+
+    def __init__(self):
+        self._postings = {}
+        self._doc_tokens = {}
+        self._vocabulary = []
+        self._lock = threading.RLock()
+
+    def add(self, user):
+        """Index (or re-index) a user dict"""
+        with self._lock:
+            self.remove(user["id"])
+            tokens = set()
+            for field in SEARCH_FIELDS:
+                tokens.update(tokenize(user.get(field)))
+            self._doc_tokens[user["id"]] = tokens
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = set()
+                    bisect.insort(self._vocabulary, token)
+                postings.add(user["id"])
+
+    def remove(self, user_id):
+        with self._lock:
+            for token in self._doc_tokens.pop(user_id, ()):
+                postings = self._postings[token]
+                postings.discard(user_id)
+                if not postings:
+                    del self._postings[token]
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def rebuild(self, users):
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._vocabulary.clear()
+            for user in users:
+                self.add(user)
+
+    def _match_token(self, token):
+        """Returns {user_id: score} for one query token"""
+        scores = {}
+        # Prefix matches (includes the exact token itself)
+        start = bisect.bisect_left(self._vocabulary, token)
+        for vocab_token in self._vocabulary[start:]:
+            if not vocab_token.startswith(token):
+                break
+            score = EXACT_SCORE if vocab_token == token else PREFIX_SCORE
+            for user_id in self._postings[vocab_token]:
+                scores[user_id] = max(scores.get(user_id, 0), score)
+
+        limit = max_edits(token)
+        if limit:
+            for vocab_token in self._vocabulary:
+                if vocab_token.startswith(token) or not within_distance(token, vocab_token, limit):
+                    continue
+                for user_id in self._postings[vocab_token]:
+                    scores.setdefault(user_id, FUZZY_SCORE)
+        return scores
+
+    def search(self, query, limit=20):
+        """
+        Returns user IDs matching every query token, best matches first.
+        Each token may match exactly, as a prefix, or within a small edit distance.
+        """
+        tokens = TOKEN_RE.findall(str(query).lower())
+        if not tokens:
+            return []
+        with self._lock:
+            total = None
+            for token in tokens:
+                scores = self._match_token(token)
+                if total is None:
+                    total = scores
+                else:
+                    total = {user_id: total[user_id] + score for user_id, score in scores.items() if user_id in total}
+                if not total:
+                    return []
+        ranked = sorted(total.items(), key=lambda item: -item[1])
+        return [user_id for user_id, _ in ranked[:limit]]
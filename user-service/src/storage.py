@@ -0,0 +1,286 @@
+"""
+User storage backends.
+
+The Flask app talks to a UserStore instead of a module-level dict so it can
+run with several gunicorn workers/threads:
+
+- MemoryUserStore: process-local dict guarded by a lock. Safe with threads,
+  but each worker process has its own data.
+- SQLiteUserStore: shared SQLite database (WAL mode). Safe across threads and
+  worker processes on the same host; updates are atomic read-modify-write
+  transactions.
+
+Both keep an in-process search index (see search.py) in step with their
+writes. SQLite workers also apply each other's writes to their index from
+a change log, so the index is only rebuilt from scratch when it is first
+used or has fallen further behind than the log reaches.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from search import UserSearchIndex
+
+USER_FIELDS = ["name", "city", "email", "phone", "address"]
+# Writes kept in the SQLite change log for other workers' search indexes
+CHANGE_LOG_SIZE = int(os.environ.get("USER_CHANGE_LOG_SIZE", 10000))
+
+
+class DuplicateUserError(ValueError):
+    """Raised by UserStore.create when a user with the same id exists"""
+
+
+class UserStore(ABC):
+    """Interface implemented by the storage backends"""
+
+    @abstractmethod
+    def list(self):
+        """Return all users in creation order"""
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return a user dict, or None"""
+
+    @abstractmethod
+    def create(self, user):
+        """Store a new user dict (must contain a new 'id') and return it; raises DuplicateUserError"""
+
+    @abstractmethod
+    def update(self, user_id, fields):
+        """Atomically apply fields to a user; return the updated user or None"""
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a user; return the deleted user or None"""
+
+    @abstractmethod
+    def count(self):
+        """Return the number of users"""
+
+    @abstractmethod
+    def search(self, query, limit=20):
+        """Return users matching query on name, city or email, best first"""
+
+
+class MemoryUserStore(UserStore):
+    """In-process store; copies are returned so callers never share mutable state"""
+
+    def __init__(self):
+        self._users = {}
+        self._index = UserSearchIndex()
+        self._lock = threading.RLock()
+
+    def list(self):
+        with self._lock:
+            return [dict(user) for user in self._users.values()]
+
+    def get(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id)
+            return dict(user) if user else None
+
+    def create(self, user):
+        with self._lock:
+            if user["id"] in self._users:
+                raise DuplicateUserError(user["id"])
+            self._users[user["id"]] = dict(user)
+            self._index.add(user)
+            return dict(user)
+
+    def update(self, user_id, fields):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return None
+            user.update(fields)
+            self._index.add(user)
+            return dict(user)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._index.remove(user_id)
+            return self._users.pop(user_id, None)
+
+    def count(self):
+        with self._lock:
+            return len(self._users)
+
+    def search(self, query, limit=20):
+        with self._lock:
+            return [dict(self._users[user_id]) for user_id in self._index.search(query, limit)]
+
+
+class SQLiteUserStore(UserStore):
+    """SQLite-backed store shared by all workers that point at the same file"""
+
+    def __init__(self, path, change_log_size=None):
+        self.path = path
+        self.change_log_size = CHANGE_LOG_SIZE if change_log_size is None else change_log_size
+        self._local = threading.local()
+        # Search index and the database revision it reflects (None = stale)
+        self._index = UserSearchIndex()
+        self._index_revision = None
+        self._index_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "id TEXT UNIQUE NOT NULL, "
+            "data TEXT NOT NULL)"
+        )
+        # Bumped by every write so other workers' changes can be detected
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0)")
+        # The user each revision changed, so search indexes can catch up incrementally
+        conn.execute("CREATE TABLE IF NOT EXISTS changes (revision INTEGER PRIMARY KEY, user_id TEXT NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; multi-statement writes use explicit transactions
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _bump_revision(self, conn, user_id):
+        """Bump the revision and log which user it changed; returns the new revision"""
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+        revision = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+        conn.execute("INSERT OR REPLACE INTO changes (revision, user_id) VALUES (?, ?)", (revision, user_id))
+        if revision % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE revision <= ?", (revision - self.change_log_size,))
+        return revision
+
+    def _index_write(self, revision, apply):
+        """
+        Apply our own write to the index if it is the next revision;
+        otherwise another worker (or thread) got in between and the next
+        search catches up from the change log, this write included.
+        """
+        with self._index_lock:
+            if self._index_revision is not None and revision == self._index_revision + 1:
+                apply()
+                self._index_revision = revision
+
+    def _catch_up(self, conn):
+        """Bring the search index up to the database revision (caller holds _index_lock)"""
+        revision = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+        if revision == self._index_revision:
+            return
+        # Read the revision, the log and the users in one snapshot so they agree
+        conn.execute("BEGIN")
+        try:
+            revision = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+            changes = []
+            if self._index_revision is not None:
+                changes = conn.execute("SELECT revision, user_id FROM changes WHERE revision > ? ORDER BY revision",
+                                       (self._index_revision,)).fetchall()
+            if changes and len(changes) == revision - self._index_revision:
+                changed = {user_id: None for _, user_id in changes}
+                for user_id in changed:
+                    changed[user_id] = self.get(user_id)
+                for user_id, user in changed.items():
+                    if user is None:
+                        self._index.remove(user_id)
+                    else:
+                        self._index.add(user)
+            else:
+                # First use, or the log no longer reaches back to our revision
+                self._index.rebuild(self.list())
+        finally:
+            conn.execute("COMMIT")
+        self._index_revision = revision
+
+    def list(self):
+        rows = self._conn().execute("SELECT data FROM users ORDER BY seq").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def get(self, user_id):
+        row = self._conn().execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create(self, user):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO users (id, data) VALUES (?, ?)", (user["id"], json.dumps(user)))
+            revision = self._bump_revision(conn, user["id"])
+            conn.execute("COMMIT")
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK")
+            raise DuplicateUserError(user["id"]) from None
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._index_write(revision, lambda: self._index.add(user))
+        return dict(user)
+
+    def update(self, user_id, fields):
+        conn = self._conn()
+        # IMMEDIATE takes the write lock up front so concurrent updates serialize
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            user = json.loads(row[0])
+            user.update(fields)
+            conn.execute("UPDATE users SET data = ? WHERE id = ?", (json.dumps(user), user_id))
+            revision = self._bump_revision(conn, user_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._index_write(revision, lambda: self._index.add(user))
+        return user
+
+    def delete(self, user_id):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            revision = self._bump_revision(conn, user_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._index_write(revision, lambda: self._index.remove(user_id))
+        return json.loads(row[0])
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def search(self, query, limit=20):
+        conn = self._conn()
+        with self._index_lock:
+            self._catch_up(conn)
+            user_ids = self._index.search(query, limit)
+        users = []
+        for user_id in user_ids:
+            user = self.get(user_id)
+            if user is not None:
+                users.append(user)
+        return users
+
+
+def create_store(backend=None, path=None):
+    """Build the store selected by USER_STORE (memory | sqlite) and USER_DB_PATH"""
+    backend = (backend or os.environ.get("USER_STORE", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteUserStore(path or os.environ.get("USER_DB_PATH", "/data/users.db"))
+    if backend == "memory":
+        return MemoryUserStore()
+    raise ValueError(f"Unknown USER_STORE backend: {backend}")
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The service modules import each other by name (gunicorn runs with --chdir src)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+# Modules shared with the agent live in the repository's shared/ directory;
+# the Docker image copies them into src/
+shared = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared")
+if os.path.isdir(shared):
+    sys.path.insert(0, shared)
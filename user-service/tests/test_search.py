@@ -0,0 +1,85 @@
+from search import UserSearchIndex, max_edits, tokenize, within_distance
+from storage import SQLiteUserStore
+
+def user(user_id, name, city, email=None):
+    return {"id": user_id, "name": name, "city": city, "email": email}
+
+def test_tokenize():
+    """Tests that fields are split into lowercase words and emails are also kept whole."""
+    assert tokenize("Mario Rossi") == ["mario", "rossi"]
+    assert tokenize("Bob.Smith@Example.com") == ["bob", "smith", "example", "com", "bob.smith@example.com"]
+    assert tokenize("snake_case") == ["snake", "case"]
+    assert tokenize(None) == []
+
+def test_edit_distance_limits():
+    """Tests the bounded Levenshtein check and the per-length edit budget."""
+    assert within_distance("mario", "maria", 1)
+    assert within_distance("rossi", "rosi", 1)
+    assert not within_distance("mario", "marco", 0)
+    assert not within_distance("rome", "milan", 2)
+    assert [max_edits(token) for token in ("bob", "mario", "giovanni")] == [0, 1, 2]
+
+def test_exact_prefix_and_fuzzy_ranking():
+    """Tests that every query token must match and exact beats prefix beats fuzzy."""
+    index = UserSearchIndex()
+    index.add(user("1", "Mario Rossi", "Rome", "mario@example.com"))
+    index.add(user("2", "Marianna Bianchi", "Milan"))
+    index.add(user("3", "Maria Verdi", "Rome"))
+
+    assert index.search("mario") == ["1", "3"]  # exact, then fuzzy (maria)
+    assert set(index.search("mari")) == {"1", "2", "3"}
+    assert index.search("maria rome") == ["3", "1"]
+    assert index.search("mario@example.com") == ["1"]
+    assert index.search("bob") == []
+    assert index.search("") == []
+
+def test_updates_and_removals_keep_index_in_step():
+    """Tests that re-indexing and removal drop stale tokens."""
+    index = UserSearchIndex()
+    index.add(user("1", "Mario Rossi", "Rome"))
+    index.add(user("1", "Mario Rossi", "Turin"))
+    assert index.search("rome") == []
+    assert index.search("turin") == ["1"]
+    index.remove("1")
+    assert index.search("mario") == []
+    index.rebuild([user("2", "Anna", "Naples")])
+    assert index.search("anna") == ["2"]
+
+def test_sqlite_index_rebuilds_on_revision_change(tmp_path):
+    """Tests that a store sees writes made through another connection to the same file."""
+    path = str(tmp_path / "users.db")
+    worker_a, worker_b = SQLiteUserStore(path), SQLiteUserStore(path)
+    worker_a.create(user("1", "Mario Rossi", "Rome"))
+    assert [u["id"] for u in worker_b.search("rossi")] == ["1"]
+
+    worker_a.update("1", {"city": "Turin"})
+    worker_a.create(user("2", "Anna Rossi", "Rome"))
+    assert [u["id"] for u in worker_b.search("rossi turin")] == ["1"]
+    assert [u["id"] for u in worker_b.search("rome")] == ["2"]
+    worker_b.delete("2")
+    assert worker_a.search("anna") == []
+
+def test_sqlite_index_catches_up_from_change_log(tmp_path, monkeypatch):
+    """Tests that other workers' writes are applied incrementally, with a rebuild only once the log is trimmed."""
+    path = str(tmp_path / "users.db")
+    worker_a, worker_b = SQLiteUserStore(path, change_log_size=2), SQLiteUserStore(path, change_log_size=2)
+    worker_a.create(user("1", "Mario Rossi", "Rome"))
+    assert [u["id"] for u in worker_b.search("rossi")] == ["1"]
+
+    rebuilds = []
+    monkeypatch.setattr(worker_b._index, "rebuild", lambda users: rebuilds.append(users))
+    worker_a.update("1", {"city": "Turin"})
+    worker_a.create(user("2", "Anna Rossi", "Rome"))
+    worker_b.delete("1")
+    assert [u["id"] for u in worker_b.search("rossi")] == ["2"]
+    assert [u["id"] for u in worker_b.search("rome")] == ["2"]
+    assert rebuilds == []
+
+    # Fall far enough behind that the log no longer covers it: rebuild
+    monkeypatch.undo()
+    rebuild = worker_b._index.rebuild
+    monkeypatch.setattr(worker_b._index, "rebuild", lambda users: rebuilds.append(users) or rebuild(users))
+    for i in range(1000):
+        worker_a.update("2", {"city": f"City {i}"})
+    assert [u["id"] for u in worker_b.search("city 999")] == ["2"]
+    assert len(rebuilds) == 1
@@ -0,0 +1,95 @@
+import pytest
+from storage import DuplicateUserError, MemoryUserStore, SQLiteUserStore, UserStore, create_store
+
+def revision(store):
+    return store._conn().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()[0]
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return create_store(request.param, str(tmp_path / "users.db"))
+
+def test_user_store_is_abstract():
+    """Tests that the interface cannot be used without implementing every method."""
+    with pytest.raises(TypeError):
+        UserStore()
+
+    class Partial(UserStore):
+        def list(self):
+            return []
+
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_crud_round_trip(store):
+    """Tests create, get, list, update, delete and count on both backends."""
+    store.create({"id": "1", "name": "Mario Rossi", "city": "Rome"})
+    store.create({"id": "2", "name": "Anna Bianchi", "city": "Milan"})
+    assert store.get("1") == {"id": "1", "name": "Mario Rossi", "city": "Rome"}
+    assert [user["id"] for user in store.list()] == ["1", "2"]
+    assert store.count() == 2
+
+    assert store.update("1", {"city": "Turin"})["city"] == "Turin"
+    assert store.get("1")["city"] == "Turin"
+    assert [user["id"] for user in store.search("turin")] == ["1"]
+
+    assert store.delete("2")["name"] == "Anna Bianchi"
+    assert store.get("2") is None
+    assert store.count() == 1
+
+def test_returned_users_are_copies(store):
+    """Tests that changing a returned dict does not change the stored user."""
+    user = {"id": "1", "name": "Mario Rossi", "city": "Rome"}
+    store.create(user)["city"] = "Milan"
+    user["city"] = "Naples"
+    store.get("1")["city"] = "Turin"
+    assert store.get("1")["city"] == "Rome"
+
+def test_duplicate_and_missing_ids(store):
+    """Tests that duplicate ids are rejected and missing ids return None."""
+    store.create({"id": "1", "name": "Mario Rossi", "city": "Rome"})
+    with pytest.raises(DuplicateUserError):
+        store.create({"id": "1", "name": "Someone Else", "city": "Milan"})
+    assert store.get("1")["name"] == "Mario Rossi"
+    assert store.count() == 1
+
+    assert store.get("missing") is None
+    assert store.update("missing", {"city": "Rome"}) is None
+    assert store.delete("missing") is None
+
+def test_sqlite_revision_bumps_on_writes_only(tmp_path):
+    """Tests that every successful write bumps the revision and failed or missing-id writes do not."""
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    assert revision(store) == 0
+    store.create({"id": "1", "name": "Mario Rossi", "city": "Rome"})
+    store.update("1", {"city": "Turin"})
+    store.delete("1")
+    assert revision(store) == 3
+
+    store.create({"id": "2", "name": "Anna Bianchi", "city": "Milan"})
+    with pytest.raises(DuplicateUserError):
+        store.create({"id": "2", "name": "Anna Bianchi", "city": "Milan"})
+    store.update("missing", {"city": "Rome"})
+    store.delete("missing")
+    assert revision(store) == 4
+
+def test_sqlite_persists_across_reopen(tmp_path):
+    """Tests that users, order and revision survive closing and reopening the database."""
+    path = str(tmp_path / "data" / "users.db")
+    store = SQLiteUserStore(path)
+    store.create({"id": "1", "name": "Mario Rossi", "city": "Rome"})
+    store.create({"id": "2", "name": "Anna Bianchi", "city": "Milan"})
+    store.update("1", {"email": "mario@example.com"})
+    store._conn().close()
+
+    reopened = SQLiteUserStore(path)
+    assert [user["id"] for user in reopened.list()] == ["1", "2"]
+    assert reopened.get("1")["email"] == "mario@example.com"
+    assert revision(reopened) == 3
+    assert [user["id"] for user in reopened.search("mario")] == ["1"]
+
+def test_create_store_backends(tmp_path):
+    """Tests backend selection and rejection of unknown backends."""
+    assert isinstance(create_store("memory"), MemoryUserStore)
+    assert isinstance(create_store("SQLite", str(tmp_path / "users.db")), SQLiteUserStore)
+    with pytest.raises(ValueError):
+        create_store("redis")
@@ -0,0 +1,24 @@
+import json
+import app as user_service
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+def test_span_writer_appends_spans(tmp_path):
+    """Tests that exported spans are written as JSON lines by the background thread."""
+    path = tmp_path / "spans.jsonl"
+    writer = user_service.SpanFileWriter(str(path))
+    writer.export({"name": "GET /users", "span_id": "1"})
+    writer.export({"name": "GET /users/<user_id>", "span_id": "2"})
+    writer.close()
+    assert [json.loads(line)["span_id"] for line in path.read_text().splitlines()] == ["1", "2"]
+    assert writer.dropped == 0
+
+def test_unwritable_trace_file_does_not_fail_requests(tmp_path, monkeypatch):
+    """Tests that requests succeed and spans are counted as dropped when the file cannot be written."""
+    writer = user_service.SpanFileWriter(str(tmp_path))  # a directory, so open() fails
+    monkeypatch.setattr(user_service, "span_writer", writer)
+    response = user_service.app.test_client().get("/users", headers={"traceparent": TRACEPARENT})
+    assert response.status_code == 200
+    assert response.headers["traceparent"].startswith("00-0af7651916cd43dd8448eb211c80319c-")
+    writer.close()
+    assert writer.dropped == 1